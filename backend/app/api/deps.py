@@ -0,0 +1,59 @@
+"""
+Зависимости FastAPI для доступа к общим сервисам
+"""
+from fastapi import Request
+
+from app.services.container import ServiceContainer
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_service import VectorService
+from app.services.graph_service import GraphService
+from app.services.centrality_service import CentralityService
+from app.services.indexing_service import IndexingService
+from app.services.cache_service import CacheService
+from app.services.job_queue import JobQueue
+from app.services.update_coalescer import FileUpdateCoalescer
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """Контейнер сервисов, созданный в lifespan приложения"""
+    return request.app.state.services
+
+
+def get_embedding_service(request: Request) -> EmbeddingService:
+    """Сервис эмбеддингов"""
+    return get_services(request).embedding_service
+
+
+def get_vector_service(request: Request) -> VectorService:
+    """Сервис векторного поиска"""
+    return get_services(request).vector_service
+
+
+def get_graph_service(request: Request) -> GraphService:
+    """Сервис графа связей"""
+    return get_services(request).graph_service
+
+
+def get_centrality_service(request: Request) -> CentralityService:
+    """Сервис центральности графа"""
+    return get_services(request).centrality_service
+
+
+def get_indexing_service(request: Request) -> IndexingService:
+    """Сервис индексации"""
+    return get_services(request).indexing_service
+
+
+def get_cache_service(request: Request) -> CacheService:
+    """Сервис кеширования"""
+    return get_services(request).cache_service
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """Очередь задач индексации"""
+    return get_services(request).job_queue
+
+
+def get_update_coalescer(request: Request) -> FileUpdateCoalescer:
+    """Очередь инкрементальных обновлений файлов"""
+    return get_services(request).update_coalescer
@@ -0,0 +1,67 @@
+"""
+Административные endpoints: профилирование запросов
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.profiler import profiler
+from app.core.security import get_admin_user
+from app.core.timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(get_admin_user)])
+
+
+class ProfileRequest(BaseModel):
+    """Включение профилирования маршрута"""
+    route: str  # Шаблон пути, например /api/v1/search/semantic
+    requests: int = Field(default=10, ge=1)
+    interval_ms: float = Field(default=settings.PROFILER_INTERVAL_MS, ge=1.0, le=1000.0)
+
+
+@router.post("/profiler")
+async def arm_profiler(request: ProfileRequest, http_request: Request):
+    """Профилировать следующие N запросов маршрута"""
+    routes = {getattr(route, "path", None) for route in http_request.app.routes}
+    if request.route not in routes:
+        raise HTTPException(status_code=404, detail=f"Unknown route: {request.route}")
+    
+    return profiler.arm(request.route, request.requests, request.interval_ms)
+
+
+@router.delete("/profiler")
+async def disarm_profiler(route: str):
+    """Отключить профилирование маршрута"""
+    if not profiler.disarm(route):
+        raise HTTPException(status_code=404, detail="Profiling is not armed for this route")
+    return {"route": route, "status": "disarmed"}
+
+
+@router.get("/profiler")
+async def get_profiler_state():
+    """Включенные маршруты и снятые профили"""
+    return {
+        "armed": profiler.armed(),
+        "captures": profiler.captures()
+    }
+
+
+@router.get("/profiler/captures/{capture_id}")
+async def get_capture(capture_id: str, format: str = "folded"):
+    """
+    Профиль запроса
+    
+    format=folded - стеки для flamegraph.pl / speedscope / inferno,
+    format=json - сводка и стеки с числом сэмплов
+    """
+    capture = profiler.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    
+    if format == "folded":
+        return PlainTextResponse(capture.folded())
+    return {
+        **capture.summary(),
+        "stacks": dict(capture.stacks.most_common())
+    }
@@ -1,15 +1,24 @@
 """
 Endpoints для аутентификации
 """
+import asyncio
+from typing import Dict
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
+from fastapi.security import OAuth2PasswordRequestForm
+from datetime import timedelta
 from pydantic import BaseModel
 from app.core.config import settings
+from app.core.security import (
+    create_access_token,
+    get_token_claims,
+    oauth2_scheme,
+    token_cache,
+    verify_password,
+)
+from app.core.timing import TimedRoute
 
-router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+router = APIRouter(route_class=TimedRoute)
 
 
 class Token(BaseModel):
@@ -33,30 +42,13 @@ fake_users_db = {
 }
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    """Хеширование пароля"""
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    return pwd_context.hash(password)
-
-
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    """Создание JWT токена"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+def _issue_token(username: str) -> Dict:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return {
+        "access_token": create_access_token(data={"sub": username}, expires_delta=access_token_expires),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
 
 
 @router.post("/login", response_model=Token)
@@ -64,55 +56,35 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Авторизация пользователя"""
     # Временная проверка (в продакшене использовать БД)
     user = fake_users_db.get(form_data.username)
-    if not user or not verify_password(form_data.password, "secret"):
+    # bcrypt намеренно медленный - проверка вне event loop
+    if not user or not await asyncio.to_thread(verify_password, form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user["username"]}, expires_delta=access_token_expires
-    )
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    }
+    return _issue_token(user["username"])
 
 
 @router.get("/validate")
-async def validate_token(token: str = Depends(oauth2_scheme)):
+async def validate_token(claims: Dict = Depends(get_token_claims)):
     """Проверка валидности токена"""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return {"valid": True, "username": username}
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    return {"valid": True, "username": claims["sub"]}
 
 
 @router.post("/refresh")
-async def refresh_token(token: str = Depends(oauth2_scheme)):
+async def refresh_token(claims: Dict = Depends(get_token_claims)):
     """Обновление токена"""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        new_token = create_access_token(
-            data={"sub": username}, expires_delta=access_token_expires
-        )
-        return {
-            "access_token": new_token,
-            "token_type": "bearer",
-            "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        }
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
+    # Claims уже проверены зависимостью, повторный decode не нужен
+    return _issue_token(claims["sub"])
+
+
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    claims: Dict = Depends(get_token_claims)
+):
+    """Отзыв текущего токена (общий для всех процессов API)"""
+    await asyncio.to_thread(token_cache.revoke, token, claims)
+    return {"status": "revoked"}
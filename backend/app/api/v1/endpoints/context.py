@@ -1,20 +1,17 @@
 """
 Endpoints для контекстных операций
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_service import VectorService
+from app.core.config import settings
+from app.core.timing import TimedRoute
 from app.services.graph_service import GraphService
+from app.services.cache_service import CacheService, project_of, neighborhood_key
+from app.api.deps import get_graph_service, get_cache_service
 
-router = APIRouter()
-
-# Инициализация сервисов
-embedding_service = EmbeddingService()
-vector_service = VectorService()
-graph_service = GraphService()
+router = APIRouter(route_class=TimedRoute)
 
 
 class ExplainRequest(BaseModel):
@@ -71,11 +68,22 @@ async def explain_code(request: ExplainRequest):
     )
 
 
-@router.get("/related/{entity_id}", response_model=RelatedResponse)
-async def get_related_entities(entity_id: str, entity_type: str = "code"):
+@router.get("/related/{entity_id:path}", response_model=RelatedResponse)
+async def get_related_entities(
+    entity_id: str,
+    entity_type: str = "code",
+    graph_service: GraphService = Depends(get_graph_service),
+    cache_service: CacheService = Depends(get_cache_service)
+):
     """Получить связанные сущности"""
     # Получение связей из графа
-    connections = await graph_service.get_entity_connections(entity_id)
+    connections = await cache_service.get_or_load(
+        "graph",
+        project_of(entity_id),
+        neighborhood_key("connections", entity_id, connection_type=None),
+        settings.CACHE_GRAPH_TTL,
+        lambda: graph_service.get_entity_connections(entity_id)
+    )
     
     # Преобразование в формат ответа
     related = []
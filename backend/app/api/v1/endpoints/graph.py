@@ -1,16 +1,19 @@
 """
 Endpoints для работы с графом связей
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.core.timing import TimedRoute
 from app.services.graph_service import GraphService
+from app.services.centrality_service import CentralityService
+from app.services.cache_service import CacheService, project_of, neighborhood_key
+from app.api.deps import get_graph_service, get_centrality_service, get_cache_service
 
-router = APIRouter()
-
-# Инициализация сервиса
-graph_service = GraphService()
+router = APIRouter(route_class=TimedRoute)
 
 
 class GraphNode(BaseModel):
@@ -36,62 +39,89 @@ class GraphResponse(BaseModel):
     edges: List[GraphEdge]
 
 
-@router.get("/entity/{entity_id}", response_model=GraphResponse)
+@router.get("/entity/{entity_id:path}", response_model=GraphResponse)
 async def get_entity_graph(
     entity_id: str,
     depth: int = 2,
-    max_nodes: int = 50
+    max_nodes: int = 50,
+    graph_service: GraphService = Depends(get_graph_service),
+    cache_service: CacheService = Depends(get_cache_service)
 ):
     """Получить граф для сущности"""
-    # Получение графа из Neo4j
-    graph_data = await graph_service.get_entity_graph(
-        entity_id=entity_id,
-        depth=depth,
-        max_nodes=max_nodes
+    # Получение графа из Neo4j (окрестность кешируется до переиндексации)
+    graph_data = await cache_service.get_or_load(
+        "graph",
+        project_of(entity_id),
+        neighborhood_key("graph", entity_id, depth=depth, max_nodes=max_nodes),
+        settings.CACHE_GRAPH_TTL,
+        lambda: graph_service.get_entity_graph(
+            entity_id=entity_id,
+            depth=depth,
+            max_nodes=max_nodes
+        )
     )
     
-    # Преобразование узлов
+    # Узлы и связи из GraphService уже в формате GraphNode/GraphEdge:
+    # ответ сериализуется напрямую, без модели на каждый элемент
     nodes = [
-        GraphNode(
-            id=node.get("id", ""),
-            type=node.get("type", "unknown"),
-            label=node.get("label", "Unknown"),
-            properties=node.get("properties", {})
-        )
+        {
+            "id": node.get("id", ""),
+            "type": node.get("type", "unknown"),
+            "label": node.get("label", "Unknown"),
+            "properties": node.get("properties", {})
+        }
         for node in graph_data.get("nodes", [])
     ]
     
-    # Преобразование связей
     edges = [
-        GraphEdge(
-            source=edge.get("source", ""),
-            target=edge.get("target", ""),
-            type=edge.get("type", "RELATES_TO"),
-            weight=edge.get("weight", 1.0),
-            properties=edge.get("properties", {})
-        )
+        {
+            "source": edge.get("source", ""),
+            "target": edge.get("target", ""),
+            "type": edge.get("type", "RELATES_TO"),
+            "weight": edge.get("weight", 1.0),
+            "properties": edge.get("properties", {})
+        }
         for edge in graph_data.get("edges", [])
     ]
     
-    return GraphResponse(
-        nodes=nodes,
-        edges=edges
-    )
+    return FastJSONResponse({"nodes": nodes, "edges": edges})
 
 
-@router.get("/connections/{entity_id}")
+@router.get("/connections/{entity_id:path}")
 async def get_entity_connections(
     entity_id: str,
-    connection_type: Optional[str] = None
+    connection_type: Optional[str] = None,
+    graph_service: GraphService = Depends(get_graph_service),
+    cache_service: CacheService = Depends(get_cache_service)
 ):
     """Получить связи сущности"""
-    connections = await graph_service.get_entity_connections(
-        entity_id=entity_id,
-        connection_type=connection_type
+    connections = await cache_service.get_or_load(
+        "graph",
+        project_of(entity_id),
+        neighborhood_key("connections", entity_id, connection_type=connection_type),
+        settings.CACHE_GRAPH_TTL,
+        lambda: graph_service.get_entity_connections(
+            entity_id=entity_id,
+            connection_type=connection_type
+        )
     )
     
-    return {
+    return FastJSONResponse({
         "entity_id": entity_id,
         "connections": connections
-    }
+    })
+
+
 
+@router.post("/centrality/{project_id}")
+async def compute_centrality(
+    project_id: str,
+    centrality_service: CentralityService = Depends(get_centrality_service),
+    cache_service: CacheService = Depends(get_cache_service)
+):
+    """Пересчитать PageRank и degree centrality проекта"""
+    stats = await centrality_service.compute_project_centrality(project_id)
+    # Новые оценки меняют порядок связей в закешированных окрестностях
+    await cache_service.invalidate_project(project_id)
+    
+    return stats
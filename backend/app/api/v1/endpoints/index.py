@@ -2,20 +2,18 @@
 Endpoints для индексации
 """
 import asyncio
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from app.core.timing import TimedRoute
 from app.services.indexing_service import IndexingService
+from app.services.job_queue import JobQueue
+from app.services.update_coalescer import FileUpdateCoalescer
+from app.api.deps import get_indexing_service, get_job_queue, get_update_coalescer
 
-router = APIRouter()
-
-# Инициализация сервиса
-indexing_service = IndexingService()
-
-# Временное хранилище статусов индексации
-indexing_status = {}
+router = APIRouter(route_class=TimedRoute)
 
 
 class IndexRequest(BaseModel):
@@ -23,12 +21,30 @@ class IndexRequest(BaseModel):
     project_path: str
     project_id: Optional[str] = None
     force: bool = False
+    # Ветка, тег или коммит: файлы берутся из git, а не из рабочей копии
+    git_ref: Optional[str] = None
+
+
+class FileChange(BaseModel):
+    """Измененный или добавленный файл"""
+    path: str  # Относительно корня проекта
+    content: Optional[str] = None  # Без содержимого файл читается с диска
+
+
+class FileUpdateRequest(BaseModel):
+    """Запрос на инкрементальное обновление файлов"""
+    project_id: str
+    project_path: Optional[str] = None
+    changed: List[FileChange] = []
+    deleted: List[str] = []
+    wait: bool = False  # Дождаться записи изменений
 
 
 class IndexStatus(BaseModel):
     """Статус индексации"""
     project_id: str
-    status: str  # pending, running, completed, failed
+    job_id: Optional[str] = None
+    status: str  # pending, running, completed, failed, cancelled
     progress: float  # 0.0 - 1.0
     total_files: int = 0
     processed_files: int = 0
@@ -37,83 +53,149 @@ class IndexStatus(BaseModel):
     error: Optional[str] = None
 
 
-async def index_project_task(project_id: str, project_path: str, force: bool):
-    """Задача индексации проекта в фоне"""
-    try:
-        indexing_status[project_id].status = "running"
-        
-        stats = await indexing_service.index_project(
-            project_path=project_path,
-            project_id=project_id,
-            force=force
-        )
-        
-        indexing_status[project_id].status = "completed"
-        indexing_status[project_id].progress = 1.0
-        indexing_status[project_id].total_files = stats.get("total_files", 0)
-        indexing_status[project_id].processed_files = stats.get("indexed_files", 0)
-        indexing_status[project_id].completed_at = datetime.now()
-        
-    except Exception as e:
-        indexing_status[project_id].status = "failed"
-        indexing_status[project_id].error = str(e)
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value else None
+
+
+def _job_status(job: Dict) -> IndexStatus:
+    """Статус индексации по записи задачи из очереди"""
+    total_files = job["total_files"]
+    if job["status"] == "completed":
+        progress = 1.0
+    else:
+        progress = job["processed_files"] / total_files if total_files else 0.0
+    
+    return IndexStatus(
+        project_id=job["project_id"],
+        job_id=job["id"],
+        status=job["status"],
+        progress=progress,
+        total_files=total_files,
+        processed_files=job["processed_files"],
+        started_at=_timestamp(job["started_at"] or job["created_at"]),
+        completed_at=_timestamp(job["completed_at"]),
+        error=job["error"]
+    )
 
 
 @router.post("/project")
-async def start_indexing(request: IndexRequest, background_tasks: BackgroundTasks):
-    """Запуск индексации проекта"""
+async def start_indexing(
+    request: IndexRequest,
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """Постановка индексации проекта в очередь"""
     project_id = request.project_id or f"project_{int(datetime.now().timestamp())}"
     
-    # Инициализация статуса
-    indexing_status[project_id] = IndexStatus(
-        project_id=project_id,
-        status="pending",
-        progress=0.0,
-        started_at=datetime.now()
+    # Задачу выполняет воркер очереди; повторный запрос по проекту
+    # с активной задачей возвращает ее, а не запускает вторую
+    job = await asyncio.to_thread(
+        job_queue.enqueue, project_id, request.project_path, request.force, request.git_ref
     )
     
-    # Запуск индексации в фоне
-    background_tasks.add_task(
-        index_project_task,
-        project_id,
-        request.project_path,
-        request.force
+    return {
+        "project_id": project_id,
+        "job_id": job["id"],
+        "status": job["status"],
+        "message": "Indexing queued"
+    }
+
+
+@router.post("/files")
+async def update_files(
+    request: FileUpdateRequest,
+    update_coalescer: FileUpdateCoalescer = Depends(get_update_coalescer)
+):
+    """Переиндексация отдельных файлов (события сохранения в редакторе)"""
+    if not request.project_path and any(change.content is None for change in request.changed):
+        raise HTTPException(
+            status_code=400,
+            detail="project_path is required for files without inline content"
+        )
+    
+    # Частые сохранения одного файла сливаются и записываются одним батчем
+    result = update_coalescer.submit(
+        project_id=request.project_id,
+        project_path=request.project_path,
+        changed={change.path: change.content for change in request.changed},
+        deleted=request.deleted
     )
     
+    if request.wait:
+        stats = await result
+        return {"status": "completed", **stats}
+    
     return {
-        "project_id": project_id,
-        "status": "started",
-        "message": "Indexing started"
+        "project_id": request.project_id,
+        "status": "queued",
+        "files": len(request.changed) + len(request.deleted)
     }
 
 
 @router.get("/status")
-async def get_index_status(project_id: Optional[str] = None):
+async def get_index_status(
+    project_id: Optional[str] = None,
+    job_queue: JobQueue = Depends(get_job_queue)
+):
     """Получить статус индексации"""
     if project_id:
-        status = indexing_status.get(project_id)
-        if not status:
+        job = await asyncio.to_thread(job_queue.latest_for_project, project_id)
+        if not job:
             raise HTTPException(status_code=404, detail="Project not found")
-        return status
+        return _job_status(job)
     
+    jobs = await asyncio.to_thread(job_queue.list_latest)
     return {
-        "projects": list(indexing_status.values())
+        "projects": [_job_status(job) for job in jobs]
     }
 
 
+@router.get("/jobs/{job_id}", response_model=IndexStatus)
+async def get_job(
+    job_id: str,
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """Получить задачу индексации"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IndexStatus)
+async def cancel_job(
+    job_id: str,
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """Отменить задачу индексации (выполняющаяся остановится после текущей пачки файлов)"""
+    job = await asyncio.to_thread(job_queue.cancel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
+
 @router.delete("/project/{project_id}")
-async def delete_index(project_id: str):
+async def delete_index(
+    project_id: str,
+    indexing_service: IndexingService = Depends(get_indexing_service),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
     """Удалить индекс проекта"""
-    # Удаление из сервисов
-    await indexing_service.delete_index(project_id)
+    active = await asyncio.to_thread(job_queue.active_for_project, project_id)
+    if active:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Indexing job {active['id']} is {active['status']}, cancel it first"
+        )
     
-    # Удаление статуса
-    if project_id in indexing_status:
-        del indexing_status[project_id]
+    # Удаление из сервисов
+    try:
+        deleted = await indexing_service.delete_index(project_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"{e}. Retry the request to finish the deletion")
     
     return {
         "project_id": project_id,
         "status": "deleted",
-        "message": "Index deleted successfully"
+        "message": "Index deleted successfully",
+        **deleted
     }
-
@@ -2,21 +2,23 @@
 Endpoints для поиска
 """
 import time
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
+import numpy as np
 
-from app.services.embedding_service import EmbeddingService
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.core.timing import TimedRoute
+
+from app.services.embedding_service import EmbeddingService, EmbeddingUnavailableError
 from app.services.vector_service import VectorService
 from app.services.graph_service import GraphService
+from app.services.cache_service import CacheService, project_of, neighborhood_key
+from app.api.deps import get_embedding_service, get_vector_service, get_graph_service, get_cache_service
 
-router = APIRouter()
-
-# Инициализация сервисов
-embedding_service = EmbeddingService()
-vector_service = VectorService()
-graph_service = GraphService()
+router = APIRouter(route_class=TimedRoute)
 
 
 class SearchResult(BaseModel):
@@ -45,15 +47,77 @@ class SearchRequest(BaseModel):
     filters: Optional[dict] = None
 
 
+async def _embed_query(
+    query: str,
+    embedding_service: EmbeddingService,
+    cache_service: CacheService
+) -> Tuple[np.ndarray, bool]:
+    """
+    Эмбеддинг запроса с кешированием (повторные запросы не идут в модель)
+    
+    Returns:
+        Вектор и признак dummy-заглушки (модель недоступна): заглушка и
+        найденные по ней страницы не кешируются
+    """
+    query_vector = await cache_service.get_embedding(query)
+    if query_vector is None:
+        try:
+            query_vector = await embedding_service.generate_embedding(query, allow_fallback=False)
+        except EmbeddingUnavailableError:
+            return await embedding_service.generate_embedding(query), True
+        await cache_service.set_embedding(query, query_vector)
+    return query_vector, False
+
+
+def _search_response(query: str, results: List[dict], start_time: float) -> FastJSONResponse:
+    """
+    Ответ в формате SearchResponse без повторной валидации
+    
+    Результаты собираются из данных собственных сервисов, поэтому
+    модель ответа нужна только для схемы OpenAPI.
+    """
+    return FastJSONResponse({
+        "query": query,
+        "results": results,
+        "total": len(results),
+        "took_ms": int((time.time() - start_time) * 1000)
+    })
+
+
+def _vector_result(result: dict) -> dict:
+    """Результат векторного поиска в формате SearchResult"""
+    payload = result.get("payload", {})
+    return {
+        "id": result.get("id", ""),
+        "title": payload.get("name", "Unknown"),
+        "content": payload.get("content", "")[:200],  # Первые 200 символов
+        "type": payload.get("type", "unknown"),
+        "score": result.get("score", 0.0),
+        "metadata": payload
+    }
+
+
+def _page_key(kind: str, request: SearchRequest) -> dict:
+    """Параметры, определяющие страницу результатов"""
+    return {
+        "kind": kind,
+        "query": request.query,
+        "limit": request.limit,
+        "offset": request.offset,
+        "filters": request.filters
+    }
+
+
 @router.post("/text", response_model=SearchResponse)
-async def text_search(request: SearchRequest):
+async def text_search(
+    request: SearchRequest,
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    cache_service: CacheService = Depends(get_cache_service)
+):
     """Текстовый поиск (использует семантический поиск как fallback)"""
     start_time = time.time()
     
-    # Для текстового поиска используем семантический поиск
-    # В будущем можно добавить полнотекстовый поиск через Whoosh/Elasticsearch
-    query_vector = await embedding_service.generate_embedding(request.query)
-    
     # Фильтры
     project_id = None
     entity_type = None
@@ -61,45 +125,46 @@ async def text_search(request: SearchRequest):
         project_id = request.filters.get("project_id")
         entity_type = request.filters.get("type")
     
-    # Поиск
-    vector_results = await vector_service.search(
-        query_vector=query_vector,
-        limit=request.limit,
-        project_id=project_id,
-        entity_type=entity_type
-    )
+    # Для текстового поиска используем семантический поиск
+    # В будущем можно добавить полнотекстовый поиск через Whoosh/Elasticsearch
+    query_vector, is_fallback = await _embed_query(request.query, embedding_service, cache_service)
+    
+    async def load_page():
+        return await vector_service.search(
+            query_vector=query_vector,
+            limit=request.limit,
+            project_id=project_id,
+            entity_type=entity_type
+        )
+    
+    # Поиск (страница результатов кешируется до переиндексации проекта,
+    # найденная по заглушке - нет)
+    if is_fallback:
+        vector_results = await load_page()
+    else:
+        vector_results = await cache_service.get_or_load(
+            "search",
+            project_id,
+            _page_key("text", request),
+            settings.CACHE_SEARCH_TTL,
+            load_page
+        )
     
     # Преобразование результатов
-    results = []
-    for result in vector_results:
-        payload = result.get("payload", {})
-        results.append(SearchResult(
-            id=result.get("id", ""),
-            title=payload.get("name", "Unknown"),
-            content=payload.get("content", "")[:200],  # Первые 200 символов
-            type=payload.get("type", "unknown"),
-            score=result.get("score", 0.0),
-            metadata=payload
-        ))
-    
-    took_ms = int((time.time() - start_time) * 1000)
-    
-    return SearchResponse(
-        query=request.query,
-        results=results,
-        total=len(results),
-        took_ms=took_ms
-    )
+    results = [_vector_result(result) for result in vector_results]
+    return _search_response(request.query, results, start_time)
 
 
 @router.post("/semantic", response_model=SearchResponse)
-async def semantic_search(request: SearchRequest):
+async def semantic_search(
+    request: SearchRequest,
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    cache_service: CacheService = Depends(get_cache_service)
+):
     """Семантический поиск (векторный)"""
     start_time = time.time()
     
-    # Генерация эмбеддинга для запроса
-    query_vector = await embedding_service.generate_embedding(request.query)
-    
     # Фильтры
     project_id = None
     entity_type = None
@@ -110,45 +175,48 @@ async def semantic_search(request: SearchRequest):
         entity_type = request.filters.get("type")
         score_threshold = request.filters.get("score_threshold", 0.3)
     
-    # Векторный поиск
-    vector_results = await vector_service.search(
-        query_vector=query_vector,
-        limit=request.limit,
-        score_threshold=score_threshold,
-        project_id=project_id,
-        entity_type=entity_type
-    )
+    # Генерация эмбеддинга для запроса
+    query_vector, is_fallback = await _embed_query(request.query, embedding_service, cache_service)
+    
+    async def load_page():
+        return await vector_service.search(
+            query_vector=query_vector,
+            limit=request.limit,
+            score_threshold=score_threshold,
+            project_id=project_id,
+            entity_type=entity_type
+        )
+    
+    # Векторный поиск (страница по заглушке не кешируется)
+    if is_fallback:
+        vector_results = await load_page()
+    else:
+        vector_results = await cache_service.get_or_load(
+            "search",
+            project_id,
+            _page_key("semantic", request),
+            settings.CACHE_SEARCH_TTL,
+            load_page
+        )
     
     # Преобразование результатов
-    results = []
-    for result in vector_results:
-        payload = result.get("payload", {})
-        results.append(SearchResult(
-            id=result.get("id", ""),
-            title=payload.get("name", "Unknown"),
-            content=payload.get("content", "")[:200],
-            type=payload.get("type", "unknown"),
-            score=result.get("score", 0.0),
-            metadata=payload
-        ))
-    
-    took_ms = int((time.time() - start_time) * 1000)
-    
-    return SearchResponse(
-        query=request.query,
-        results=results,
-        total=len(results),
-        took_ms=took_ms
-    )
+    results = [_vector_result(result) for result in vector_results]
+    return _search_response(request.query, results, start_time)
 
 
 @router.post("/graph", response_model=SearchResponse)
-async def graph_search(request: SearchRequest):
+async def graph_search(
+    request: SearchRequest,
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    graph_service: GraphService = Depends(get_graph_service),
+    cache_service: CacheService = Depends(get_cache_service)
+):
     """Поиск по графу связей"""
     start_time = time.time()
     
     # Сначала находим начальные сущности через семантический поиск
-    query_vector = await embedding_service.generate_embedding(request.query)
+    query_vector, _ = await _embed_query(request.query, embedding_service, cache_service)
     
     # Находим релевантные сущности
     initial_results = await vector_service.search(
@@ -165,29 +233,39 @@ async def graph_search(request: SearchRequest):
         entity_id = result.get("id", "")
         if entity_id and entity_id not in seen_ids:
             seen_ids.add(entity_id)
-            connections = await graph_service.get_entity_connections(entity_id)
+            connections = await cache_service.get_or_load(
+                "graph",
+                project_of(entity_id),
+                neighborhood_key("connections", entity_id, connection_type=None),
+                settings.CACHE_GRAPH_TTL,
+                lambda: graph_service.get_entity_connections(entity_id)
+            )
             all_connections.extend(connections)
     
+    # Ранжирование по весу связи (PageRank цели), дубликаты отбрасываются
+    all_connections.sort(key=lambda conn: conn.get("score", 0.0), reverse=True)
+    unique_connections = []
+    seen_connections = set()
+    for conn in all_connections:
+        conn_id = conn.get("id", "")
+        if conn_id in seen_connections:
+            continue
+        seen_connections.add(conn_id)
+        unique_connections.append(conn)
+    
     # Преобразование в результаты поиска
-    results = []
-    for conn in all_connections[:request.limit]:
-        results.append(SearchResult(
-            id=conn.get("id", ""),
-            title=conn.get("title", "Unknown"),
-            content=f"Related via {conn.get('relation_type', 'unknown')}",
-            type=conn.get("type", "unknown"),
-            score=conn.get("score", 0.0),
-            metadata={"relation_type": conn.get("relation_type")}
-        ))
-    
-    took_ms = int((time.time() - start_time) * 1000)
-    
-    return SearchResponse(
-        query=request.query,
-        results=results,
-        total=len(results),
-        took_ms=took_ms
-    )
+    results = [
+        {
+            "id": conn.get("id", ""),
+            "title": conn.get("title", "Unknown"),
+            "content": f"Related via {conn.get('relation_type', 'unknown')}",
+            "type": conn.get("type", "unknown"),
+            "score": conn.get("score", 0.0),
+            "metadata": {"relation_type": conn.get("relation_type")}
+        }
+        for conn in unique_connections[:request.limit]
+    ]
+    return _search_response(request.query, results, start_time)
 
 
 @router.get("/history")
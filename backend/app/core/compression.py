@@ -0,0 +1,171 @@
+"""
+Сжатие больших ответов (brotli или gzip по Accept-Encoding)
+"""
+import zlib
+from typing import Optional
+
+from app.core.config import settings
+from app.core.timing import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/openmetrics-text")
+
+# Порядок предпочтения сервера при равных q
+_SERVER_PREFERENCE = ("br", "gzip")
+
+
+def _accepted_encodings(header: str) -> dict:
+    """Разбор Accept-Encoding: кодировка -> q"""
+    encodings = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    """
+    Кодировка ответа с наибольшим q клиента
+    
+    При равных q выбирается br (если установлен brotli), затем gzip. None -
+    клиент не принимает сжатие или явно предпочитает identity.
+    """
+    encodings = _accepted_encodings(header)
+    wildcard = encodings.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in _SERVER_PREFERENCE:
+        if encoding == "br" and brotli is None:
+            continue
+        quality = encodings.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    if best is not None and encodings.get("identity", 0.0) > best_quality:
+        return None
+    return best
+
+
+def _add_vary(headers: list, value: bytes) -> None:
+    """Добавление значения в Vary: к существующему заголовку, без второго Vary"""
+    for index, (key, existing) in enumerate(headers):
+        if key.lower() != b"vary":
+            continue
+        tokens = {token.strip().lower() for token in existing.split(b",")}
+        if value.lower() not in tokens and b"*" not in tokens:
+            headers[index] = (key, existing + b", " + value)
+        return
+    headers.append((b"vary", value))
+
+
+class _Compressor:
+    """Потоковый компрессор с общим интерфейсом для gzip и brotli"""
+    
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self.compress = compressor.process
+            self.finish = compressor.finish
+        else:
+            # wbits=31: формат gzip (заголовок и CRC)
+            compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = compressor.compress
+            self.finish = compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов не меньше COMPRESSION_MIN_SIZE байт
+    
+    Начало ответа задерживается до первого фрагмента тела: маленькие ответы
+    и уже сжатые (Content-Encoding) или несжимаемые типы уходят без
+    изменений. Время сжатия учитывается в Server-Timing как compress.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+        
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = {key.lower(): value for key, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or not content_type.startswith(_COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                return
+            
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if compressor is None:
+                if not more_body and len(body) < settings.COMPRESSION_MIN_SIZE:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                
+                compressor = _Compressor(encoding)
+                with span("compress"):
+                    compressed = compressor.compress(body)
+                    if not more_body:
+                        compressed += compressor.finish()
+                
+                headers = [
+                    (key, value) for key, value in start_message.get("headers", [])
+                    if key.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                _add_vary(headers, b"Accept-Encoding")
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                await send({**start_message, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+            
+            with span("compress"):
+                compressed = compressor.compress(body)
+                if not more_body:
+                    compressed += compressor.finish()
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
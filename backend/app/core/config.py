@@ -2,7 +2,7 @@
 Конфигурация приложения
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 from pathlib import Path
 
@@ -16,6 +16,10 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    # Процессов API (>1 - prefork: модель загружается один раз до fork)
+    WEB_WORKERS: int = 1
+    LOG_LEVEL: Optional[str] = None  # По умолчанию DEBUG при DEBUG=True, иначе INFO
+    LOG_RATE_LIMIT_INTERVAL: float = 1.0  # Секунд между debug-записями на сущность одного вида
     
     # CORS
     CORS_ORIGINS: List[str] = [
@@ -28,22 +32,68 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ADMIN_USERS: List[str] = ["admin"]  # Доступ к /api/v1/admin
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # Проверенные токены в LRU (0 - без кеша)
+    # Отозванные токены: общие для всех процессов API (prefork-воркеров)
+    AUTH_REVOKED_TOKENS_DB: Optional[Path] = None  # По умолчанию DATA_DIR / "revoked_tokens.sqlite3"
+    AUTH_REVOCATION_REFRESH_SECONDS: float = 1.0  # Как часто перечитывать список (задержка logout в других процессах)
+    
+    # Диагностика запросов
+    SERVER_TIMING_ENABLED: bool = True  # Заголовок Server-Timing с разбивкой времени
+    PROFILER_INTERVAL_MS: float = 5.0  # Интервал сэмплирования стеков
+    PROFILER_MAX_REQUESTS: int = 50  # Предел запросов на одно включение
+    PROFILER_MAX_CAPTURES: int = 100  # Хранимые профили (старые вытесняются)
+    
+    # Сжатие ответов (br при установленном brotli, иначе gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Ответы меньше отдаются без сжатия, байт
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11; выше 5 заметно дороже по CPU
     
     # Базы данных
     # Qdrant (Vector DB)
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
     QDRANT_COLLECTION: str = "aethernexus_vectors"
+    QDRANT_UPSERT_BATCH_SIZE: int = 256
+    # Keyword-индексы payload для фильтров поиска и удаления
+    QDRANT_PAYLOAD_INDEXES: List[str] = ["project_id", "type", "file_path"]
+    # Изоляция проектов: none - общая коллекция с фильтром project_id,
+    # collection - коллекция на проект, shard_key - custom shard key на проект
+    # (кластер Qdrant 1.7+)
+    QDRANT_PROJECT_ISOLATION: str = "none"
+    # Одна точка на уникальное содержимое сущности со ссылками на все его
+    # копии (проекты, форки); только при QDRANT_PROJECT_ISOLATION=none
+    QDRANT_DEDUP_BY_CONTENT: bool = False
     
     # Neo4j (Graph DB)
+    # Для кластера используйте схему neo4j:// - чтения уйдут на реплики
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    NEO4J_DATABASE: str = ""  # Пусто - БД по умолчанию
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 100
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 60.0
+    NEO4J_MAX_TRANSACTION_RETRY_TIME: float = 30.0
+    NEO4J_DELETE_BATCH_SIZE: int = 10000
     
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    # Общий кеш запросов; без Redis работает только локальный уровень
+    REDIS_ENABLED: bool = False
+    CACHE_KEY_PREFIX: str = "aethernexus"
+    CACHE_LOCAL_MAX_ITEMS: int = 10000
+    CACHE_LOCAL_TTL: int = 60  # Секунд в локальном LRU
+    CACHE_EMBEDDING_TTL: int = 86400
+    CACHE_SEARCH_TTL: int = 300
+    CACHE_GRAPH_TTL: int = 600
+    CACHE_VERSION_TTL: float = 1.0  # Как часто сверять версию проекта с Redis (или SQLite без Redis)
+    # Версии проектов без Redis: общие для процессов API и воркеров индексации
+    CACHE_VERSIONS_DB: Optional[Path] = None  # По умолчанию DATA_DIR / "cache_versions.sqlite3"
+    CACHE_REDIS_TIMEOUT: float = 0.5
+    CACHE_REDIS_RETRY_SECONDS: float = 30.0
     
     # Kafka (опционально)
     KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
@@ -69,6 +119,58 @@ class Settings(BaseSettings):
     # ML модели
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
+    # Бэкенд инференса: sentence-transformers (PyTorch fp32) или onnx (ONNX Runtime)
+    EMBEDDING_BACKEND: str = "sentence-transformers"
+    EMBEDDING_QUANTIZE: bool = False  # Динамическая int8-квантизация (для onnx)
+    EMBEDDING_NUM_THREADS: int = 0  # 0 - по умолчанию библиотеки
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_SEQ_LENGTH: int = 256
+    EMBEDDING_ONNX_DIR: Optional[Path] = None  # По умолчанию DATA_DIR / "onnx"
+    # Пул процессов для массовой индексации (0 - модель основного процесса)
+    EMBEDDING_POOL_WORKERS: int = 0
+    EMBEDDING_POOL_CHUNK_SIZE: int = 64
+    EMBEDDING_POOL_THREADS_PER_WORKER: int = 1
+    
+    # Индексация
+    INDEXING_FILE_BATCH_SIZE: int = 32  # Файлов в одном батче эмбеддингов
+    # Пул процессов разбора файлов (0 - разбор в потоке процесса индексации)
+    INDEXING_PARSE_WORKERS: int = 0
+    INDEXING_PARSE_CHUNK_SIZE: int = 8  # Файлов в одной задаче воркера разбора
+    # Сравнение сущностей с сохраненными: векторизуются только изменившиеся
+    INDEXING_ENTITY_DIFF: bool = True
+    # Вектор файла с извлеченными сущностями: embed - эмбеддинг всего файла,
+    # pool - среднее векторов сущностей верхнего уровня, none - без точки файла
+    INDEXING_FILE_VECTOR_MODE: str = "pool"
+    # Обнаружение файлов: правила .gitignore и файла проекта (тот же синтаксис)
+    INDEXING_IGNORE_FILE: str = ".aethernexusignore"
+    INDEXING_IGNORE_PATTERNS: List[str] = []  # Дополнительные шаблоны для всех проектов
+    INDEXING_MAX_FILE_SIZE: int = 1_000_000  # Файлы больше не индексируются, байт
+    INDEXING_SNIFF_BYTES: int = 8192  # Начало файла для проверки на бинарность и минификацию
+    INDEXING_MINIFIED_LINE_LENGTH: int = 300  # Средняя длина строки минифицированного файла
+    INDEXING_SKIP_GENERATED: bool = True  # Пропуск файлов с маркером @generated / DO NOT EDIT
+    # Очередь задач индексации (SQLite) и процессы-воркеры
+    INDEXING_JOBS_DB: Optional[Path] = None  # По умолчанию DATA_DIR / "indexing_jobs.sqlite3"
+    # 0 - очередь обрабатывается в цикле событий процесса API (только для разработки:
+    # эмбеддинги и запросы к Qdrant блокируют обработку запросов)
+    INDEXING_WORKERS: int = 1
+    INDEXING_MAX_CONCURRENT_JOBS: int = 1  # Общий лимит одновременных задач
+    INDEXING_JOB_POLL_INTERVAL: float = 1.0
+    INDEXING_JOB_HEARTBEAT_INTERVAL: float = 5.0
+    INDEXING_JOB_STALE_TIMEOUT: float = 60.0  # Задача без heartbeat возвращается в очередь
+    INDEXING_JOB_MAX_ATTEMPTS: int = 3  # После стольких падений воркера задача помечается failed
+    # Инкрементальные обновления файлов (сохранения в редакторе)
+    INDEXING_UPDATE_DEBOUNCE: float = 0.3  # Пауза после последнего изменения перед записью
+    INDEXING_UPDATE_MAX_DELAY: float = 2.0  # Предел ожидания при непрерывных сохранениях
+    # Кеш сущностей и эмбеддингов по SHA blob-объектов git (индексация git_ref)
+    GIT_BLOB_CACHE_ENABLED: bool = True
+    GIT_BLOB_CACHE_DB: Optional[Path] = None  # По умолчанию DATA_DIR / "blob_cache.sqlite3"
+    
+    # Центральность графа (PageRank / degree) для ранжирования связей
+    CENTRALITY_ENABLED: bool = True
+    CENTRALITY_DAMPING: float = 0.85
+    CENTRALITY_MAX_ITERATIONS: int = 100
+    CENTRALITY_TOLERANCE: float = 1e-6
+    CENTRALITY_WRITE_BATCH_SIZE: int = 5000
     
     class Config:
         env_file = ".env"
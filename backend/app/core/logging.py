@@ -1,36 +1,160 @@
 """
 Настройка логирования
+
+Обработчики (stdout и файл) работают в фоновом потоке QueueListener:
+вызов логгера в event loop или цикле индексации только кладет запись
+в очередь, форматирование и запись на диск выполняются вне его.
 """
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
-from pathlib import Path
+import threading
+import time
+from typing import Dict, List, Optional
 from app.core.config import settings
 
+_listener: Optional[logging.handlers.QueueListener] = None
+_restart_after_fork = False
+
+
+class _LogQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в потоке вызывающего"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Стандартный prepare() целиком форматирует запись (время, формат
+        # обработчика); здесь подставляются только аргументы, чтобы
+        # изменяемые объекты не поменялись до записи, остальное делает
+        # форматтер обработчика в потоке listener
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 def setup_logging():
     """Настройка системы логирования"""
+    global _listener
+    if _listener is not None:
+        return
+    
     log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     date_format = "%Y-%m-%d %H:%M:%S"
     
     # Базовый уровень логирования
-    log_level = logging.DEBUG if settings.DEBUG else logging.INFO
-    
-    # Настройка root logger
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler(
-                settings.LOGS_DIR / "aethernexus.log",
-                encoding="utf-8"
-            )
-        ]
-    )
+    if settings.LOG_LEVEL:
+        log_level = logging.getLevelName(settings.LOG_LEVEL.upper())
+    else:
+        log_level = logging.DEBUG if settings.DEBUG else logging.INFO
+    
+    formatter = logging.Formatter(log_format, datefmt=date_format)
+    handlers: List[logging.Handler] = [
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler(
+            settings.LOGS_DIR / "aethernexus.log",
+            encoding="utf-8"
+        )
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # Настройка root logger: только очередь, обработчики - в listener
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_LogQueueHandler(log_queue))
+    root.setLevel(log_level)
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
     
     # Настройка уровней для внешних библиотек
     logging.getLogger("uvicorn").setLevel(logging.INFO)
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
 
+
+def stop_logging():
+    """Запись оставшихся в очереди сообщений и остановка listener"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def _stop_before_fork():
+    """
+    Остановка listener перед fork
+    
+    Поток listener не копируется в дочерний процесс, а блокировки, которые
+    он держит в момент fork, остались бы захваченными навсегда. Очередь
+    дописывается, после fork оба процесса запускают свой listener.
+    """
+    global _restart_after_fork
+    _restart_after_fork = _listener is not None
+    stop_logging()
+
+
+def _start_after_fork():
+    global _restart_after_fork
+    if _restart_after_fork:
+        _restart_after_fork = False
+        setup_logging()
+
+
+atexit.register(stop_logging)
+os.register_at_fork(
+    before=_stop_before_fork,
+    after_in_parent=_start_after_fork,
+    after_in_child=_start_after_fork
+)
+
+
+class RateLimitedLogger:
+    """
+    Логгер событий на сущность (файл, точка, узел графа)
+    
+    По каждому ключу пишется не больше одной записи за interval секунд,
+    число пропущенных добавляется к следующей записанной. Если уровень
+    отключен, вызов стоит одну проверку isEnabledFor.
+    """
+    
+    def __init__(self, logger: logging.Logger, interval: Optional[float] = None):
+        self.logger = logger
+        self.interval = settings.LOG_RATE_LIMIT_INTERVAL if interval is None else interval
+        # Ключ -> [время последней записи, пропущено]
+        self._state: Dict[str, list] = {}
+        self._lock = threading.Lock()
+    
+    def log(self, level: int, key: str, msg: str, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.setdefault(key, [float("-inf"), 0])
+            if now - state[0] < self.interval:
+                state[1] += 1
+                return
+            suppressed = state[1]
+            state[0] = now
+            state[1] = 0
+        
+        if suppressed:
+            self.logger.log(level, msg + " (+%d similar suppressed)", *args, suppressed)
+        else:
+            self.logger.log(level, msg, *args)
+    
+    def debug(self, key: str, msg: str, *args):
+        self.log(logging.DEBUG, key, msg, *args)
+    
+    def warning(self, key: str, msg: str, *args):
+        self.log(logging.WARNING, key, msg, *args)
@@ -0,0 +1,200 @@
+"""
+Метрики Prometheus
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+from app.core.timing import record
+
+# Границы гистограмм: от единиц миллисекунд (кеш, Qdrant) до минут (стадии индексации)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "aethernexus_http_request_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+EMBEDDING_SECONDS = Histogram(
+    "aethernexus_embedding_seconds",
+    "Время генерации батча эмбеддингов",
+    ["backend", "batch_size"],
+    buckets=LATENCY_BUCKETS
+)
+EMBEDDING_ERRORS = Counter(
+    "aethernexus_embedding_errors_total",
+    "Ошибки генерации эмбеддингов",
+    ["backend", "batch_size"]
+)
+
+QDRANT_SECONDS = Histogram(
+    "aethernexus_qdrant_seconds",
+    "Время операции Qdrant",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+QDRANT_ERRORS = Counter(
+    "aethernexus_qdrant_errors_total",
+    "Ошибки операций Qdrant",
+    ["operation"]
+)
+
+NEO4J_SECONDS = Histogram(
+    "aethernexus_neo4j_seconds",
+    "Время транзакции Neo4j",
+    ["query"],
+    buckets=LATENCY_BUCKETS
+)
+NEO4J_ERRORS = Counter(
+    "aethernexus_neo4j_errors_total",
+    "Ошибки транзакций Neo4j",
+    ["query"]
+)
+
+INDEXING_STAGE_SECONDS = Histogram(
+    "aethernexus_indexing_stage_seconds",
+    "Время стадии индексации",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+INDEXING_STAGE_ERRORS = Counter(
+    "aethernexus_indexing_stage_errors_total",
+    "Ошибки стадий индексации",
+    ["stage"]
+)
+
+INDEXING_QUEUE_DEPTH = Gauge(
+    "aethernexus_indexing_queue_jobs",
+    "Задачи индексации в очереди по статусу",
+    ["status"],
+    multiprocess_mode="livemostrecent"
+)
+UPDATE_QUEUE_DEPTH = Gauge(
+    "aethernexus_update_queue_files",
+    "Файлы, ожидающие инкрементального обновления",
+    multiprocess_mode="livesum"
+)
+CACHE_HIT_RATE = Gauge(
+    "aethernexus_cache_hit_ratio",
+    "Доля попаданий в кеш по пространству ключей",
+    ["namespace"],
+    multiprocess_mode="livemostrecent"
+)
+INDEXED_ENTITIES = Gauge(
+    "aethernexus_indexed_entities",
+    "Число проиндексированных сущностей проекта",
+    ["project_id"],
+    multiprocess_mode="livemostrecent"
+)
+
+
+def batch_size_bucket(size: int) -> str:
+    """Метка размера батча (ограниченное число значений)"""
+    for limit in (1, 8, 32, 128, 512):
+        if size <= limit:
+            return str(limit)
+    return "inf"
+
+
+@contextmanager
+def track(
+    histogram: Histogram,
+    errors: Optional[Counter] = None,
+    span: Optional[str] = None,
+    **labels
+) -> Iterator[None]:
+    """
+    Замер времени блока в гистограмму и подсчет исключений
+    
+    Args:
+        span: Компонент Server-Timing текущего запроса, к которому
+            добавляется это время
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.labels(**labels).inc()
+        raise
+    finally:
+        took = time.perf_counter() - started
+        histogram.labels(**labels).observe(took)
+        if span is not None:
+            record(span, took)
+
+
+def render_metrics() -> bytes:
+    """
+    Текст метрик для /metrics
+    
+    При заданном PROMETHEUS_MULTIPROC_DIR агрегируются метрики всех
+    процессов (воркеры API и индексации), иначе - текущего процесса.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: латентность запросов по шаблону маршрута"""
+    
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+    
+    def _route_path(self, scope) -> str:
+        # Шаблон пути (без ID), чтобы число рядов метрики было ограничено
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        
+        if endpoint not in self._route_paths:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    self._route_paths[endpoint] = route.path
+                    break
+            else:
+                self._route_paths[endpoint] = "unmatched"
+        return self._route_paths[endpoint]
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = {"code": 500}
+        
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=self._route_path(scope),
+                status=str(status["code"])
+            ).observe(time.perf_counter() - started)
+
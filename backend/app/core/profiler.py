@@ -0,0 +1,154 @@
+"""
+Сэмплирующий профилировщик запросов по требованию
+"""
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+# Кадры, в которых поток простаивает (ожидание блокировки, очереди, сокета)
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class ProfileCapture:
+    """Сэмплы стеков, снятые во время одного запроса"""
+    
+    def __init__(self, route: str, interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+    
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (Path(code.co_filename).name, code.co_name) in _IDLE_FRAMES:
+                    continue
+                
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration_ms = (time.time() - self.started_at) * 1000
+    
+    def folded(self) -> str:
+        """Стеки в формате folded (flamegraph.pl, speedscope, inferno)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+    
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples
+        }
+
+
+class SamplingProfiler:
+    """
+    Профилирование следующих N запросов выбранного маршрута
+    
+    Пока маршрут включен, на время каждого его запроса запускается поток,
+    который с заданным интервалом снимает стеки всех потоков процесса
+    через sys._current_frames(). Запросы других маршрутов, выполняющиеся
+    в это же время в event loop, тоже попадают в сэмплы. Состояние
+    хранится в процессе: при нескольких воркерах uvicorn профилируется
+    тот, который принял запрос на включение.
+    """
+    
+    def __init__(self):
+        self._armed: Dict[str, Dict] = {}
+        self._captures: "OrderedDict[str, ProfileCapture]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def arm(self, route: str, requests: int, interval_ms: float) -> Dict:
+        """Включение профилирования следующих requests запросов маршрута"""
+        state = {
+            "route": route,
+            "remaining": min(requests, settings.PROFILER_MAX_REQUESTS),
+            "interval_ms": interval_ms
+        }
+        with self._lock:
+            self._armed[route] = state
+        return dict(state)
+    
+    def disarm(self, route: str) -> bool:
+        with self._lock:
+            return self._armed.pop(route, None) is not None
+    
+    def armed(self) -> List[Dict]:
+        with self._lock:
+            return [dict(state) for state in self._armed.values()]
+    
+    def start_capture(self, route: str) -> Optional[ProfileCapture]:
+        """Запуск сэмплирования, если маршрут включен (вызывается на каждый запрос)"""
+        if not self._armed:
+            return None
+        
+        with self._lock:
+            state = self._armed.get(route)
+            if state is None:
+                return None
+            state["remaining"] -= 1
+            if state["remaining"] <= 0:
+                del self._armed[route]
+        
+        capture = ProfileCapture(route, state["interval_ms"] / 1000)
+        capture.start()
+        return capture
+    
+    def finish_capture(self, capture: ProfileCapture):
+        capture.stop()
+        with self._lock:
+            self._captures[capture.id] = capture
+            while len(self._captures) > settings.PROFILER_MAX_CAPTURES:
+                self._captures.popitem(last=False)
+    
+    def captures(self) -> List[Dict]:
+        with self._lock:
+            return [capture.summary() for capture in self._captures.values()]
+    
+    def get(self, capture_id: str) -> Optional[ProfileCapture]:
+        with self._lock:
+            return self._captures.get(capture_id)
+
+
+# Единственный на процесс профилировщик
+profiler = SamplingProfiler()
@@ -0,0 +1,48 @@
+"""
+Быстрая сериализация JSON-ответов
+
+FastJSONResponse рендерит ответ через orjson (без него - стандартный json).
+Обработчики поиска и графа возвращают ее напрямую со словарями из
+собственных сервисов: FastAPI не валидирует такой ответ по response_model
+и не проходит его jsonable_encoder, а response_model остается только
+для схемы OpenAPI.
+"""
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Типы вне JSON (datetime, модели Pydantic, значения драйверов БД)"""
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Компактный JSON в UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, сериализуемый orjson при его наличии"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
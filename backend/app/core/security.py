@@ -0,0 +1,238 @@
+"""
+Пароли, JWT-токены и зависимости аутентификации
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+
+
+@lru_cache(maxsize=1)
+def _pwd_context():
+    """Контекст хеширования паролей (один на процесс, создается при первом вызове)"""
+    from passlib.context import CryptContext
+    
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля"""
+    return _pwd_context().verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    """Хеширование пароля"""
+    return _pwd_context().hash(password)
+
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+    """Создание JWT токена (jti позволяет отозвать конкретный токен)"""
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def _credentials_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class RevokedTokenStore:
+    """
+    Отозванные токены в SQLite, общие для процессов API
+    
+    Проверка идет по копии списка в памяти: она перечитывается из файла не
+    чаще раза в AUTH_REVOCATION_REFRESH_SECONDS, поэтому запросы не ходят
+    в SQLite, а logout в одном prefork-воркере виден остальным не позже
+    этого интервала (в своем процессе - сразу). Записи удаляются после
+    истечения exp токена.
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(
+            db_path or settings.AUTH_REVOKED_TOKENS_DB or settings.DATA_DIR / "revoked_tokens.sqlite3"
+        )
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS revoked (token_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        # jti или подпись -> exp
+        self._revoked: Dict[str, float] = {}
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+    
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    
+    def _refresh(self):
+        """Перечитывание списка, если копия в памяти устарела"""
+        now = time.monotonic()
+        if now < self._refresh_at:
+            return
+        with self._lock:
+            if now < self._refresh_at:
+                return
+            rows = self._conn().execute(
+                "SELECT token_id, expires_at FROM revoked WHERE expires_at > ?", (time.time(),)
+            ).fetchall()
+            self._revoked = dict(rows)
+            self._refresh_at = now + settings.AUTH_REVOCATION_REFRESH_SECONDS
+    
+    def contains(self, token_id: str) -> bool:
+        self._refresh()
+        if not self._revoked:
+            return False
+        expires_at = self._revoked.get(token_id)
+        return expires_at is not None and expires_at > time.time()
+    
+    def add(self, token_id: str, expires_at: float):
+        with self._lock:
+            self._revoked = {**self._revoked, token_id: expires_at}
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO revoked (token_id, expires_at) VALUES (?, ?)", (token_id, expires_at)
+        )
+        # Истекшие токены и так не пройдут проверку exp
+        conn.execute("DELETE FROM revoked WHERE expires_at <= ?", (time.time(),))
+
+
+class TokenCache:
+    """
+    LRU проверенных токенов и список отозванных
+    
+    Токен с проверенной подписью хранится до своего exp, поэтому повторные
+    запросы с ним не выполняют jwt.decode. Ключ - подпись токена (при
+    совпадении сверяется и подписанная часть). LRU у каждого процесса
+    свой, поэтому отзыв (по jti, для токенов без него - по подписи)
+    хранится в RevokedTokenStore и проверяется на каждом запросе по его
+    копии в памяти.
+    """
+    
+    def __init__(self, max_items: int, revoked: Optional[RevokedTokenStore] = None):
+        self.max_items = max_items
+        # Подпись -> (подписанная часть, claims, exp)
+        self._tokens: "OrderedDict[str, Tuple[str, Dict, float]]" = OrderedDict()
+        self._revoked = revoked
+        self._lock = threading.Lock()
+    
+    @property
+    def revoked(self) -> RevokedTokenStore:
+        # Файл создается при первом обращении, а не при импорте модуля
+        if self._revoked is None:
+            self._revoked = RevokedTokenStore()
+        return self._revoked
+    
+    @staticmethod
+    def _split(token: str) -> Tuple[str, str]:
+        signing_input, _, signature = token.rpartition(".")
+        return signing_input, signature
+    
+    @staticmethod
+    def _token_id(claims: Dict, signature: str) -> str:
+        return claims.get("jti") or signature
+    
+    def get(self, token: str) -> Optional[Dict]:
+        signing_input, signature = self._split(token)
+        with self._lock:
+            entry = self._tokens.get(signature)
+            if entry is None or entry[0] != signing_input:
+                return None
+            
+            _, claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._tokens[signature]
+                return None
+            
+            self._tokens.move_to_end(signature)
+            return claims
+    
+    def set(self, token: str, claims: Dict):
+        if self.max_items <= 0:
+            return
+        signing_input, signature = self._split(token)
+        with self._lock:
+            self._tokens[signature] = (signing_input, claims, float(claims.get("exp", 0)))
+            self._tokens.move_to_end(signature)
+            while len(self._tokens) > self.max_items:
+                self._tokens.popitem(last=False)
+    
+    def is_revoked(self, token: str, claims: Dict) -> bool:
+        _, signature = self._split(token)
+        return self.revoked.contains(self._token_id(claims, signature))
+    
+    def revoke(self, token: str, claims: Dict):
+        _, signature = self._split(token)
+        with self._lock:
+            self._tokens.pop(signature, None)
+        self.revoked.add(self._token_id(claims, signature), float(claims.get("exp", float("inf"))))
+    
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def decode_token(token: str) -> Dict:
+    """
+    Claims токена с проверкой подписи, срока действия и отзыва
+    
+    Raises:
+        HTTPException: 401 для недействительного или отозванного токена
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            raise _credentials_error()
+        if claims.get("sub") is None:
+            raise _credentials_error()
+        token_cache.set(token, claims)
+    
+    if token_cache.is_revoked(token, claims):
+        raise _credentials_error()
+    return claims
+
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> Dict:
+    """Claims токена текущего запроса"""
+    return decode_token(token)
+
+
+async def get_current_user(claims: Dict = Depends(get_token_claims)) -> str:
+    """Имя пользователя текущего запроса"""
+    return claims["sub"]
+
+
+async def get_admin_user(username: str = Depends(get_current_user)) -> str:
+    """Имя пользователя, если он администратор"""
+    if username not in settings.ADMIN_USERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return username
@@ -0,0 +1,197 @@
+"""
+Разбивка времени запроса для заголовка Server-Timing
+"""
+import asyncio
+import functools
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+from app.core.profiler import profiler
+
+# Заголовок запроса, по которому разбивка добавляется и в тело JSON-ответа
+TIMING_BODY_HEADER = "x-include-timing"
+
+
+class _RequestTiming:
+    """Накопленное время компонентов одного запроса"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Имя компонента -> [секунды, вызовы]
+        self.spans: Dict[str, list] = {}
+        self.endpoint_done: Optional[float] = None
+    
+    def add(self, name: str, seconds: float):
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+_request_timing: ContextVar[Optional[_RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def record(name: str, seconds: float):
+    """Учет времени компонента в текущем запросе (вне запроса - ничего)"""
+    timing = _request_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Замер блока как компонента Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def current_timings() -> Dict[str, Dict]:
+    """Разбивка текущего запроса в миллисекундах"""
+    timing = _request_timing.get()
+    if timing is None:
+        return {}
+    
+    result = {
+        name: {"ms": round(seconds * 1000, 3), "count": count}
+        for name, (seconds, count) in timing.spans.items()
+    }
+    result["total"] = {"ms": round((time.perf_counter() - timing.started) * 1000, 3), "count": 1}
+    return result
+
+
+def _header_value(timing: _RequestTiming) -> bytes:
+    parts = [
+        f"{name};dur={seconds * 1000:.2f}"
+        for name, (seconds, _) in timing.spans.items()
+    ]
+    parts.append(f"total;dur={(time.perf_counter() - timing.started) * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: заголовок Server-Timing с разбивкой по компонентам
+    
+    Сервисы отмечают свое время через span() (эмбеддинги, Qdrant, Neo4j,
+    Redis), TimedRoute - время обработчика (включает вложенные компоненты)
+    и сериализации ответа. Параллельные вызовы одного компонента
+    суммируются, поэтому значение может превышать total.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        
+        timing = _RequestTiming()
+        token = _request_timing.set(timing)
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _header_value(timing)))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timing.reset(token)
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    """Обертка обработчика: его время и момент завершения"""
+    
+    def finish(started: float):
+        timing = _request_timing.get()
+        if timing is not None:
+            timing.endpoint_done = time.perf_counter()
+            timing.add("endpoint", timing.endpoint_done - started)
+    
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                finish(started)
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                finish(started)
+    return endpoint
+
+
+def _with_timing_body(response: Response) -> Response:
+    """JSON-ответ с полем server_timing (другие ответы не меняются)"""
+    if not isinstance(response, JSONResponse):
+        return response
+    
+    content = json.loads(response.body)
+    if not isinstance(content, dict):
+        return response
+    
+    content["server_timing"] = current_timings()
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key not in ("content-length", "content-type")
+    }
+    return type(response)(content=content, status_code=response.status_code, headers=headers)
+
+
+class TimedRoute(APIRoute):
+    """
+    Маршрут, отделяющий время обработчика от сериализации ответа
+    
+    Также подключает профилировщик к запросам, для которых его включил
+    администратор, а по заголовку X-Include-Timing добавляет разбивку
+    в тело JSON-ответа.
+    """
+    
+    def get_route_handler(self) -> Callable:
+        # Зависимости уже разобраны по исходной функции, обертка только
+        # отмечает момент ее завершения
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        
+        async def timed_handler(request: Request) -> Response:
+            capture = profiler.start_capture(self.path)
+            try:
+                response = await handler(request)
+            finally:
+                if capture is not None:
+                    profiler.finish_capture(capture)
+            
+            if capture is not None:
+                response.headers["X-Profile-Id"] = capture.id
+            
+            timing = _request_timing.get()
+            if timing is None:
+                return response
+            
+            if timing.endpoint_done is not None:
+                # Валидация response_model, jsonable_encoder и рендер JSON
+                timing.add("serialize", time.perf_counter() - timing.endpoint_done)
+            if request.headers.get(TIMING_BODY_HEADER, "").lower() in ("1", "true"):
+                response = _with_timing_body(response)
+            return response
+        
+        return timed_handler
@@ -0,0 +1,109 @@
+"""
+Кеш разобранных сущностей и эмбеддингов по SHA blob-объектов git (SQLite)
+"""
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    blob_sha TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    model TEXT NOT NULL,
+    entities TEXT NOT NULL,
+    vectors BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (blob_sha, file_name, model)
+);
+"""
+
+# Ключ записи: (SHA blob, имя файла)
+BlobKey = Tuple[str, str]
+
+# Версия записей: в версии 1 при сбое модели сохранялись dummy-векторы
+# под ключом настоящей модели, такие записи больше не читаются
+_FORMAT_VERSION = 2
+
+
+class BlobCache:
+    """
+    Результат индексации blob-объекта, общий для веток, коммитов и проектов
+    
+    Сущности хранятся без проекта и пути (их ID восстанавливаются для
+    текущего файла), векторы - матрицей float32 в порядке сущностей.
+    Имя файла входит в ключ, потому что от него зависят имена сущностей
+    документации; модель эмбеддингов и версия парсера - потому что от них
+    зависит результат. Записываются только векторы настоящей модели:
+    при ее сбое индексация пачки падает раньше put_many.
+    """
+    
+    def __init__(self, model_key: str, db_path: Optional[Path] = None):
+        self.model_key = f"{model_key}:v{_FORMAT_VERSION}"
+        self.db_path = Path(db_path or settings.GIT_BLOB_CACHE_DB or settings.DATA_DIR / "blob_cache.sqlite3")
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+    
+    def get_many(self, keys: Sequence[BlobKey]) -> Dict[BlobKey, Tuple[List[Dict], np.ndarray]]:
+        """Найденные записи: ключ -> (сущности, матрица векторов)"""
+        found = {}
+        if not keys:
+            return found
+        
+        with self._connect() as conn:
+            shas = sorted({blob_sha for blob_sha, _ in keys})
+            rows = conn.execute(
+                f"SELECT blob_sha, file_name, entities, vectors FROM blobs "
+                f"WHERE model = ? AND blob_sha IN ({','.join('?' * len(shas))})",
+                (self.model_key, *shas)
+            ).fetchall()
+        
+        wanted = set(keys)
+        for blob_sha, file_name, entities, vectors in rows:
+            if (blob_sha, file_name) not in wanted:
+                continue
+            matrix = np.frombuffer(vectors, dtype=np.float32).reshape(-1, settings.EMBEDDING_DIMENSION)
+            found[(blob_sha, file_name)] = (json.loads(entities), matrix)
+        return found
+    
+    def put_many(self, items: Dict[BlobKey, Tuple[List[Dict], np.ndarray]]):
+        """Сохранение результатов индексации blob-объектов"""
+        if not items:
+            return
+        
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO blobs (blob_sha, file_name, model, entities, vectors, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        blob_sha,
+                        file_name,
+                        self.model_key,
+                        json.dumps(entities),
+                        np.ascontiguousarray(vectors, dtype=np.float32).tobytes(),
+                        now
+                    )
+                    for (blob_sha, file_name), (entities, vectors) in items.items()
+                ]
+            )
+        logger.debug("Cached %s blob(s)", len(items))
@@ -0,0 +1,397 @@
+"""
+Сервис кеширования: локальный LRU + общий уровень в Redis
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import numpy as np
+
+from app.core.config import settings
+from app.core.timing import span
+
+logger = logging.getLogger(__name__)
+
+# Версия проекта для запросов без фильтра по проекту
+GLOBAL_SCOPE = "_all"
+
+# Маркеры формата значения
+_RAW_JSON = b"j"
+_ZLIB_JSON = b"z"
+_COMPRESS_MIN_SIZE = 512
+
+
+def project_of(entity_id: str) -> Optional[str]:
+    """Проект сущности по ее ID (<project_id>:<path>[::<name>])"""
+    project_id, sep, _ = entity_id.partition(":")
+    return project_id if sep else None
+
+
+def neighborhood_key(kind: str, entity_id: str, **params) -> Dict[str, Any]:
+    """Ключ окрестности сущности в графе (общий для всех endpoints)"""
+    return {"kind": kind, "entity_id": entity_id, **params}
+
+
+class LocalCache:
+    """In-process LRU с TTL"""
+    
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        
+        self._items.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: bytes, ttl: float):
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+    
+    def clear(self):
+        self._items.clear()
+
+
+class InMemoryRedis:
+    """
+    In-process заменитель Redis с подмножеством асинхронного API redis-py
+    
+    Используется в тестах и бенчмарках вместо настоящего сервера.
+    """
+    
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+    
+    def _alive(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+    
+    async def ping(self) -> bool:
+        return True
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._alive(key)
+    
+    async def set(self, key: str, value, ex: Optional[int] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = time.monotonic() + ex if ex else None
+        self._data[key] = (expires_at, value)
+        return True
+    
+    async def incr(self, key: str) -> int:
+        value = int(self._alive(key) or 0) + 1
+        self._data[key] = (None, str(value).encode())
+        return value
+    
+    async def close(self):
+        self._data.clear()
+
+
+class VersionStore:
+    """
+    Версии проектов в SQLite для работы без Redis
+    
+    Индексация в отдельном процессе (INDEXING_WORKERS, prefork-воркеры)
+    повышает версию в общем файле, и процессы API перестают отдавать
+    страницы, закешированные до переиндексации.
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or settings.CACHE_VERSIONS_DB or settings.DATA_DIR / "cache_versions.sqlite3")
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions (scope TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def get(self, scope: str) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version FROM versions WHERE scope = ?", (scope,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+    
+    def incr(self, scope: str) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "INSERT INTO versions (scope, version) VALUES (?, 1) "
+                "ON CONFLICT(scope) DO UPDATE SET version = version + 1 RETURNING version",
+                (scope,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0]
+
+
+class CacheService:
+    """
+    Двухуровневый кеш эмбеддингов запросов, страниц поиска и окрестностей графа
+    
+    Значения хранятся компактно: эмбеддинги - сырые байты float32, остальное -
+    JSON со сжатием zlib. Ключи страниц и графа включают версию проекта,
+    поэтому инвалидация - один INCR. Если Redis недоступен, кеш работает
+    только локально и периодически пробует переподключиться. Без Redis
+    версии проектов хранятся в VersionStore, общем для процессов машины.
+    """
+    
+    def __init__(self, redis_client=None, version_store: Optional[VersionStore] = None):
+        self.local = LocalCache(settings.CACHE_LOCAL_MAX_ITEMS)
+        self.redis = redis_client
+        self.version_store = version_store
+        self.prefix = settings.CACHE_KEY_PREFIX
+        self._redis_retry_at = 0.0
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._local_versions: Dict[str, int] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        model_key = f"{settings.EMBEDDING_BACKEND}:{settings.EMBEDDING_MODEL}:{settings.EMBEDDING_QUANTIZE}"
+        self._model_key = hashlib.blake2b(model_key.encode(), digest_size=6).hexdigest()
+    
+    async def connect(self) -> bool:
+        """
+        Подключение к Redis (если включен)
+        
+        Returns:
+            True, если общий уровень кеша доступен
+        """
+        if self.redis is None and settings.REDIS_ENABLED:
+            try:
+                import redis.asyncio as aioredis
+                
+                self.redis = aioredis.Redis(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    socket_timeout=settings.CACHE_REDIS_TIMEOUT,
+                    socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT
+                )
+            except ImportError:
+                logger.warning("redis not installed, using local cache only")
+        
+        if self.redis is None:
+            if self.version_store is None:
+                self.version_store = await asyncio.to_thread(VersionStore)
+            return False
+        
+        try:
+            await self.redis.ping()
+            logger.info("Connected to Redis at %s:%s", settings.REDIS_HOST, settings.REDIS_PORT)
+            return True
+        except Exception as e:
+            self._redis_failed(e)
+            return False
+    
+    @property
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_retry_at
+    
+    def _redis_failed(self, error: Exception):
+        """Переход в локальный режим до следующей попытки"""
+        if time.monotonic() >= self._redis_retry_at:
+            logger.warning("Redis unavailable, using local cache only: %s", error)
+        self._redis_retry_at = time.monotonic() + settings.CACHE_REDIS_RETRY_SECONDS
+    
+    def _record(self, namespace: str, hit: bool):
+        counters = self.hits if hit else self.misses
+        counters[namespace] = counters.get(namespace, 0) + 1
+    
+    async def _get(self, key: str) -> Optional[bytes]:
+        value = self.local.get(key)
+        if value is not None or not self._redis_available:
+            return value
+        
+        try:
+            with span("redis"):
+                value = await self.redis.get(key)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        
+        if value is not None:
+            self.local.set(key, value, settings.CACHE_LOCAL_TTL)
+        return value
+    
+    async def _set(self, key: str, value: bytes, ttl: int):
+        self.local.set(key, value, min(ttl, settings.CACHE_LOCAL_TTL))
+        if not self._redis_available:
+            return
+        
+        try:
+            with span("redis"):
+                await self.redis.set(key, value, ex=ttl)
+        except Exception as e:
+            self._redis_failed(e)
+    
+    @staticmethod
+    def _digest(value: Any) -> str:
+        raw = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _encode_json(value: Any) -> bytes:
+        raw = json.dumps(value, separators=(",", ":"), default=str).encode()
+        if len(raw) >= _COMPRESS_MIN_SIZE:
+            return _ZLIB_JSON + zlib.compress(raw, 1)
+        return _RAW_JSON + raw
+    
+    @staticmethod
+    def _decode_json(value: bytes) -> Any:
+        marker, body = value[:1], value[1:]
+        if marker == _ZLIB_JSON:
+            body = zlib.decompress(body)
+        return json.loads(body)
+    
+    async def _project_version(self, scope: str) -> int:
+        """Текущая версия проекта (кешируется локально на CACHE_VERSION_TTL секунд)"""
+        cached = self._versions.get(scope)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        version = self._local_versions.get(scope, 0)
+        if self._redis_available:
+            try:
+                value = await self.redis.get(f"{self.prefix}:ver:{scope}")
+                version = int(value or 0)
+            except Exception as e:
+                self._redis_failed(e)
+        elif self.redis is None and self.version_store is not None:
+            try:
+                version = await asyncio.to_thread(self.version_store.get, scope)
+            except sqlite3.Error as e:
+                logger.warning("Could not read cache version of %s: %s", scope, e)
+        
+        self._versions[scope] = (time.monotonic() + settings.CACHE_VERSION_TTL, version)
+        return version
+    
+    async def get_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Эмбеддинг запроса из кеша"""
+        key = f"{self.prefix}:emb:{self._model_key}:{self._digest(text)}"
+        value = await self._get(key)
+        self._record("embedding", value is not None)
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=np.float32)
+    
+    async def set_embedding(self, text: str, vector: np.ndarray):
+        """Сохранение эмбеддинга запроса"""
+        key = f"{self.prefix}:emb:{self._model_key}:{self._digest(text)}"
+        await self._set(key, np.asarray(vector, dtype=np.float32).tobytes(), settings.CACHE_EMBEDDING_TTL)
+    
+    async def _versioned_key(self, namespace: str, project_id: Optional[str], params: Any) -> str:
+        scope = project_id or GLOBAL_SCOPE
+        version = await self._project_version(scope)
+        if scope != GLOBAL_SCOPE:
+            # Изменения любого проекта видны и в запросах без фильтра
+            version = f"{version}.{await self._project_version(GLOBAL_SCOPE)}"
+        return f"{self.prefix}:{namespace}:{scope}:v{version}:{self._digest(params)}"
+    
+    async def get_json(self, namespace: str, project_id: Optional[str], params: Any) -> Optional[Any]:
+        """
+        Значение из кеша с учетом версии проекта
+        
+        Args:
+            namespace: Пространство ключей (search, graph, ...)
+            project_id: Проект, к которому относится значение (None - все проекты)
+            params: Параметры запроса, из которых строится ключ
+        """
+        key = await self._versioned_key(namespace, project_id, params)
+        value = await self._get(key)
+        self._record(namespace, value is not None)
+        if value is None:
+            return None
+        return self._decode_json(value)
+    
+    async def set_json(self, namespace: str, project_id: Optional[str], params: Any, value: Any, ttl: int):
+        """Сохранение значения с учетом версии проекта"""
+        key = await self._versioned_key(namespace, project_id, params)
+        await self._set(key, self._encode_json(value), ttl)
+    
+    async def get_or_load(
+        self,
+        namespace: str,
+        project_id: Optional[str],
+        params: Any,
+        ttl: int,
+        loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Значение из кеша, либо результат loader(), сохраненный в кеш
+        
+        Пустые результаты не кешируются: сервисы возвращают их и при
+        недоступности БД, и такой ответ не должен пережить восстановление.
+        """
+        value = await self.get_json(namespace, project_id, params)
+        if value is None:
+            value = await loader()
+            empty = not value or (isinstance(value, dict) and not any(value.values()))
+            if not empty:
+                await self.set_json(namespace, project_id, params, value, ttl)
+        return value
+    
+    async def invalidate_project(self, project_id: str):
+        """Инвалидация страниц поиска и графа проекта после изменения индекса"""
+        for scope in (project_id, GLOBAL_SCOPE):
+            self._local_versions[scope] = self._local_versions.get(scope, 0) + 1
+            self._versions.pop(scope, None)
+            if self._redis_available:
+                try:
+                    self._local_versions[scope] = await self.redis.incr(f"{self.prefix}:ver:{scope}")
+                except Exception as e:
+                    self._redis_failed(e)
+            elif self.redis is None and self.version_store is not None:
+                try:
+                    self._local_versions[scope] = await asyncio.to_thread(self.version_store.incr, scope)
+                except sqlite3.Error as e:
+                    logger.warning("Could not bump cache version of %s: %s", scope, e)
+        
+        logger.info("Cache invalidated for project %s", project_id)
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Попадания, промахи и hit rate по пространствам ключей"""
+        result = {}
+        for namespace in set(self.hits) | set(self.misses):
+            hits = self.hits.get(namespace, 0)
+            misses = self.misses.get(namespace, 0)
+            result[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+            }
+        return result
+    
+    async def close(self):
+        """Закрытие соединения с Redis"""
+        if self.redis is not None:
+            try:
+                await self.redis.close()
+            except Exception as e:
+                logger.warning("Error closing Redis client: %s", e)
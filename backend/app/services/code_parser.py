@@ -0,0 +1,342 @@
+"""
+Извлечение сущностей кода из файлов
+
+Python разбирается модулем ast, JavaScript, TypeScript, Java и Kotlin -
+грамматиками tree-sitter. Функции модуля не зависят от сервисов и
+выполняются как в основном процессе, так и в пуле процессов разбора
+(ParserPool). Классы, функции и методы становятся отдельными сущностями
+с квалифицированными именами (Class.method).
+"""
+import ast
+import importlib
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from app.core.logging import RateLimitedLogger
+from app.models.entities import CodeEntity, FileEntity
+
+logger = logging.getLogger(__name__)
+entity_log = RateLimitedLogger(logger)
+
+# Результат разбора файла: файловая сущность и сущности кода
+ParseResult = Tuple[CodeEntity, List[CodeEntity]]
+
+# Строки в нумерации ast: \r\n, \r и \n (без \f и прочих разделителей str.splitlines)
+_LINE_RE = re.compile(rb"[^\r\n]*(?:\r\n|\r|\n|$)")
+
+
+@dataclass(frozen=True)
+class _LanguageSpec:
+    """Грамматика tree-sitter и типы узлов, из которых извлекаются сущности"""
+    module: str
+    function: str
+    classes: frozenset
+    functions: frozenset
+    # Переменные и поля, которым присвоена функция: const f = () => ...
+    bindings: frozenset = frozenset()
+    binding_values: frozenset = frozenset()
+
+
+_JS_FUNCTIONS = frozenset({"function_declaration", "generator_function_declaration", "method_definition"})
+_JS_BINDING_VALUES = frozenset({"arrow_function", "function_expression", "generator_function"})
+
+LANGUAGES: Dict[str, _LanguageSpec] = {
+    ".js": _LanguageSpec(
+        module="tree_sitter_javascript",
+        function="language",
+        classes=frozenset({"class_declaration"}),
+        functions=_JS_FUNCTIONS,
+        bindings=frozenset({"variable_declarator", "field_definition"}),
+        binding_values=_JS_BINDING_VALUES
+    ),
+    ".ts": _LanguageSpec(
+        module="tree_sitter_typescript",
+        function="language_typescript",
+        classes=frozenset({"class_declaration", "abstract_class_declaration", "interface_declaration"}),
+        functions=_JS_FUNCTIONS,
+        bindings=frozenset({"variable_declarator", "public_field_definition"}),
+        binding_values=_JS_BINDING_VALUES
+    ),
+    ".java": _LanguageSpec(
+        module="tree_sitter_java",
+        function="language",
+        classes=frozenset({"class_declaration", "interface_declaration", "enum_declaration", "record_declaration"}),
+        functions=frozenset({"method_declaration", "constructor_declaration"})
+    ),
+    ".kt": _LanguageSpec(
+        module="tree_sitter_kotlin",
+        function="language",
+        classes=frozenset({"class_declaration", "object_declaration"}),
+        functions=frozenset({"function_declaration"})
+    ),
+}
+
+DOCUMENTATION_EXTENSIONS = {".md", ".txt"}
+
+
+@lru_cache(maxsize=None)
+def _language(extension: str):
+    """Грамматика tree-sitter или None, если пакет не установлен"""
+    spec = LANGUAGES[extension]
+    try:
+        from tree_sitter import Language
+        
+        module = importlib.import_module(spec.module)
+        return Language(getattr(module, spec.function)())
+    except (ImportError, AttributeError, TypeError, ValueError) as e:
+        logger.warning("tree-sitter grammar for %s is unavailable, indexing whole files: %s", extension, e)
+        return None
+
+
+def parse_source(relative_path: str, content: str, project_id: str) -> ParseResult:
+    """
+    Разбор содержимого файла
+    
+    Args:
+        relative_path: Путь относительно корня проекта
+        content: Содержимое файла
+        project_id: ID проекта
+    """
+    extension = Path(relative_path).suffix
+    
+    if extension == ".py":
+        entities = _parse_python(relative_path, content, project_id)
+    elif extension in DOCUMENTATION_EXTENSIONS:
+        entities = [_whole_file_entity(relative_path, content, project_id, "documentation")]
+    elif extension in LANGUAGES and _language(extension) is not None:
+        entities = _parse_tree_sitter(relative_path, content, project_id, extension)
+    else:
+        entities = [_whole_file_entity(relative_path, content, project_id, "file")]
+    
+    file_entity = FileEntity(
+        id=f"{project_id}:{relative_path}",
+        path=relative_path,
+        project_id=project_id,
+        content=content,
+        language=extension[1:] if extension else "unknown"
+    )
+    return file_as_code_entity(file_entity), entities
+
+
+def parse_file(
+    file_path: Path,
+    project_path: str,
+    project_id: str,
+    content: Optional[str] = None
+) -> Optional[ParseResult]:
+    """
+    Чтение и разбор одного файла
+    
+    Args:
+        content: Содержимое файла, если оно передано без записи на диск
+    
+    Returns:
+        Файловая сущность и сущности кода из файла,
+        либо None, если файл не удалось декодировать
+    """
+    entity_log.debug("file", "Indexing file: %s", file_path)
+    
+    if content is None:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except UnicodeDecodeError:
+            logger.warning("Could not decode %s, skipping", file_path)
+            return None
+    
+    return parse_source(str(file_path.relative_to(project_path)), content, project_id)
+
+
+def parse_files(
+    items: Sequence[Tuple[Path, Optional[str]]],
+    project_path: str,
+    project_id: str
+) -> List[Union[ParseResult, None, Exception]]:
+    """Разбор пачки файлов; ошибка файла возвращается на его месте"""
+    results = []
+    for file_path, content in items:
+        try:
+            results.append(parse_file(file_path, project_path, project_id, content))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def file_as_code_entity(file_entity: FileEntity) -> CodeEntity:
+    """Представление файловой сущности в общем виде для индексации"""
+    return CodeEntity(
+        id=file_entity.id,
+        name=Path(file_entity.path).name,
+        type="file",
+        file_path=file_entity.path,
+        project_id=file_entity.project_id,
+        content=file_entity.content,
+        line_start=1,
+        line_end=len(file_entity.content.split('\n')),
+        metadata={"language": file_entity.language}
+    )
+
+
+def _whole_file_entity(relative_path: str, content: str, project_id: str, entity_type: str) -> CodeEntity:
+    """Одна сущность на файл (документация и языки без извлечения сущностей)"""
+    return CodeEntity(
+        id=f"{project_id}:{relative_path}",
+        name=Path(relative_path).stem,
+        type=entity_type,
+        file_path=relative_path,
+        project_id=project_id,
+        content=content,
+        line_start=1,
+        line_end=len(content.split('\n'))
+    )
+
+
+class _EntityCollector:
+    """Сущности файла с уникальными ID (перегрузки получают суффикс #N)"""
+    
+    def __init__(self, relative_path: str, project_id: str):
+        self.relative_path = relative_path
+        self.project_id = project_id
+        self.entities: List[CodeEntity] = []
+        self._seen: Dict[str, int] = {}
+    
+    def add(
+        self,
+        name: str,
+        entity_type: str,
+        parent: Optional[str],
+        content: str,
+        line_start: int,
+        line_end: int
+    ) -> str:
+        """Добавление сущности; возвращает ее квалифицированное имя"""
+        qualified = f"{parent}.{name}" if parent else name
+        count = self._seen.get(qualified, 0) + 1
+        self._seen[qualified] = count
+        if count > 1:
+            qualified = f"{qualified}#{count}"
+        
+        self.entities.append(CodeEntity(
+            id=f"{self.project_id}:{self.relative_path}::{qualified}",
+            name=name,
+            type=entity_type,
+            file_path=self.relative_path,
+            project_id=self.project_id,
+            content=content,
+            line_start=line_start,
+            line_end=line_end,
+            metadata={"qualified_name": qualified, "parent": parent} if parent else {"qualified_name": qualified}
+        ))
+        return qualified
+
+
+def _parse_python(relative_path: str, content: str, project_id: str) -> List[CodeEntity]:
+    """Классы, функции и методы Python (вложенные в функции не извлекаются)"""
+    try:
+        tree = ast.parse(content, filename=relative_path)
+    except SyntaxError as e:
+        logger.warning("Syntax error in %s: %s", relative_path, e)
+        return []
+    
+    # ast.get_source_segment разбивает файл на строки при каждом вызове;
+    # строки в UTF-8 (col_offset - смещение в байтах) считаются один раз
+    lines = _LINE_RE.findall(content.encode("utf-8"))
+    
+    def segment(node) -> str:
+        first, last = node.lineno - 1, (node.end_lineno or node.lineno) - 1
+        if first == last:
+            data = lines[first][node.col_offset:node.end_col_offset]
+        else:
+            data = b"".join([lines[first][node.col_offset:], *lines[first + 1:last], lines[last][:node.end_col_offset]])
+        return data.decode("utf-8", errors="replace")
+    
+    def children(node, parent):
+        # Определения бывают только операторами: выражения не обходятся
+        return [(child, parent) for child in reversed(list(ast.iter_child_nodes(node))) if not isinstance(child, ast.expr)]
+    
+    collector = _EntityCollector(relative_path, project_id)
+    # Обход в глубину в порядке исходного текста: (узел, имя класса-родителя)
+    stack = children(tree, None)
+    while stack:
+        node, parent = stack.pop()
+        if isinstance(node, ast.ClassDef):
+            qualified = collector.add(
+                node.name, "class", parent,
+                segment(node),
+                node.lineno, node.end_lineno or node.lineno
+            )
+            stack.extend(children(node, qualified))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # Тело функции не обходится: вложенные функции входят в ее содержимое
+            collector.add(
+                node.name, "method" if parent else "function", parent,
+                segment(node),
+                node.lineno, node.end_lineno or node.lineno
+            )
+        else:
+            # if TYPE_CHECKING, try/except и другие составные операторы
+            stack.extend(children(node, parent))
+    
+    return collector.entities
+
+
+def _parse_tree_sitter(relative_path: str, content: str, project_id: str, extension: str) -> List[CodeEntity]:
+    """
+    Классы, функции и методы по грамматике tree-sitter
+    
+    Файл с синтаксическими ошибками индексируется одной сущностью: вокруг
+    узлов ERROR теряется вложенность (например, в Kotlin с однострочными
+    телами методы класса становятся функциями верхнего уровня, а классы
+    пропадают).
+    """
+    from tree_sitter import Parser
+    
+    spec = LANGUAGES[extension]
+    source = content.encode("utf-8")
+    tree = Parser(_language(extension)).parse(source)
+    if tree.root_node.has_error:
+        entity_log.warning("syntax", "Syntax errors in %s, indexing the whole file", relative_path)
+        return [_whole_file_entity(relative_path, content, project_id, "file")]
+    
+    def text(node) -> str:
+        return source[node.start_byte:node.end_byte].decode("utf-8", errors="replace")
+    
+    def name_of(node) -> Optional[str]:
+        name = node.child_by_field_name("name") or node.child_by_field_name("property")
+        return text(name) if name is not None else None
+    
+    def is_function(node) -> bool:
+        if node.type in spec.functions:
+            return True
+        value = node.child_by_field_name("value") if node.type in spec.bindings else None
+        return value is not None and value.type in spec.binding_values
+    
+    def children(node, parent):
+        return [(child, parent) for child in reversed(node.named_children)]
+    
+    collector = _EntityCollector(relative_path, project_id)
+    # Обход в глубину в порядке исходного текста: (узел, имя класса-родителя)
+    stack = children(tree.root_node, None)
+    while stack:
+        node, parent = stack.pop()
+        name = name_of(node) if node.type in spec.classes or is_function(node) else None
+        if name is None:
+            # export, объявления переменных, тела классов, companion object
+            stack.extend(children(node, parent))
+        elif node.type in spec.classes:
+            qualified = collector.add(
+                name, "class", parent, text(node), node.start_point[0] + 1, node.end_point[0] + 1
+            )
+            stack.extend(children(node, qualified))
+        else:
+            # Тело функции не обходится: вложенные функции входят в ее содержимое
+            collector.add(
+                name, "method" if parent else "function", parent,
+                text(node), node.start_point[0] + 1, node.end_point[0] + 1
+            )
+    
+    return collector.entities
@@ -0,0 +1,137 @@
+"""
+Контейнер сервисов приложения
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import CACHE_HIT_RATE, INDEXING_QUEUE_DEPTH, UPDATE_QUEUE_DEPTH
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_service import VectorService
+from app.services.graph_service import GraphService
+from app.services.centrality_service import CentralityService
+from app.services.indexing_service import PARSER_VERSION, IndexingService
+from app.services.blob_cache import BlobCache
+from app.services.embedding_pool import EmbeddingWorkerPool
+from app.services.parser_pool import ParserPool
+from app.services.cache_service import CacheService
+from app.services.job_queue import JobQueue
+from app.services.update_coalescer import FileUpdateCoalescer
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Единственные на процесс экземпляры сервисов (модель, клиенты БД)"""
+    
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        # Создание сервисов не выполняет ввода-вывода: модель и соединения
+        # поднимаются в warmup(). Модель, загруженная до fork (prefork),
+        # передается готовой и не загружается повторно
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_service = VectorService()
+        self.graph_service = GraphService()
+        self.centrality_service = CentralityService(self.graph_service)
+        self.cache_service = CacheService()
+        # Пулы процессов для массовой индексации стартуют при первом использовании.
+        # Daemon-процесс не может запускать дочерние: там пулы отключаются
+        can_fork = not multiprocessing.current_process().daemon
+        if not can_fork and (settings.EMBEDDING_POOL_WORKERS > 0 or settings.INDEXING_PARSE_WORKERS > 0):
+            logger.warning("Running in a daemon process, embedding and parser pools are disabled")
+        self.embedding_pool = (
+            EmbeddingWorkerPool(settings.EMBEDDING_POOL_WORKERS)
+            if settings.EMBEDDING_POOL_WORKERS > 0 and can_fork else None
+        )
+        self.parser_pool = (
+            ParserPool(settings.INDEXING_PARSE_WORKERS)
+            if settings.INDEXING_PARSE_WORKERS > 0 and can_fork else None
+        )
+        # Результаты разбора и эмбеддинги зависят от модели, версии парсера
+        # и способа получения векторов файлов
+        self.blob_cache = (
+            BlobCache(
+                f"{settings.EMBEDDING_BACKEND}:{settings.EMBEDDING_MODEL}:"
+                f"int8={settings.EMBEDDING_QUANTIZE}:parser{PARSER_VERSION}:file={settings.INDEXING_FILE_VECTOR_MODE}"
+            )
+            if settings.GIT_BLOB_CACHE_ENABLED else None
+        )
+        self.indexing_service = IndexingService(
+            embedding_service=self.embedding_service,
+            vector_service=self.vector_service,
+            graph_service=self.graph_service,
+            centrality_service=self.centrality_service,
+            embedding_pool=self.embedding_pool,
+            cache_service=self.cache_service,
+            blob_cache=self.blob_cache,
+            parser_pool=self.parser_pool
+        )
+        self.job_queue = JobQueue()
+        self.update_coalescer = FileUpdateCoalescer(self.indexing_service, job_queue=self.job_queue)
+        self.readiness: Dict[str, Dict] = {
+            name: {"status": "pending", "took_ms": None}
+            for name in ("embedding", "vector", "graph")
+        }
+    
+    async def warmup(self):
+        """Загрузка модели и подключение к БД параллельно, с учетом готовности"""
+        await asyncio.gather(
+            self._warmup_component("embedding", self._warmup_embedding),
+            self._warmup_component("vector", self._warmup_vector),
+            self._warmup_component("graph", self.graph_service.connect),
+            # Кеш не влияет на готовность: без Redis работает локальный уровень
+            self.cache_service.connect()
+        )
+    
+    async def _warmup_component(self, name: str, warmup: Callable[[], Awaitable[bool]]):
+        """Прогрев одного компонента с замером времени"""
+        started = time.perf_counter()
+        try:
+            ready = await warmup()
+        except Exception as e:
+            logger.error("Warmup of %s failed: %s", name, e)
+            ready = False
+        
+        took_ms = int((time.perf_counter() - started) * 1000)
+        self.readiness[name] = {
+            "status": "ready" if ready else "unavailable",
+            "took_ms": took_ms
+        }
+        logger.info("Warmup of %s finished in %s ms (ready=%s)", name, took_ms, ready)
+    
+    async def _warmup_embedding(self) -> bool:
+        """Загрузка модели эмбеддингов в отдельном потоке"""
+        await self.embedding_service.ensure_loaded()
+        return self.embedding_service.backend is not None
+    
+    async def _warmup_vector(self) -> bool:
+        """Подключение к Qdrant в отдельном потоке"""
+        return await asyncio.to_thread(self.vector_service.connect)
+    
+    @property
+    def is_ready(self) -> bool:
+        """Все компоненты прогреты и доступны"""
+        return all(component["status"] == "ready" for component in self.readiness.values())
+    
+    async def refresh_gauges(self):
+        """Обновление gauge-метрик перед отдачей /metrics"""
+        counts = await asyncio.to_thread(self.job_queue.count_by_status)
+        for status in ("pending", "running"):
+            INDEXING_QUEUE_DEPTH.labels(status=status).set(counts.get(status, 0))
+        UPDATE_QUEUE_DEPTH.set(self.update_coalescer.pending_files)
+        for namespace, stats in self.cache_service.stats().items():
+            CACHE_HIT_RATE.labels(namespace=namespace).set(stats["hit_rate"])
+    
+    async def close(self):
+        """Освобождение соединений с внешними сервисами"""
+        await self.update_coalescer.close()
+        await self.graph_service.close()
+        self.vector_service.close()
+        await self.cache_service.close()
+        if self.embedding_pool is not None:
+            await asyncio.to_thread(self.embedding_pool.shutdown)
+        if self.parser_pool is not None:
+            await asyncio.to_thread(self.parser_pool.shutdown)
+        logger.info("Services closed")
@@ -0,0 +1,265 @@
+"""
+Бэкенды инференса модели эмбеддингов
+"""
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Type
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-нормализация строк матрицы на месте (нулевые строки остаются нулевыми)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class EmbeddingBackend:
+    """Базовый бэкенд: превращает батч текстов в матрицу эмбеддингов"""
+    
+    name = "base"
+    # Модель можно загрузить до fork и использовать в дочерних процессах
+    fork_safe = True
+    
+    def __init__(self, model_name: str, num_threads: int = 0):
+        self.model_name = model_name
+        self.num_threads = num_threads
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Генерация нормализованных эмбеддингов
+        
+        Args:
+            texts: Список текстов
+        
+        Returns:
+            C-contiguous матрица float32 размера (len(texts), EMBEDDING_DIMENSION)
+            с единичными строками
+        """
+        if not texts:
+            return np.zeros((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+        
+        matrix = np.ascontiguousarray(self._encode_raw(texts), dtype=np.float32)
+        return normalize_rows(matrix)
+    
+    def _encode_raw(self, texts: List[str]) -> np.ndarray:
+        """Ненормализованные эмбеддинги батча (реализуется бэкендом)"""
+        raise NotImplementedError
+
+
+class DummyBackend(EmbeddingBackend):
+    """
+    Детерминированные эмбеддинги без модели (тесты, бенчмарки, fallback)
+    
+    Каждый текст хешируется в 64-битное зерно, из которого полностью
+    векторизованно (splitmix64 по индексам измерений) строится вектор
+    во всю размерность. Результат одинаков во всех процессах и запусках.
+    """
+    
+    name = "dummy"
+    
+    _GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+    _MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+    _MIX_2 = np.uint64(0x94D049BB133111EB)
+    
+    def __init__(self, model_name: str = "dummy", num_threads: int = 0):
+        super().__init__(model_name, num_threads)
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self._offsets = (np.arange(1, self.dimension + 1, dtype=np.uint64) * self._GOLDEN)
+    
+    def _encode_raw(self, texts: List[str]) -> np.ndarray:
+        seeds = np.frombuffer(
+            b"".join(
+                hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+                for text in texts
+            ),
+            dtype=np.uint64
+        )
+        
+        state = seeds[:, None] + self._offsets[None, :]
+        state = (state ^ (state >> np.uint64(30))) * self._MIX_1
+        state = (state ^ (state >> np.uint64(27))) * self._MIX_2
+        state ^= state >> np.uint64(31)
+        
+        # Старшие 24 бита -> равномерное распределение в [-1, 1)
+        values = (state >> np.uint64(40)).astype(np.float32)
+        values *= np.float32(2.0 / (1 << 24))
+        values -= np.float32(1.0)
+        return values
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Стандартный SentenceTransformer (PyTorch fp32)"""
+    
+    name = "sentence-transformers"
+    
+    def __init__(self, model_name: str, num_threads: int = 0):
+        super().__init__(model_name, num_threads)
+        import torch
+        from sentence_transformers import SentenceTransformer
+        
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.model.max_seq_length = settings.EMBEDDING_MAX_SEQ_LENGTH
+    
+    def _encode_raw(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Экспортированный граф модели в ONNX Runtime
+    
+    При первом запуске трансформер экспортируется в ONNX (и при включенной
+    квантизации - в динамический int8) в EMBEDDING_ONNX_DIR; дальше
+    используется готовый файл. Пулинг - как в sentence-transformers
+    (mean pooling), нормализация выполняется в encode().
+    """
+    
+    name = "onnx"
+    # Пул потоков сессии создается при загрузке и не переживает fork
+    fork_safe = False
+    
+    def __init__(self, model_name: str, num_threads: int = 0, quantize: bool = False):
+        super().__init__(model_name, num_threads)
+        import onnxruntime
+        from transformers import AutoTokenizer
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model_path = self._prepare_model(quantize)
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        
+        self.session = onnxruntime.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        logger.info("ONNX embedding backend ready: %s", model_path.name)
+    
+    def _model_dir(self) -> Path:
+        """Директория с экспортированными моделями"""
+        base_dir = settings.EMBEDDING_ONNX_DIR or settings.DATA_DIR / "onnx"
+        return Path(base_dir) / re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_name)
+    
+    def _prepare_model(self, quantize: bool) -> Path:
+        """Экспорт и квантизация модели при отсутствии готовых файлов"""
+        model_dir = self._model_dir()
+        model_dir.mkdir(parents=True, exist_ok=True)
+        fp32_path = model_dir / "model.onnx"
+        int8_path = model_dir / "model.int8.onnx"
+        
+        if not fp32_path.exists():
+            self._export(fp32_path)
+        
+        if not quantize:
+            return fp32_path
+        
+        if not int8_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            
+            logger.info("Quantizing embedding model to int8: %s", int8_path)
+            quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        
+        return int8_path
+    
+    def _export(self, path: Path):
+        """Экспорт трансформера в ONNX с динамическими осями батча и длины"""
+        import torch
+        from transformers import AutoModel
+        
+        logger.info("Exporting %s to ONNX: %s", self.model_name, path)
+        model = AutoModel.from_pretrained(self.model_name)
+        model.eval()
+        
+        sample = self.tokenizer(["export sample"], return_tensors="pt")
+        input_names = list(sample.keys())
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        
+        tmp_path = path.with_suffix(".tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dict(sample),),
+                str(tmp_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, path)
+    
+    def _encode_raw(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + settings.EMBEDDING_BATCH_SIZE]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=settings.EMBEDDING_MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {
+                name: value.astype(np.int64)
+                for name, value in encoded.items()
+                if name in self.input_names
+            }
+            hidden = self.session.run(["last_hidden_state"], feeds)[0]
+            
+            # Mean pooling по маске внимания
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        return np.concatenate(batches)
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    DummyBackend.name: DummyBackend,
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxBackend.name: OnnxBackend
+}
+
+
+def create_backend(
+    name: str,
+    model_name: str,
+    num_threads: int = 0,
+    quantize: bool = False
+) -> EmbeddingBackend:
+    """
+    Создание бэкенда по имени из настроек
+    
+    Raises:
+        ValueError: Неизвестное имя бэкенда
+        ImportError: Не установлены зависимости бэкенда
+    """
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"Unknown embedding backend: {name}")
+    
+    if backend_class is OnnxBackend:
+        return OnnxBackend(model_name, num_threads=num_threads, quantize=quantize)
+    if quantize:
+        logger.warning("Quantization is not supported by %s backend, ignoring", name)
+    return backend_class(model_name, num_threads=num_threads)
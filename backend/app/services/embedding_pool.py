@@ -0,0 +1,127 @@
+"""
+Пул процессов для генерации эмбеддингов при массовой индексации
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import EMBEDDING_ERRORS, EMBEDDING_SECONDS, batch_size_bucket, track
+
+logger = logging.getLogger(__name__)
+
+# Бэкенд модели внутри процесса-воркера
+_worker_backend = None
+
+
+def _init_worker(backend_name: str, model_name: str, num_threads: int, quantize: bool):
+    """Загрузка реплики модели один раз при старте процесса-воркера"""
+    global _worker_backend
+    from app.services.embedding_backends import create_backend
+    
+    _worker_backend = create_backend(backend_name, model_name, num_threads=num_threads, quantize=quantize)
+
+
+def _encode_into(shm_name: str, shape: Tuple[int, int], start: int, texts: List[str]) -> int:
+    """
+    Генерация эмбеддингов чанка с записью прямо в разделяемую память
+    
+    Родительский процесс получает только число строк, а не сами векторы.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        output[start:start + len(texts)] = _worker_backend.encode(texts)
+        del output
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class EmbeddingWorkerPool:
+    """
+    N реплик модели в отдельных процессах
+    
+    Тексты делятся на чанки, каждый воркер пишет float32-результат в общий
+    буфер shared memory. Используется для массовой индексации; запросы API
+    обслуживает модель EmbeddingService в основном процессе.
+    """
+    
+    def __init__(
+        self,
+        num_workers: int,
+        chunk_size: Optional[int] = None,
+        threads_per_worker: Optional[int] = None
+    ):
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size or settings.EMBEDDING_POOL_CHUNK_SIZE
+        self.threads_per_worker = threads_per_worker or settings.EMBEDDING_POOL_THREADS_PER_WORKER
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    def start(self):
+        """Запуск процессов-воркеров (идемпотентно)"""
+        if self._executor is not None:
+            return
+        
+        # spawn: воркеры не наследуют потоки и состояние torch родителя
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                settings.EMBEDDING_BACKEND,
+                settings.EMBEDDING_MODEL,
+                self.threads_per_worker,
+                settings.EMBEDDING_QUANTIZE
+            )
+        )
+        logger.info("Embedding worker pool started with %s workers", self.num_workers)
+    
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Генерация эмбеддингов батча в пуле процессов
+        
+        Args:
+            texts: Список текстов
+        
+        Returns:
+            Матрица float32 размера (len(texts), EMBEDDING_DIMENSION)
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        
+        self.start()
+        loop = asyncio.get_running_loop()
+        shape = (len(texts), self.dimension)
+        shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * 4)
+        try:
+            with track(EMBEDDING_SECONDS, EMBEDDING_ERRORS, backend="pool", batch_size=batch_size_bucket(len(texts))):
+                await asyncio.gather(*(
+                    loop.run_in_executor(
+                        self._executor,
+                        _encode_into,
+                        shm.name,
+                        shape,
+                        start,
+                        texts[start:start + self.chunk_size]
+                    )
+                    for start in range(0, len(texts), self.chunk_size)
+                ))
+            result = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        
+        return result
+    
+    def shutdown(self):
+        """Остановка процессов-воркеров"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Embedding worker pool stopped")
@@ -1,102 +1,142 @@
 """
 Сервис генерации эмбеддингов
 """
+import asyncio
 import logging
-from typing import List
+from typing import List, Optional
 import numpy as np
 
 from app.core.config import settings
+from app.core.metrics import EMBEDDING_ERRORS, EMBEDDING_SECONDS, batch_size_bucket, track
+from app.core.timing import span
+from app.services.embedding_backends import DummyBackend, EmbeddingBackend, create_backend
 
 logger = logging.getLogger(__name__)
 
 
+class EmbeddingUnavailableError(RuntimeError):
+    """Модель эмбеддингов не загружена или упала, а заглушка запрещена"""
+
+
 class EmbeddingService:
     """Сервис для генерации векторных эмбеддингов"""
     
     def __init__(self):
-        self.model = None
-        self._load_model()
+        self.backend: Optional[EmbeddingBackend] = None
+        self._dummy_backend = DummyBackend()
+        self.is_loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+    
+    def load(self):
+        """Синхронная загрузка модели (в warmup или до fork)"""
+        if not self.is_loaded:
+            self._load_model()
+            self.is_loaded = True
+    
+    async def ensure_loaded(self):
+        """
+        Загрузка модели в отдельном потоке, если она еще не загружена
+        
+        Параллельные вызовы ждут одну и ту же загрузку.
+        """
+        if self.is_loaded:
+            return
+        
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        
+        async with self._load_lock:
+            if not self.is_loaded:
+                await asyncio.to_thread(self.load)
     
     def _load_model(self):
         """Загрузка модели для генерации эмбеддингов"""
         try:
-            from sentence_transformers import SentenceTransformer
-            
-            logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
-            self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+            logger.info(
+                "Loading embedding model: %s (backend=%s, quantize=%s)",
+                settings.EMBEDDING_MODEL,
+                settings.EMBEDDING_BACKEND,
+                settings.EMBEDDING_QUANTIZE
+            )
+            self.backend = create_backend(
+                settings.EMBEDDING_BACKEND,
+                settings.EMBEDDING_MODEL,
+                num_threads=settings.EMBEDDING_NUM_THREADS,
+                quantize=settings.EMBEDDING_QUANTIZE
+            )
             logger.info("Embedding model loaded successfully")
-        except ImportError:
-            logger.warning("sentence-transformers not installed, using dummy embeddings")
-            self.model = None
+        except ImportError as e:
+            logger.warning("Embedding backend dependencies not installed (%s), using dummy embeddings", e)
+            self.backend = None
         except Exception as e:
-            logger.error(f"Error loading embedding model: {e}")
-            self.model = None
+            logger.error("Error loading embedding model: %s", e)
+            self.backend = None
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str, allow_fallback: bool = True) -> np.ndarray:
         """
         Генерация эмбеддинга для текста
         
         Args:
             text: Текст для векторизации
+            allow_fallback: Вернуть dummy-вектор, если модель недоступна
         
         Returns:
-            Вектор эмбеддинга
+            Нормализованный вектор float32
+        
+        Raises:
+            EmbeddingUnavailableError: Модель недоступна и allow_fallback=False
         """
         if not text or not text.strip():
             # Возвращаем нулевой вектор
-            return [0.0] * settings.EMBEDDING_DIMENSION
-        
-        if self.model is None:
-            # Dummy embedding для тестирования
-            return self._generate_dummy_embedding(text)
+            return np.zeros(settings.EMBEDDING_DIMENSION, dtype=np.float32)
         
-        try:
-            # Генерация эмбеддинга
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            return self._generate_dummy_embedding(text)
+        return (await self.generate_embeddings_batch([text], allow_fallback=allow_fallback))[0]
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def generate_embeddings_batch(self, texts: List[str], allow_fallback: bool = True) -> np.ndarray:
         """
         Генерация эмбеддингов для батча текстов
         
+        Dummy-векторы при сбое модели годятся только для ответа на текущий
+        запрос: индексация и кеши вызывают метод с allow_fallback=False,
+        чтобы заглушки не сохранялись под ключом настоящей модели.
+        
         Args:
             texts: Список текстов
+            allow_fallback: Вернуть dummy-векторы, если модель недоступна
         
         Returns:
-            Список векторов эмбеддингов
+            C-contiguous матрица float32 (len(texts), EMBEDDING_DIMENSION)
+            с нормализованными строками
+        
+        Raises:
+            EmbeddingUnavailableError: Модель недоступна и allow_fallback=False
         """
-        if self.model is None:
-            return [self._generate_dummy_embedding(text) for text in texts]
+        await self.ensure_loaded()
+        
+        if self.backend is None:
+            if not allow_fallback:
+                raise EmbeddingUnavailableError(
+                    f"Embedding model {settings.EMBEDDING_MODEL} ({settings.EMBEDDING_BACKEND}) is not loaded"
+                )
+            # Dummy embedding для тестирования
+            with span("embedding"):
+                return self._dummy_backend.encode(texts)
         
         try:
-            embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-            return embeddings.tolist()
+            with track(
+                EMBEDDING_SECONDS,
+                EMBEDDING_ERRORS,
+                span="embedding",
+                backend=settings.EMBEDDING_BACKEND,
+                batch_size=batch_size_bucket(len(texts))
+            ):
+                # Эмбеддинг одного запроса короче перехода в поток; батчи
+                # индексации (обновления файлов в процессе API) идут вне цикла событий
+                if len(texts) == 1:
+                    return self.backend.encode(texts)
+                return await asyncio.to_thread(self.backend.encode, texts)
         except Exception as e:
-            logger.error(f"Error generating batch embeddings: {e}")
-            return [self._generate_dummy_embedding(text) for text in texts]
-    
-    def _generate_dummy_embedding(self, text: str) -> List[float]:
-        """Генерация dummy эмбеддинга для тестирования"""
-        import hashlib
-        
-        # Простой хеш-базированный эмбеддинг для тестирования
-        hash_obj = hashlib.md5(text.encode())
-        hash_hex = hash_obj.hexdigest()
-        
-        # Преобразование в вектор нужной размерности
-        embedding = []
-        for i in range(0, len(hash_hex), 2):
-            if len(embedding) >= settings.EMBEDDING_DIMENSION:
-                break
-            val = int(hash_hex[i:i+2], 16) / 255.0
-            embedding.append(val)
-        
-        # Дополнение до нужной размерности
-        while len(embedding) < settings.EMBEDDING_DIMENSION:
-            embedding.append(0.0)
-        
-        return embedding[:settings.EMBEDDING_DIMENSION]
-
+            logger.error("Error generating batch embeddings: %s", e)
+            if not allow_fallback:
+                raise EmbeddingUnavailableError(f"Embedding model failed: {e}") from e
+            return self._dummy_backend.encode(texts)
@@ -0,0 +1,352 @@
+"""
+Обнаружение файлов проекта для индексации
+
+Обход через os.scandir с правилами игнорирования (.gitignore и файл
+игнорирования проекта), ограничением размера и проверкой первых байтов
+файла: бинарные, не UTF-8, минифицированные и сгенерированные файлы
+отбрасываются до полного чтения.
+"""
+import asyncio
+import codecs
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import AsyncIterator, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Директории, которые не индексируются независимо от правил проекта
+DEFAULT_IGNORED_DIRS = frozenset({'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'build', 'dist'})
+
+# Маркеры сгенерированного кода в начале файла
+GENERATED_MARKERS = (b"@generated", b"DO NOT EDIT", b"Code generated by")
+
+
+class IgnoreRules:
+    """
+    Правила одного файла в синтаксисе .gitignore
+    
+    Шаблоны компилируются в регулярные выражения по путям относительно
+    директории файла правил (base). Как и в git, побеждает последнее
+    совпавшее правило, "!" возвращает путь, "/" в конце - только директории.
+    Содержимое исключенной директории отдельно не проверяется: обход
+    проверяет директорию раньше вложенных путей.
+    """
+    
+    def __init__(self, patterns: Iterable[str], base: str = ""):
+        self.base = base
+        self.rules: List[Tuple["re.Pattern", bool, bool]] = []
+        for line in patterns:
+            rule = self._compile(line)
+            if rule is not None:
+                self.rules.append(rule)
+    
+    @classmethod
+    def from_file(cls, path: str, base: str = "") -> "IgnoreRules":
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.read().splitlines(), base)
+        except OSError as e:
+            logger.warning("Could not read ignore file %s: %s", path, e)
+            return cls([], base)
+    
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+    
+    @staticmethod
+    def _compile(line: str) -> Optional[Tuple["re.Pattern", bool, bool]]:
+        """(регулярное выражение, отрицание, только директории) или None"""
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            return None
+        
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            # \# и \! - буквальные символы в начале шаблона
+            line = line[1:]
+        
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        
+        # Шаблон без "/" в середине совпадает с именем на любой глубине
+        anchored = "/" in line
+        line = line.lstrip("/")
+        
+        regex = []
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if line.startswith("**/", i):
+                regex.append("(?:.*/)?")
+                i += 3
+                continue
+            if line.startswith("**", i):
+                regex.append(".*")
+                i += 2
+                continue
+            if char == "*":
+                regex.append("[^/]*")
+            elif char == "?":
+                regex.append("[^/]")
+            elif char == "[":
+                end = line.find("]", i + 2)
+                if end == -1:
+                    regex.append(re.escape(char))
+                else:
+                    body = line[i + 1:end]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    regex.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                    i = end
+            elif char == "\\" and i + 1 < len(line):
+                i += 1
+                regex.append(re.escape(line[i]))
+            else:
+                regex.append(re.escape(char))
+            i += 1
+        
+        prefix = "" if anchored else "(?:.*/)?"
+        return re.compile(f"{prefix}{''.join(regex)}", re.DOTALL), negate, dir_only
+    
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Вердикт последнего совпавшего правила
+        
+        Args:
+            relative_path: Путь относительно корня проекта
+        
+        Returns:
+            True - игнорировать, False - возвращен отрицанием, None - нет совпадений
+        """
+        if self.base:
+            if not relative_path.startswith(self.base):
+                return None
+            relative_path = relative_path[len(self.base):]
+        
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(relative_path):
+                return not negate
+        return None
+
+
+def sniff(data: bytes, complete: bool) -> Optional[str]:
+    """
+    Причина пропуска файла по его первым байтам
+    
+    Args:
+        data: Начало файла (INDEXING_SNIFF_BYTES)
+        complete: data содержит файл целиком
+    
+    Returns:
+        binary, encoding, minified, generated или None, если файл индексируется
+    """
+    if b"\0" in data:
+        return "binary"
+    
+    try:
+        # Многобайтовый символ может быть обрезан границей выборки
+        codecs.getincrementaldecoder("utf-8")().decode(data, final=complete)
+    except UnicodeDecodeError:
+        return "encoding"
+    
+    if len(data) >= 1024 and len(data) / (data.count(b"\n") + 1) > settings.INDEXING_MINIFIED_LINE_LENGTH:
+        return "minified"
+    
+    if settings.INDEXING_SKIP_GENERATED:
+        head = data[:1024]
+        if any(marker in head for marker in GENERATED_MARKERS):
+            return "generated"
+    
+    return None
+
+
+def ignored_by(rules: List[IgnoreRules], relative_path: str, is_dir: bool) -> bool:
+    """Исключен ли путь цепочкой правил от корня до его директории"""
+    # Правила вложенных директорий важнее правил родителей
+    for rule_set in reversed(rules):
+        verdict = rule_set.match(relative_path, is_dir)
+        if verdict is not None:
+            return verdict
+    return False
+
+
+class FileDiscovery:
+    """
+    Файлы проекта для индексации в детерминированном порядке
+    
+    Записи каждой директории сортируются по имени, поэтому порядок одинаков
+    между запусками и позволяет продолжить прерванную индексацию. С
+    сортировкой полных путей он не совпадает: a/b идет раньше a.txt.
+    Пропущенные файлы считаются по причинам в skipped.
+    """
+    
+    def __init__(
+        self,
+        root: str,
+        extensions: Collection[str],
+        ignore_dirs: Collection[str] = DEFAULT_IGNORED_DIRS,
+        max_file_size: Optional[int] = None
+    ):
+        self.root = str(root)
+        self.extensions = extensions
+        self.ignore_dirs = ignore_dirs
+        self.max_file_size = settings.INDEXING_MAX_FILE_SIZE if max_file_size is None else max_file_size
+        self.discovered = 0
+        self.skipped: Counter = Counter()
+        self._stopped = threading.Event()
+        self._base_rules = IgnoreRules(settings.INDEXING_IGNORE_PATTERNS)
+        self._dir_rules: Dict[str, List[IgnoreRules]] = {}
+    
+    def stop(self):
+        """Остановка обхода (из другого потока)"""
+        self._stopped.set()
+    
+    def iter_files(self) -> Iterator[Path]:
+        """Подходящие файлы по мере обхода"""
+        yield from self._walk(self.root, "", [self._base_rules])
+    
+    async def batches(self, batch_size: int, skip: int = 0) -> AsyncIterator[List[Path]]:
+        """
+        Пачки файлов по мере обхода
+        
+        Обход выполняется в отдельном потоке параллельно с обработкой
+        пачек; discovered растет по ходу обхода.
+        
+        Args:
+            skip: Число первых файлов, которые не нужно возвращать
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        def produce():
+            batch = []
+            try:
+                for index, path in enumerate(self.iter_files()):
+                    if index < skip:
+                        continue
+                    batch.append(path)
+                    if len(batch) >= batch_size:
+                        loop.call_soon_threadsafe(queue.put_nowait, batch)
+                        batch = []
+                if batch:
+                    loop.call_soon_threadsafe(queue.put_nowait, batch)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+        
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    break
+                yield batch
+            # Ошибка обхода пробрасывается после уже найденных файлов
+            await producer
+        finally:
+            self.stop()
+    
+    def is_ignored(self, relative_path: str) -> bool:
+        """Исключен ли файл правилами проекта (для отдельных обновлений файлов)"""
+        parts = Path(relative_path).parts
+        if any(part in self.ignore_dirs for part in parts[:-1]):
+            return True
+        
+        rules = [self._base_rules]
+        directory = self.root
+        relative_dir = ""
+        for depth, part in enumerate(parts):
+            rules = self._rules_for(directory, relative_dir, rules)
+            relative = f"{relative_dir}{part}"
+            if self._is_ignored(relative, depth < len(parts) - 1, rules):
+                return True
+            directory = os.path.join(directory, part)
+            relative_dir = f"{relative}/"
+        return False
+    
+    def _rules_for(
+        self,
+        directory: str,
+        relative_dir: str,
+        parent_rules: List[IgnoreRules],
+        names: Optional[Collection[str]] = None
+    ) -> List[IgnoreRules]:
+        """Правила родителей и файлов игнорирования директории"""
+        cached = self._dir_rules.get(relative_dir)
+        if cached is not None:
+            return cached
+        
+        local = []
+        for ignore_file in (".gitignore", settings.INDEXING_IGNORE_FILE):
+            if names is not None and ignore_file not in names:
+                continue
+            path = os.path.join(directory, ignore_file)
+            if names is None and not os.path.isfile(path):
+                continue
+            rules = IgnoreRules.from_file(path, relative_dir)
+            if rules:
+                local.append(rules)
+        
+        rules = parent_rules + local if local else parent_rules
+        self._dir_rules[relative_dir] = rules
+        return rules
+    
+    @staticmethod
+    def _is_ignored(relative_path: str, is_dir: bool, rules: List[IgnoreRules]) -> bool:
+        return ignored_by(rules, relative_path, is_dir)
+    
+    def _walk(self, directory: str, relative_dir: str, parent_rules: List[IgnoreRules]) -> Iterator[Path]:
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning("Could not scan %s: %s", directory, e)
+            return
+        
+        rules = self._rules_for(directory, relative_dir, parent_rules, {entry.name for entry in entries})
+        for entry in entries:
+            if self._stopped.is_set():
+                return
+            relative = f"{relative_dir}{entry.name}"
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in self.ignore_dirs or self._is_ignored(relative, True, rules):
+                        self.skipped["ignored"] += 1
+                        continue
+                    yield from self._walk(entry.path, f"{relative}/", rules)
+                    continue
+                
+                if not entry.is_file() or os.path.splitext(entry.name)[1] not in self.extensions:
+                    continue
+                if self._is_ignored(relative, False, rules):
+                    self.skipped["ignored"] += 1
+                    continue
+                
+                size = entry.stat().st_size
+                if size > self.max_file_size:
+                    self.skipped["too_large"] += 1
+                    continue
+                with open(entry.path, "rb") as f:
+                    data = f.read(settings.INDEXING_SNIFF_BYTES)
+            except OSError as e:
+                logger.warning("Could not inspect %s: %s", entry.path, e)
+                continue
+            
+            reason = sniff(data, complete=len(data) >= size)
+            if reason is not None:
+                logger.debug("Skipping %s: %s", relative, reason)
+                self.skipped[reason] += 1
+                continue
+            
+            self.discovered += 1
+            yield Path(entry.path)
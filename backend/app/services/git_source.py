@@ -0,0 +1,134 @@
+"""
+Чтение файлов проекта из дерева git (индексация ветки или коммита)
+"""
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Collection, Iterator, List, Optional
+
+from app.core.config import settings
+from app.services.file_discovery import IgnoreRules, ignored_by, sniff
+
+logger = logging.getLogger(__name__)
+
+# Режимы записей дерева, которые не являются обычными файлами
+_SYMLINK_MODE = 0o120000
+
+
+@dataclass(frozen=True)
+class GitFile:
+    """Файл дерева git: путь относительно корня и SHA blob-объекта"""
+    path: str
+    blob_sha: str
+    size: int
+
+
+class GitTree:
+    """
+    Дерево файлов ревизии git-репозитория (GitPython)
+    
+    Файлы перечисляются из объекта дерева коммита, а не из рабочей копии,
+    поэтому индексировать можно любую ветку, тег или коммит без checkout.
+    SHA blob одинаков для одинакового содержимого во всех ревизиях.
+    Пропущенные файлы считаются по причинам в skipped, как в FileDiscovery.
+    """
+    
+    def __init__(self, repo_path: str, ref: str):
+        import git
+        
+        try:
+            self.repo = git.Repo(repo_path)
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError) as e:
+            raise ValueError(f"Not a git repository: {repo_path}") from e
+        
+        try:
+            self.commit = self.repo.commit(ref)
+        except (git.BadName, ValueError) as e:
+            raise ValueError(f"Unknown git ref {ref!r} in {repo_path}") from e
+        self.ref = ref
+        self.skipped: Counter = Counter()
+    
+    @property
+    def commit_sha(self) -> str:
+        return self.commit.hexsha
+    
+    def list_files(
+        self,
+        extensions: Collection[str],
+        ignore_dirs: Collection[str],
+        max_size: Optional[int] = None
+    ) -> List[GitFile]:
+        """
+        Обычные файлы дерева с нужными расширениями (отсортированы по пути)
+        
+        Правила игнорирования те же, что у FileDiscovery: INDEXING_IGNORE_PATTERNS,
+        а .gitignore и файл игнорирования проекта читаются из blob-объектов дерева.
+        """
+        files = self._walk(
+            self.commit.tree, [IgnoreRules(settings.INDEXING_IGNORE_PATTERNS)], extensions, ignore_dirs, max_size
+        )
+        return sorted(files, key=lambda git_file: git_file.path)
+    
+    def _walk(
+        self,
+        tree,
+        parent_rules: List[IgnoreRules],
+        extensions: Collection[str],
+        ignore_dirs: Collection[str],
+        max_size: Optional[int]
+    ) -> Iterator[GitFile]:
+        items = sorted(tree, key=lambda item: item.name)
+        rules = parent_rules + self._ignore_rules(items, f"{tree.path}/" if tree.path else "")
+        for item in items:
+            if item.type == "tree":
+                if item.name in ignore_dirs or ignored_by(rules, item.path, True):
+                    self.skipped["ignored"] += 1
+                    continue
+                yield from self._walk(item, rules, extensions, ignore_dirs, max_size)
+                continue
+            
+            if item.type != "blob" or item.mode == _SYMLINK_MODE:
+                continue
+            if PurePosixPath(item.path).suffix not in extensions:
+                continue
+            if ignored_by(rules, item.path, False):
+                self.skipped["ignored"] += 1
+                continue
+            if max_size is not None and item.size > max_size:
+                self.skipped["too_large"] += 1
+                continue
+            yield GitFile(path=item.path, blob_sha=item.hexsha, size=item.size)
+    
+    @staticmethod
+    def _ignore_rules(items, relative_dir: str) -> List[IgnoreRules]:
+        """Правила файлов игнорирования среди записей директории дерева"""
+        blobs = {item.name: item for item in items if item.type == "blob"}
+        local = []
+        for ignore_file in (".gitignore", settings.INDEXING_IGNORE_FILE):
+            blob = blobs.get(ignore_file)
+            if blob is None:
+                continue
+            text = blob.data_stream.read().decode("utf-8", errors="replace")
+            rules = IgnoreRules(text.splitlines(), relative_dir)
+            if rules:
+                local.append(rules)
+        return local
+    
+    def read_text(self, git_file: GitFile) -> Optional[str]:
+        """Содержимое blob в UTF-8 или None для файлов, отбрасываемых при обнаружении"""
+        data = self.repo.odb.stream(bytes.fromhex(git_file.blob_sha)).read()
+        reason = sniff(data[:settings.INDEXING_SNIFF_BYTES], complete=len(data) <= settings.INDEXING_SNIFF_BYTES)
+        if reason is not None:
+            logger.debug("Skipping %s at %s: %s", git_file.path, self.ref, reason)
+            self.skipped[reason] += 1
+            return None
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            logger.warning("Could not decode %s at %s, skipping", git_file.path, self.ref)
+            self.skipped["encoding"] += 1
+            return None
+    
+    def close(self):
+        self.repo.close()
@@ -2,12 +2,45 @@
 Сервис графа связей (Neo4j)
 """
 import logging
-from typing import List, Dict, Optional
-from neo4j import GraphDatabase
+from array import array
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Dict, Optional
 
 from app.core.config import settings
+from app.core.logging import RateLimitedLogger
+from app.core.metrics import NEO4J_ERRORS, NEO4J_SECONDS, track
+
+if TYPE_CHECKING:
+    from neo4j import AsyncManagedTransaction
 
 logger = logging.getLogger(__name__)
+entity_log = RateLimitedLogger(logger)
+
+# Общая метка узлов сущностей: по ней работают уникальность id и индексы
+# project_id, тип сущности хранится второй меткой и свойством type
+ENTITY_LABEL = "Entity"
+
+# Схема графа (создается при подключении, повторное создание ничего не меняет)
+_SCHEMA_QUERIES = (
+    f"CREATE CONSTRAINT entity_id IF NOT EXISTS FOR (n:{ENTITY_LABEL}) REQUIRE n.id IS UNIQUE",
+    f"CREATE INDEX entity_project_id IF NOT EXISTS FOR (n:{ENTITY_LABEL}) ON (n.project_id)",
+    f"CREATE INDEX entity_project_file IF NOT EXISTS FOR (n:{ENTITY_LABEL}) ON (n.project_id, n.file_path)",
+    "CREATE INDEX relates_to_project_id IF NOT EXISTS FOR ()-[r:RELATES_TO]-() ON (r.project_id)",
+)
+
+# Индекс id, если ограничение уникальности не создано (дубликаты в старом графе)
+_ID_INDEX_QUERY = f"CREATE INDEX entity_id_lookup IF NOT EXISTS FOR (n:{ENTITY_LABEL}) ON (n.id)"
+
+
+def _node_to_dict(node) -> Dict:
+    """Преобразование узла Neo4j в словарь ответа"""
+    node_id = node.get("id", node.element_id)
+    labels = [label for label in node.labels if label != ENTITY_LABEL]
+    return {
+        "id": node_id,
+        "type": node.get("type") or (labels[0] if labels else "Unknown"),
+        "label": node.get("name", node_id),
+        "properties": dict(node)
+    }
 
 
 class GraphService:
@@ -15,28 +48,137 @@ class GraphService:
     
     def __init__(self):
         self.driver = None
+    
+    async def connect(self) -> bool:
+        """
+        Создание драйвера и проверка соединения (выполняется в warmup)
+        
+        Returns:
+            True, если Neo4j доступен
+        """
         self._connect()
+        connected = await self.verify_connectivity()
+        if connected:
+            await self._ensure_schema()
+        return connected
     
     def _connect(self):
-        """Подключение к Neo4j"""
+        """Создание асинхронного драйвера Neo4j с пулом соединений"""
         try:
-            self.driver = GraphDatabase.driver(
+            from neo4j import AsyncGraphDatabase
+            
+            self.driver = AsyncGraphDatabase.driver(
                 settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+                max_transaction_retry_time=settings.NEO4J_MAX_TRANSACTION_RETRY_TIME
             )
-            # Проверка соединения
-            self.driver.verify_connectivity()
-            logger.info(f"Connected to Neo4j at {settings.NEO4J_URI}")
+            logger.info("Neo4j driver created for %s", settings.NEO4J_URI)
         except Exception as e:
-            logger.error(f"Error connecting to Neo4j: {e}")
+            logger.error("Error connecting to Neo4j: %s", e)
             logger.warning("Graph features will be unavailable")
             self.driver = None
     
-    def _get_session(self):
-        """Получение сессии Neo4j"""
+    async def verify_connectivity(self) -> bool:
+        """Проверка соединения с Neo4j"""
         if self.driver is None:
-            return None
-        return self.driver.session()
+            return False
+        
+        try:
+            await self.driver.verify_connectivity()
+            logger.info("Connected to Neo4j at %s", settings.NEO4J_URI)
+            return True
+        except Exception as e:
+            logger.error("Error connecting to Neo4j: %s", e)
+            logger.warning("Graph features will be unavailable")
+            return False
+    
+    async def _ensure_schema(self):
+        """
+        Индексы графа и метка Entity на узлах, записанных до ее появления
+        
+        Число узлов с меткой и всех узлов берется из счетчиков Neo4j без
+        обхода, поэтому проход по узлам без метки выполняется один раз.
+        Если в старом графе есть узлы с одинаковым id, вместо ограничения
+        уникальности создается обычный индекс id.
+        """
+        try:
+            async with self._get_session(write=True) as session:
+                for query in _SCHEMA_QUERIES:
+                    try:
+                        result = await session.run(query)
+                        await result.consume()
+                    except Exception as e:
+                        if "entity_id" not in query:
+                            raise
+                        logger.warning("Could not create unique constraint on entity id, reindex to fix: %s", e)
+                        result = await session.run(_ID_INDEX_QUERY)
+                        await result.consume()
+                
+                total = await (await session.run("MATCH (n) RETURN count(n) AS count")).single()
+                labeled = await (await session.run(f"MATCH (n:{ENTITY_LABEL}) RETURN count(n) AS count")).single()
+                if total["count"] > labeled["count"]:
+                    logger.info("Adding %s label to existing graph nodes", ENTITY_LABEL)
+                    # Транзакция в автокоммите: CALL IN TRANSACTIONS не выполняется в управляемой
+                    result = await session.run(
+                        f"""
+                        MATCH (n) WHERE n.id IS NOT NULL AND NOT n:{ENTITY_LABEL}
+                        CALL {{ WITH n SET n:{ENTITY_LABEL} }} IN TRANSACTIONS OF $batch_size ROWS
+                        """,
+                        batch_size=settings.NEO4J_DELETE_BATCH_SIZE
+                    )
+                    await result.consume()
+        except Exception as e:
+            logger.error("Error creating graph schema: %s", e)
+    
+    def _get_session(self, write: bool = False):
+        """Получение сессии Neo4j с режимом доступа на чтение или запись"""
+        from neo4j import READ_ACCESS, WRITE_ACCESS
+        
+        return self.driver.session(
+            database=settings.NEO4J_DATABASE or None,
+            default_access_mode=WRITE_ACCESS if write else READ_ACCESS
+        )
+    
+    async def _read(self, name: str, work: Callable[..., Awaitable[Any]], **params) -> Any:
+        """
+        Выполнение управляемой транзакции чтения
+        
+        Драйвер повторяет транзакцию при временных ошибках, а при
+        подключении по схеме neo4j:// направляет ее на реплики чтения.
+        
+        Args:
+            name: Имя запроса для метрик
+            work: Функция транзакции
+        """
+        with track(NEO4J_SECONDS, NEO4J_ERRORS, span="neo4j", query=name):
+            async with self._get_session() as session:
+                return await session.execute_read(work, **params)
+    
+    async def _write(self, name: str, work: Callable[..., Awaitable[Any]], **params) -> Any:
+        """Выполнение управляемой транзакции записи с повтором при временных ошибках"""
+        with track(NEO4J_SECONDS, NEO4J_ERRORS, span="neo4j", query=name):
+            async with self._get_session(write=True) as session:
+                return await session.execute_write(work, **params)
+    
+    @staticmethod
+    async def _fetch_all(tx: "AsyncManagedTransaction", query: str, params: Dict) -> List:
+        """Выполнение запроса и чтение всех записей внутри транзакции"""
+        result = await tx.run(query, params)
+        return [record async for record in result]
+    
+    @staticmethod
+    async def _fetch_single(tx: "AsyncManagedTransaction", query: str, params: Dict):
+        """Выполнение запроса и чтение единственной записи"""
+        result = await tx.run(query, params)
+        return await result.single()
+    
+    @staticmethod
+    async def _execute(tx: "AsyncManagedTransaction", query: str, params: Dict):
+        """Выполнение запроса без чтения результата"""
+        result = await tx.run(query, params)
+        await result.consume()
     
     async def create_node(
         self,
@@ -56,15 +198,19 @@ class GraphService:
             return
         
         try:
-            with self._get_session() as session:
-                query = f"""
-                MERGE (n:{node_type} {{id: $id}})
-                SET n += $properties
-                """
-                session.run(query, id=node_id, properties=properties)
-                logger.debug(f"Created node: {node_id}")
+            query = f"""
+            MERGE (n:{ENTITY_LABEL} {{id: $id}})
+            SET n:{node_type}, n += $properties, n.type = $type
+            """
+            await self._write(
+                "create_node",
+                self._execute,
+                query=query,
+                params={"id": node_id, "properties": properties, "type": node_type}
+            )
+            entity_log.debug("node", "Created node: %s", node_id)
         except Exception as e:
-            logger.error(f"Error creating node {node_id}: {e}")
+            logger.error("Error creating node %s: %s", node_id, e)
     
     async def create_relationship(
         self,
@@ -88,29 +234,126 @@ class GraphService:
             return
         
         try:
-            with self._get_session() as session:
-                query = """
-                MATCH (a {id: $from_id})
-                MATCH (b {id: $to_id})
-                MERGE (a)-[r:RELATES_TO {type: $relation_type, project_id: $project_id}]->(b)
-                """
-                params = {
-                    "from_id": from_id,
-                    "to_id": to_id,
-                    "relation_type": relation_type,
-                    "project_id": project_id
-                }
-                if properties:
-                    query = query.replace("}]->", "}]->")
-                    # Добавление свойств связи
-                    for key, value in properties.items():
-                        query += f" SET r.{key} = ${key}"
-                        params[key] = value
-                
-                session.run(query, **params)
-                logger.debug(f"Created relationship: {from_id} -> {to_id} ({relation_type})")
+            query = f"""
+            MATCH (a:{ENTITY_LABEL} {{id: $from_id}})
+            MATCH (b:{ENTITY_LABEL} {{id: $to_id}})
+            MERGE (a)-[r:RELATES_TO {{type: $relation_type, project_id: $project_id}}]->(b)
+            """
+            params = {
+                "from_id": from_id,
+                "to_id": to_id,
+                "relation_type": relation_type,
+                "project_id": project_id
+            }
+            if properties:
+                # Добавление свойств связи
+                query += " SET r += $properties"
+                params["properties"] = properties
+            
+            await self._write("create_relationship", self._execute, query=query, params=params)
+            entity_log.debug("relationship", "Created relationship: %s -> %s (%s)", from_id, to_id, relation_type)
+        except Exception as e:
+            logger.error("Error creating relationship: %s", e)
+    
+    async def write_entities(
+        self,
+        nodes: List[Dict],
+        relationships: List[Dict],
+        project_id: Optional[str] = None,
+        replace_files: Optional[List[str]] = None,
+        delete_ids: Optional[List[str]] = None
+    ):
+        """
+        Пакетная запись узлов и связей одной транзакцией
+        
+        Узлы группируются по типу (метке) и пишутся через UNWIND, поэтому
+        число запросов не зависит от количества сущностей. Узлы и концы
+        связей ищутся по уникальному id на метке Entity, прежние узлы
+        файлов - по составному индексу (project_id, file_path).
+        
+        Args:
+            nodes: Узлы вида {"id", "type", "properties"}
+            relationships: Связи вида {"from_id", "to_id", "relation_type", "project_id"}
+            project_id: ID проекта (для replace_files)
+            replace_files: Файлы, чьи прежние узлы удаляются перед записью
+            delete_ids: Сущности, исчезнувшие из файлов (удаляются со связями)
+        
+        Raises:
+            Exception: Ошибка Neo4j (транзакция откатывается целиком)
+        """
+        if self.driver is None:
+            return
+        
+        rows_by_type: Dict[str, List[Dict]] = {}
+        for node in nodes:
+            rows_by_type.setdefault(node["type"], []).append(
+                {"id": node["id"], "properties": node["properties"]}
+            )
+        
+        relationship_rows = [
+            {
+                "from_id": rel["from_id"],
+                "to_id": rel["to_id"],
+                "relation_type": rel["relation_type"],
+                "project_id": rel["project_id"],
+                "properties": rel.get("properties") or {}
+            }
+            for rel in relationships
+        ]
+        
+        async def work(tx: "AsyncManagedTransaction"):
+            if replace_files:
+                await self._execute(
+                    tx,
+                    f"""
+                    MATCH (n:{ENTITY_LABEL})
+                    WHERE n.project_id = $project_id AND n.file_path IN $file_paths
+                    DETACH DELETE n
+                    """,
+                    {"project_id": project_id, "file_paths": replace_files}
+                )
+            
+            if delete_ids:
+                await self._execute(
+                    tx,
+                    f"""
+                    MATCH (n:{ENTITY_LABEL})
+                    WHERE n.id IN $ids
+                    DETACH DELETE n
+                    """,
+                    {"ids": delete_ids}
+                )
+            
+            for node_type, rows in rows_by_type.items():
+                await self._execute(
+                    tx,
+                    f"""
+                    UNWIND $rows AS row
+                    MERGE (n:{ENTITY_LABEL} {{id: row.id}})
+                    SET n:{node_type}, n += row.properties, n.type = $type
+                    """,
+                    {"rows": rows, "type": node_type}
+                )
+            
+            if relationship_rows:
+                await self._execute(
+                    tx,
+                    f"""
+                    UNWIND $rows AS row
+                    MATCH (a:{ENTITY_LABEL} {{id: row.from_id}})
+                    MATCH (b:{ENTITY_LABEL} {{id: row.to_id}})
+                    MERGE (a)-[r:RELATES_TO {{type: row.relation_type, project_id: row.project_id}}]->(b)
+                    SET r += row.properties
+                    """,
+                    {"rows": relationship_rows}
+                )
+        
+        try:
+            await self._write("write_entities", work)
+            logger.debug("Wrote %s nodes and %s relationships", len(nodes), len(relationship_rows))
         except Exception as e:
-            logger.error(f"Error creating relationship: {e}")
+            logger.error("Error writing entities: %s", e)
+            raise
     
     async def get_entity_graph(
         self,
@@ -133,58 +376,51 @@ class GraphService:
             return {"nodes": [], "edges": []}
         
         try:
-            with self._get_session() as session:
-                query = f"""
-                MATCH path = (start {{id: $entity_id}})-[*1..{depth}]-(connected)
-                WHERE start.id = $entity_id
-                WITH path, relationships(path) as rels
-                UNWIND rels as rel
-                WITH DISTINCT start, connected, rel
-                LIMIT {max_nodes}
-                RETURN start, connected, rel
-                """
-                
-                result = session.run(query, entity_id=entity_id, max_nodes=max_nodes)
-                
-                nodes = {}
-                edges = []
+            query = f"""
+            MATCH path = (start:{ENTITY_LABEL} {{id: $entity_id}})-[*1..{int(depth)}]-(connected)
+            WHERE start.id = $entity_id
+            WITH path, relationships(path) as rels
+            UNWIND rels as rel
+            WITH DISTINCT start, connected, rel
+            LIMIT {int(max_nodes)}
+            RETURN start, connected, rel
+            """
+            
+            records = await self._read(
+                "entity_graph",
+                self._fetch_all,
+                query=query,
+                params={"entity_id": entity_id}
+            )
+            
+            nodes = {}
+            edges = []
+            
+            for record in records:
+                start_node = _node_to_dict(record["start"])
+                connected_node = _node_to_dict(record["connected"])
+                relationship = record["rel"]
                 
-                for record in result:
-                    start_node = record["start"]
-                    connected_node = record["connected"]
-                    relationship = record["rel"]
-                    
-                    # Добавление узлов
-                    nodes[start_node.id] = {
-                        "id": start_node.id,
-                        "type": list(start_node.labels)[0] if start_node.labels else "Unknown",
-                        "label": start_node.get("name", start_node.id),
-                        "properties": dict(start_node)
-                    }
-                    
-                    nodes[connected_node.id] = {
-                        "id": connected_node.id,
-                        "type": list(connected_node.labels)[0] if connected_node.labels else "Unknown",
-                        "label": connected_node.get("name", connected_node.id),
-                        "properties": dict(connected_node)
-                    }
-                    
-                    # Добавление связи
-                    edges.append({
-                        "source": start_node.id,
-                        "target": connected_node.id,
-                        "type": relationship.get("type", "RELATES_TO"),
-                        "weight": relationship.get("weight", 1.0),
-                        "properties": dict(relationship)
-                    })
+                # Добавление узлов
+                nodes[start_node["id"]] = start_node
+                nodes[connected_node["id"]] = connected_node
                 
-                return {
-                    "nodes": list(nodes.values()),
-                    "edges": edges
-                }
+                # Добавление связи
+                edges.append({
+                    "source": start_node["id"],
+                    "target": connected_node["id"],
+                    "type": relationship.get("type", "RELATES_TO"),
+                    "weight": relationship.get("weight", 1.0),
+                    "properties": dict(relationship)
+                })
+            
+            return {
+                "nodes": list(nodes.values()),
+                "edges": edges
+            }
         
         except Exception as e:
-            logger.error(f"Error getting entity graph: {e}")
+            logger.error("Error getting entity graph: %s", e)
             return {"nodes": [], "edges": []}
     
     async def get_entity_connections(
@@ -206,71 +442,228 @@ class GraphService:
             return []
         
         try:
-            with self._get_session() as session:
-                query = """
-                MATCH (start {id: $entity_id})-[r:RELATES_TO]-(connected)
-                """
-                
-                if connection_type:
-                    query += " WHERE r.type = $connection_type"
-                
-                query += """
-                RETURN connected, r.type as relation_type, COALESCE(r.weight, 1.0) as weight
-                ORDER BY weight DESC
-                LIMIT 50
-                """
-                
-                params = {"entity_id": entity_id}
-                if connection_type:
-                    params["connection_type"] = connection_type
-                
-                result = session.run(query, **params)
-                
-                connections = []
-                for record in result:
-                    node = record["connected"]
-                    connections.append({
-                        "id": node.id,
-                        "type": list(node.labels)[0] if node.labels else "Unknown",
-                        "title": node.get("name", node.id),
-                        "relation_type": record["relation_type"],
-                        "score": record.get("weight", 1.0)
-                    })
-                
-                return connections
+            query = f"""
+            MATCH (start:{ENTITY_LABEL} {{id: $entity_id}})-[r:RELATES_TO]-(connected)
+            """
+            
+            if connection_type:
+                query += " WHERE r.type = $connection_type"
+            
+            # Вес ребра - PageRank его цели; для входящих связей
+            # используется оценка самого соседа
+            query += """
+            RETURN connected, r.type as relation_type,
+                   CASE WHEN endNode(r) = connected
+                        THEN COALESCE(r.weight, 1.0)
+                        ELSE COALESCE(connected.pagerank, 1.0)
+                   END as weight
+            ORDER BY weight DESC
+            LIMIT 50
+            """
+            
+            params = {"entity_id": entity_id}
+            if connection_type:
+                params["connection_type"] = connection_type
+            
+            records = await self._read("entity_connections", self._fetch_all, query=query, params=params)
+            
+            connections = []
+            for record in records:
+                node = _node_to_dict(record["connected"])
+                connections.append({
+                    "id": node["id"],
+                    "type": node["type"],
+                    "title": node["label"],
+                    "relation_type": record["relation_type"],
+                    "score": record.get("weight", 1.0)
+                })
+            
+            return connections
         
         except Exception as e:
-            logger.error(f"Error getting connections: {e}")
+            logger.error("Error getting connections: %s", e)
             return []
     
-    async def delete_project(self, project_id: str):
-        """Удаление всех узлов и связей проекта"""
+    async def get_project_topology(self, project_id: str) -> Optional[Dict]:
+        """
+        Выгрузка топологии проекта для офлайн-расчетов
+        
+        Args:
+            project_id: ID проекта
+        
+        Returns:
+            Словарь с element id узлов, ранее сохраненными оценками
+            и ребрами в виде индексов узлов, либо None при ошибке
+        """
         if self.driver is None:
-            return
+            return None
+        
+        async def load(tx: "AsyncManagedTransaction") -> Dict:
+            nodes_query = f"""
+            MATCH (n:{ENTITY_LABEL} {{project_id: $project_id}})
+            RETURN elementId(n) as eid, n.pagerank as pagerank, n.degree as degree
+            """
+            element_ids = []
+            pagerank = []
+            degree = []
+            index = {}
+            result = await tx.run(nodes_query, project_id=project_id)
+            async for record in result:
+                index[record["eid"]] = len(element_ids)
+                element_ids.append(record["eid"])
+                pagerank.append(record["pagerank"])
+                degree.append(record["degree"])
+            
+            edges_query = """
+            MATCH (a)-[r:RELATES_TO {project_id: $project_id}]->(b)
+            RETURN elementId(a) as source, elementId(b) as target
+            """
+            sources = array("q")
+            targets = array("q")
+            result = await tx.run(edges_query, project_id=project_id)
+            async for record in result:
+                source = index.get(record["source"])
+                target = index.get(record["target"])
+                # Ребра к узлам других проектов в расчет не попадают
+                if source is None or target is None:
+                    continue
+                sources.append(source)
+                targets.append(target)
+            
+            return {
+                "element_ids": element_ids,
+                "pagerank": pagerank,
+                "degree": degree,
+                "sources": sources,
+                "targets": targets
+            }
         
         try:
-            with self._get_session() as session:
-                # Удаление всех связей проекта
-                query1 = """
-                MATCH ()-[r {project_id: $project_id}]-()
-                DELETE r
-                """
-                session.run(query1, project_id=project_id)
-                
-                # Удаление всех узлов проекта
-                query2 = """
-                MATCH (n {project_id: $project_id})
-                DELETE n
-                """
-                session.run(query2, project_id=project_id)
+            return await self._read("project_topology", load)
+        except Exception as e:
+            logger.error("Error loading topology for project %s: %s", project_id, e)
+            return None
+    
+    async def write_centrality(self, rows: List[Dict], batch_size: int = 5000) -> int:
+        """
+        Сохранение оценок центральности на узлах и входящих ребрах
+        
+        Вес входящего ребра равен нормированному PageRank целевого узла,
+        поэтому сортировка по `weight` ранжирует соседей по важности.
+        
+        Args:
+            rows: Строки вида {eid, pagerank, degree, in_degree, out_degree, degree_centrality}
+            batch_size: Размер одной транзакции записи
+        
+        Returns:
+            Количество обновленных узлов
+        """
+        if self.driver is None or not rows:
+            return 0
+        
+        query = """
+        UNWIND $rows AS row
+        MATCH (n) WHERE elementId(n) = row.eid
+        SET n.pagerank = row.pagerank,
+            n.degree = row.degree,
+            n.in_degree = row.in_degree,
+            n.out_degree = row.out_degree,
+            n.degree_centrality = row.degree_centrality
+        FOREACH (r IN [()-[rel:RELATES_TO]->(n) | rel] | SET r.weight = row.pagerank)
+        """
+        
+        written = 0
+        try:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                await self._write("write_centrality", self._execute, query=query, params={"rows": batch})
+                written += len(batch)
+        except Exception as e:
+            logger.error("Error writing centrality scores: %s", e)
+        
+        return written
+    
+    async def delete_project(
+        self,
+        project_id: str,
+        batch_size: Optional[int] = None,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        Удаление всех узлов и связей проекта
+        
+        Узлы удаляются через DETACH DELETE пачками, каждая пачка в своей
+        транзакции, поэтому память транзакции ограничена размером пачки.
+        Пачки выбираются по индексам project_id (метка Entity и связи
+        RELATES_TO), а не обходом всей БД.
+        
+        Args:
+            project_id: ID проекта
+            batch_size: Количество узлов в одной транзакции
+            on_progress: Callback с общим числом удаленных узлов после каждой пачки
+        
+        Returns:
+            Количество удаленных узлов
+        
+        Raises:
+            Exception: Ошибка Neo4j (часть проекта может быть уже удалена, повтор безопасен)
+        """
+        if self.driver is None:
+            return 0
+        
+        batch_size = batch_size or settings.NEO4J_DELETE_BATCH_SIZE
+        params = {"project_id": project_id, "batch_size": batch_size}
+        deleted = 0
+        
+        try:
+            # Связи проекта между узлами других проектов
+            relationships_query = """
+            MATCH ()-[r:RELATES_TO {project_id: $project_id}]->()
+            WITH r LIMIT $batch_size
+            DELETE r
+            RETURN count(r) as deleted
+            """
+            while True:
+                record = await self._write(
+                    "delete_project_relationships",
+                    self._fetch_single,
+                    query=relationships_query,
+                    params=params
+                )
+                if not record or record["deleted"] == 0:
+                    break
+            
+            nodes_query = f"""
+            MATCH (n:{ENTITY_LABEL} {{project_id: $project_id}})
+            WITH n LIMIT $batch_size
+            DETACH DELETE n
+            RETURN count(n) as deleted
+            """
+            while True:
+                record = await self._write(
+                    "delete_project_nodes",
+                    self._fetch_single,
+                    query=nodes_query,
+                    params=params
+                )
+                batch_deleted = record["deleted"] if record else 0
+                if batch_deleted == 0:
+                    break
                 
-                logger.info(f"Deleted project {project_id} from graph")
+                deleted += batch_deleted
+                logger.info("Deleted %s nodes of project %s from graph", deleted, project_id)
+                if on_progress:
+                    on_progress(deleted)
+            
+            logger.info("Deleted project %s from graph", project_id)
         
         except Exception as e:
-            logger.error(f"Error deleting project: {e}")
+            logger.error("Error deleting project %s after %s nodes: %s", project_id, deleted, e)
+            raise
+        
+        return deleted
     
-    def close(self):
-        """Закрытие соединения"""
+    async def close(self):
+        """Закрытие драйвера и пула соединений"""
         if self.driver:
-            self.driver.close()
-
+            await self.driver.close()
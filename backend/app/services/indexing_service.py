@@ -3,47 +3,114 @@
 """
 import os
 import asyncio
-from pathlib import Path
-from typing import List, Dict, Optional
+import hashlib
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple, Union
 from datetime import datetime
 import logging
+import time
+from collections import Counter
+import numpy as np
 
 from app.core.config import settings
+from app.core.metrics import INDEXED_ENTITIES, INDEXING_STAGE_ERRORS, INDEXING_STAGE_SECONDS, track
 from app.services.embedding_service import EmbeddingService
 from app.services.vector_service import VectorService
 from app.services.graph_service import GraphService
-from app.models.entities import CodeEntity, FileEntity, ProjectEntity
+from app.services.centrality_service import CentralityService
+from app.services.embedding_pool import EmbeddingWorkerPool
+from app.services.blob_cache import BlobCache
+from app.services.git_source import GitFile, GitTree
+from app.services.file_discovery import DEFAULT_IGNORED_DIRS, FileDiscovery
+from app.services.code_parser import ParseResult, parse_files
+from app.services.parser_pool import ParserPool
+from app.services.job_queue import IndexingCancelled
+from app.services.cache_service import CacheService
+from app.models.entities import CodeEntity, ProjectEntity
 
 logger = logging.getLogger(__name__)
 
+# Версия разбора файлов: входит в ключ кеша blob-объектов, повышается
+# при изменении парсеров, чтобы не использовать устаревшие сущности
+PARSER_VERSION = 3
+
+# Способы получения вектора файла (INDEXING_FILE_VECTOR_MODE)
+FILE_VECTOR_MODES = ("embed", "pool", "none")
+
+# Поля payload, которые обновляются без перезаписи вектора при неизменном содержимом
+_POSITION_FIELDS = ("name", "type", "line_start", "line_end", "blob_sha")
+
 
 class IndexingService:
     """Сервис для индексации проектов"""
     
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_service = VectorService()
-        self.graph_service = GraphService()
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        vector_service: VectorService,
+        graph_service: GraphService,
+        centrality_service: CentralityService,
+        embedding_pool: Optional[EmbeddingWorkerPool] = None,
+        cache_service: Optional[CacheService] = None,
+        blob_cache: Optional[BlobCache] = None,
+        parser_pool: Optional[ParserPool] = None
+    ):
+        self.embedding_service = embedding_service
+        self.vector_service = vector_service
+        self.graph_service = graph_service
+        self.centrality_service = centrality_service
+        self.embedding_pool = embedding_pool
+        self.cache_service = cache_service
+        self.blob_cache = blob_cache
+        self.parser_pool = parser_pool
         self.supported_extensions = {'.py', '.js', '.ts', '.java', '.kt', '.md', '.txt'}
+        # Игнорируемые директории (дополнительно к правилам .gitignore проекта)
+        self.ignore_dirs = set(DEFAULT_IGNORED_DIRS)
+        # Модель, которой получены векторы точек (сохраненный вектор другой модели не переиспользуется)
+        self.embedding_model_key = (
+            f"{settings.EMBEDDING_BACKEND}:{settings.EMBEDDING_MODEL}:int8={settings.EMBEDDING_QUANTIZE}"
+        )
+        self.file_vector_mode = settings.INDEXING_FILE_VECTOR_MODE
+        if self.file_vector_mode not in FILE_VECTOR_MODES:
+            raise ValueError(f"Unknown INDEXING_FILE_VECTOR_MODE: {self.file_vector_mode}")
     
     async def index_project(
         self,
         project_path: str,
         project_id: str,
-        force: bool = False
+        force: bool = False,
+        start_from: int = 0,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        git_ref: Optional[str] = None
     ) -> Dict:
         """
         Индексация проекта
         
+        Файлы обходятся в детерминированном порядке, поэтому прерванную
+        индексацию можно продолжить с сохраненной позиции. Пачки файлов
+        индексируются по мере обхода проекта, не дожидаясь его окончания.
+        
+        С git_ref файлы берутся из дерева ревизии репозитория project_path.
+        Сущности и эмбеддинги blob-объектов, уже индексированных в любой
+        ветке или проекте, берутся из кеша: заново разбираются и
+        векторизуются только измененные файлы.
+        
+        Сущности файлов сравниваются с сохраненными в векторной БД
+        (INDEXING_ENTITY_DIFF): векторизуются и записываются только
+        изменившиеся, у сдвинутых обновляется payload.
+        
         Args:
             project_path: Путь к проекту
             project_id: Уникальный ID проекта
-            force: Принудительная переиндексация
+            force: Принудительная переиндексация (без кеша blob-объектов и сравнения сущностей)
+            start_from: Число уже обработанных файлов (продолжение после сбоя)
+            on_progress: Callback (обработано, всего) после каждой пачки файлов
+            git_ref: Ветка, тег или коммит для индексации из git
         
         Returns:
             Статистика индексации
         """
-        logger.info(f"Starting indexing for project {project_id} at {project_path}")
+        logger.info("Starting indexing for project %s at %s", project_id, project_path)
         
         if not os.path.exists(project_path):
             raise ValueError(f"Project path does not exist: {project_path}")
@@ -58,247 +125,680 @@ class IndexingService:
             "completed_at": None
         }
         
+        git_tree = None
+        discovery = None
+        entity_stats = Counter()
         try:
-            # Получить все файлы для индексации
-            files = self._get_files_to_index(project_path)
-            stats["total_files"] = len(files)
+            batch_size = settings.INDEXING_FILE_BATCH_SIZE
+            if git_ref:
+                with track(INDEXING_STAGE_SECONDS, INDEXING_STAGE_ERRORS, stage="discover"):
+                    git_tree = GitTree(project_path, git_ref)
+                    files = git_tree.list_files(
+                        self.supported_extensions, self.ignore_dirs, settings.INDEXING_MAX_FILE_SIZE
+                    )
+                stats.update({"git_ref": git_ref, "commit": git_tree.commit_sha, "reused_blobs": 0})
+                batches = self._slices(files, start_from, batch_size)
+            else:
+                # Обход идет в потоке, общее число файлов известно после его окончания
+                discovery = FileDiscovery(project_path, self.supported_extensions, self.ignore_dirs)
+                batches = discovery.batches(batch_size, skip=start_from)
+            processed = start_from
             
-            # Индексация файлов
-            for file_path in files:
+            # Индексация файлов пачками
+            async for batch in batches:
+                if git_tree is not None:
+                    errors, reused = await self._index_git_files(
+                        batch, git_tree, project_path, project_id, force, entity_stats
+                    )
+                    stats["reused_blobs"] += reused
+                else:
+                    errors = await self._index_files(batch, project_path, project_id, force, entity_stats)
+                processed += len(batch)
+                stats["indexed_files"] += len(batch) - len(errors)
+                stats["errors"].extend(errors)
+                if on_progress is not None:
+                    await on_progress(processed, len(files) if git_tree is not None else discovery.discovered)
+            
+            if git_tree is not None:
+                stats["total_files"] = len(files)
+                # Причины по содержимому (binary, minified...) известны только после чтения blob
+                stats["skipped_files"] = dict(git_tree.skipped)
+            else:
+                stats["total_files"] = discovery.discovered
+                stats["skipped_files"] = dict(discovery.skipped)
+            stats["indexed_files"] += min(start_from, stats["total_files"])
+            stats["entities"] = dict(entity_stats)
+            
+            # Подсчет сущностей
+            stats["total_entities"] = await self._count_entities(project_id)
+            
+            # Пересчет центральности графа для ранжирования
+            if settings.CENTRALITY_ENABLED:
                 try:
-                    await self._index_file(file_path, project_path, project_id)
-                    stats["indexed_files"] += 1
+                    with track(INDEXING_STAGE_SECONDS, INDEXING_STAGE_ERRORS, stage="centrality"):
+                        stats["centrality"] = await self.centrality_service.compute_project_centrality(project_id)
                 except Exception as e:
-                    error_msg = f"Error indexing {file_path}: {str(e)}"
+                    error_msg = f"Error computing centrality: {str(e)}"
                     logger.error(error_msg)
                     stats["errors"].append(error_msg)
             
-            # Подсчет сущностей
-            stats["total_entities"] = await self._count_entities(project_id)
+            await self._invalidate_cache(project_id)
             
             stats["completed_at"] = datetime.now().isoformat()
-            logger.info(f"Indexing completed for project {project_id}")
+            logger.info("Indexing completed for project %s", project_id)
             
+        except IndexingCancelled:
+            logger.info("Indexing cancelled for project %s", project_id)
+            await self._invalidate_cache(project_id)
+            raise
+        
         except Exception as e:
-            logger.error(f"Indexing failed for project {project_id}: {str(e)}")
+            logger.error("Indexing failed for project %s: %s", project_id, e)
             stats["errors"].append(str(e))
+            # Часть файлов могла быть записана до ошибки
+            await self._invalidate_cache(project_id)
             raise
         
+        finally:
+            if discovery is not None:
+                discovery.stop()
+            if git_tree is not None:
+                git_tree.close()
+        
         return stats
     
-    def _get_files_to_index(self, project_path: str) -> List[Path]:
-        """Получить список файлов для индексации"""
-        files = []
-        path = Path(project_path)
+    @staticmethod
+    async def _slices(files: List[GitFile], start_from: int, batch_size: int) -> AsyncIterator[List[GitFile]]:
+        """Пачки готового списка файлов начиная с позиции start_from"""
+        for start in range(min(start_from, len(files)), len(files), batch_size):
+            yield files[start:start + batch_size]
+    
+    async def _index_files(
+        self,
+        file_paths: List[Path],
+        project_path: str,
+        project_id: str,
+        force: bool = False,
+        entity_stats: Optional[Counter] = None
+    ) -> List[str]:
+        """
+        Индексация пачки файлов
         
-        # Игнорируемые директории
-        ignore_dirs = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'build', 'dist'}
+        Сущности всех файлов пачки векторизуются одним батчем
+        и записываются в векторную БД одним upsert.
         
-        for root, dirs, filenames in os.walk(path):
-            # Фильтрация игнорируемых директорий
-            dirs[:] = [d for d in dirs if d not in ignore_dirs]
-            
-            for filename in filenames:
-                file_path = Path(root) / filename
-                if file_path.suffix in self.supported_extensions:
-                    files.append(file_path)
+        Returns:
+            Сообщения об ошибках по файлам пачки
+        """
+        errors = []
+        parsed = []
+        with track(INDEXING_STAGE_SECONDS, stage="parse"):
+            results = await self._parse_files([(file_path, None) for file_path in file_paths], project_path, project_id)
+        for file_path, result in zip(file_paths, results):
+            if isinstance(result, Exception):
+                errors.append(self._parse_error(file_path, result))
+            elif result is not None:
+                parsed.append((file_path, result))
+        
+        if not parsed:
+            return errors
+        
+        try:
+            await self._index_parsed(
+                [result for _, result in parsed], project_id, diff=not force, entity_stats=entity_stats
+            )
+        except Exception as e:
+            for file_path, _ in parsed:
+                error_msg = f"Error indexing {file_path}: {str(e)}"
+                logger.error(error_msg)
+                errors.append(error_msg)
         
-        return files
+        return errors
     
-    async def _index_file(
+    async def _index_git_files(
         self,
-        file_path: Path,
+        git_files: List[GitFile],
+        git_tree: GitTree,
         project_path: str,
-        project_id: str
-    ):
-        """Индексация одного файла"""
-        logger.debug(f"Indexing file: {file_path}")
+        project_id: str,
+        force: bool = False,
+        entity_stats: Optional[Counter] = None
+    ) -> Tuple[List[str], int]:
+        """
+        Индексация пачки файлов дерева git с кешем по SHA blob-объектов
         
-        # Чтение файла
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            logger.warning(f"Could not decode {file_path}, skipping")
-            return
-        
-        # Определение типа файла
-        file_ext = file_path.suffix
-        
-        if file_ext == '.py':
-            entities = await self._parse_python_file(file_path, content, project_path, project_id)
-        elif file_ext in {'.md', '.txt'}:
-            entities = await self._parse_documentation_file(file_path, content, project_path, project_id)
-        else:
-            entities = await self._parse_generic_file(file_path, content, project_path, project_id)
-        
-        # Создание файловой сущности
-        file_entity = FileEntity(
-            id=f"{project_id}:{file_path.relative_to(project_path)}",
-            path=str(file_path.relative_to(project_path)),
-            project_id=project_id,
-            content=content,
-            language=file_ext[1:] if file_ext else "unknown"
-        )
+        Returns:
+            Сообщения об ошибках и число файлов, взятых из кеша
+        """
+        keys = [(git_file.blob_sha, PurePosixPath(git_file.path).name) for git_file in git_files]
+        cached = {}
+        if self.blob_cache is not None and not force:
+            cached = await asyncio.to_thread(self.blob_cache.get_many, keys)
         
-        # Индексация файла
-        await self._index_entity(file_entity, project_id)
+        # Разбор только blob-объектов, которых нет в кеше
+        errors = []
+        fresh: Dict[str, ParseResult] = {}
+        missing = [git_file for git_file, key in zip(git_files, keys) if key not in cached]
+        with track(INDEXING_STAGE_SECONDS, stage="parse"):
+            contents = await asyncio.to_thread(lambda: [git_tree.read_text(git_file) for git_file in missing])
+            to_parse = [(git_file, content) for git_file, content in zip(missing, contents) if content is not None]
+            results = await self._parse_files(
+                [(Path(project_path) / git_file.path, content) for git_file, content in to_parse],
+                project_path,
+                project_id
+            )
+        for (git_file, _), result in zip(to_parse, results):
+            if isinstance(result, Exception):
+                errors.append(self._parse_error(git_file.path, result))
+            elif result is not None:
+                fresh[git_file.path] = result
         
-        # Индексация сущностей из файла
-        for entity in entities:
-            await self._index_entity(entity, project_id)
+        parsed = []
+        known_embeddings = []
+        parsed_keys = []
+        for git_file, key in zip(git_files, keys):
+            if key in cached:
+                entities_data, vectors = cached[key]
+                result = self._entities_from_cache(entities_data, git_file.path, project_id)
+            elif git_file.path in fresh:
+                result = fresh[git_file.path]
+                vectors = None
+                parsed_keys.append((len(parsed), key))
+            else:
+                continue
             
-            # Связь сущности с файлом
-            await self.graph_service.create_relationship(
-                entity.id,
-                file_entity.id,
-                "defined_in",
-                project_id
+            file_entity, file_entities = result
+            for entity in (file_entity, *file_entities):
+                entity.metadata["blob_sha"] = git_file.blob_sha
+            parsed.append(result)
+            known_embeddings.append(vectors)
+        
+        if not parsed:
+            return errors, 0
+        
+        try:
+            embeddings = await self._index_parsed(
+                parsed, project_id, known_embeddings=known_embeddings, diff=not force, entity_stats=entity_stats
             )
+        except Exception as e:
+            for git_file in git_files:
+                error_msg = f"Error indexing {git_file.path}: {str(e)}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+            return errors, 0
+        
+        if self.blob_cache is not None and parsed_keys:
+            # Строки матрицы эмбеддингов идут по файлам: файл, затем его сущности
+            offsets = np.cumsum([0] + [1 + len(file_entities) for _, file_entities in parsed])
+            new_items = {
+                key: (
+                    self._entities_to_cache(*parsed[index], project_id),
+                    embeddings[offsets[index]:offsets[index + 1]]
+                )
+                for index, key in parsed_keys
+            }
+            await asyncio.to_thread(self.blob_cache.put_many, new_items)
+        
+        return errors, len(parsed) - len(parsed_keys)
     
-    async def _parse_python_file(
-        self,
-        file_path: Path,
-        content: str,
-        project_path: str,
+    @staticmethod
+    def _entities_to_cache(file_entity: CodeEntity, entities: List[CodeEntity], project_id: str) -> List[Dict]:
+        """Сущности файла без проекта и пути (ID хранится суффиксом после пути)"""
+        prefix_length = len(f"{project_id}:{file_entity.file_path}")
+        return [
+            {
+                "id_suffix": entity.id[prefix_length:],
+                "name": entity.name,
+                "type": entity.type,
+                "content": entity.content,
+                "line_start": entity.line_start,
+                "line_end": entity.line_end,
+                "metadata": {key: value for key, value in entity.metadata.items() if key != "blob_sha"}
+            }
+            for entity in (file_entity, *entities)
+        ]
+    
+    @staticmethod
+    def _entities_from_cache(
+        entities_data: List[Dict],
+        relative_path: str,
         project_id: str
-    ) -> List[CodeEntity]:
-        """Парсинг Python файла"""
-        import ast
+    ) -> Tuple[CodeEntity, List[CodeEntity]]:
+        """Сущности файла из кеша с ID текущего проекта и пути"""
+        entities = [
+            CodeEntity(
+                id=f"{project_id}:{relative_path}{data['id_suffix']}",
+                name=data["name"],
+                type=data["type"],
+                file_path=relative_path,
+                project_id=project_id,
+                content=data["content"],
+                line_start=data["line_start"],
+                line_end=data["line_end"],
+                metadata=dict(data["metadata"])
+            )
+            for data in entities_data
+        ]
+        return entities[0], entities[1:]
+    
+    async def _index_parsed(
+        self,
+        parsed: List[Tuple[CodeEntity, List[CodeEntity]]],
+        project_id: str,
+        replace_files: Optional[List[str]] = None,
+        known_embeddings: Optional[List[Optional[np.ndarray]]] = None,
+        diff: bool = False,
+        entity_stats: Optional[Counter] = None
+    ) -> np.ndarray:
+        """
+        Запись разобранных файлов: векторы одним батчем, граф одной транзакцией
+        
+        Содержимое файла с извлеченными сущностями повторно не векторизуется
+        (INDEXING_FILE_VECTOR_MODE=pool): его вектор - среднее векторов
+        сущностей верхнего уровня. Файл документации представлен одной
+        сущностью с ID файла, поэтому строка файла берет ее вектор.
         
+        Args:
+            known_embeddings: Готовые эмбеддинги по файлам (строки: файл, затем
+                его сущности) или None для файлов, которые нужно векторизовать
+            diff: Сравнить сущности с сохраненными (см. _index_entities)
+        
+        Returns:
+            Эмбеддинги всех записанных сущностей
+        """
         entities = []
-        relative_path = str(file_path.relative_to(project_path))
+        relationships = []
+        entity_embeddings: List[Optional[np.ndarray]] = []
+        # Строка файла -> строки сущностей, из которых выводится его вектор
+        derived: Dict[int, List[int]] = {}
+        for index, (file_entity, file_entities) in enumerate(parsed):
+            if self.file_vector_mode != "embed" and not any(entity.id == file_entity.id for entity in file_entities):
+                top_level = [
+                    len(entities) + 1 + offset
+                    for offset, entity in enumerate(file_entities)
+                    if not entity.metadata.get("parent")
+                ]
+                # Файл без сущностей (синтаксическая ошибка, только код модуля) векторизуется целиком
+                if top_level:
+                    derived[len(entities)] = top_level if self.file_vector_mode == "pool" else []
+            entities.append(file_entity)
+            entities.extend(file_entities)
+            vectors = known_embeddings[index] if known_embeddings is not None else None
+            entity_embeddings.extend(
+                vectors if vectors is not None else [None] * (1 + len(file_entities))
+            )
+            # Связь сущностей с файлами и методов с классами
+            relationships.extend(
+                {
+                    "from_id": entity.id,
+                    "to_id": file_entity.id,
+                    "relation_type": "defined_in",
+                    "project_id": project_id
+                }
+                for entity in file_entities
+                if entity.id != file_entity.id
+            )
+            relationships.extend(
+                {
+                    "from_id": entity.id,
+                    "to_id": f"{file_entity.id}::{entity.metadata['parent']}",
+                    "relation_type": "member_of",
+                    "project_id": project_id
+                }
+                for entity in file_entities
+                if entity.metadata.get("parent")
+            )
         
-        try:
-            tree = ast.parse(content, filename=str(file_path))
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    entity = CodeEntity(
-                        id=f"{project_id}:{relative_path}::{node.name}",
-                        name=node.name,
-                        type="class",
-                        file_path=relative_path,
-                        project_id=project_id,
-                        content=ast.get_source_segment(content, node) or "",
-                        line_start=node.lineno,
-                        line_end=node.end_lineno or node.lineno
-                    )
-                    entities.append(entity)
-                
-                elif isinstance(node, ast.FunctionDef):
-                    # Пропускаем методы классов (они уже обработаны)
-                    if not any(isinstance(parent, ast.ClassDef) for parent in ast.walk(tree) 
-                              if hasattr(parent, 'body') and node in parent.body):
-                        entity = CodeEntity(
-                            id=f"{project_id}:{relative_path}::{node.name}",
-                            name=node.name,
-                            type="function",
-                            file_path=relative_path,
-                            project_id=project_id,
-                            content=ast.get_source_segment(content, node) or "",
-                            line_start=node.lineno,
-                            line_end=node.end_lineno or node.lineno
-                        )
-                        entities.append(entity)
-        
-        except SyntaxError as e:
-            logger.warning(f"Syntax error in {file_path}: {e}")
-        
-        return entities
+        return await self._index_entities(
+            entities, project_id, relationships, replace_files, entity_embeddings, diff, entity_stats, derived
+        )
     
-    async def _parse_documentation_file(
+    async def _parse_files(
         self,
-        file_path: Path,
-        content: str,
+        items: List[Tuple[Path, Optional[str]]],
         project_path: str,
         project_id: str
-    ) -> List[CodeEntity]:
-        """Парсинг документации"""
-        # Для документации создаем одну сущность на файл
-        relative_path = str(file_path.relative_to(project_path))
-        
-        entity = CodeEntity(
-            id=f"{project_id}:{relative_path}",
-            name=file_path.stem,
-            type="documentation",
-            file_path=relative_path,
-            project_id=project_id,
-            content=content,
-            line_start=1,
-            line_end=len(content.split('\n'))
-        )
+    ) -> List[Union[ParseResult, None, Exception]]:
+        """
+        Разбор пачки файлов (app/services/code_parser.py)
         
-        return [entity]
+        При настроенном пуле разбор идет в отдельных процессах, иначе
+        в потоке, чтобы не блокировать цикл событий.
+        
+        Args:
+            items: Пары (путь, содержимое или None - прочитать с диска)
+        """
+        if self.parser_pool is not None:
+            try:
+                return await self.parser_pool.parse(items, project_path, project_id)
+            except Exception as e:
+                logger.error("Parser pool failed, parsing in-process: %s", e)
+        
+        return await asyncio.to_thread(parse_files, items, project_path, project_id)
+    
+    @staticmethod
+    def _parse_error(file_path, error: Exception) -> str:
+        """Сообщение об ошибке разбора файла (с учетом в метриках)"""
+        INDEXING_STAGE_ERRORS.labels(stage="parse").inc()
+        error_msg = f"Error indexing {file_path}: {str(error)}"
+        logger.error(error_msg)
+        return error_msg
     
-    async def _parse_generic_file(
+    async def _index_entities(
         self,
-        file_path: Path,
-        content: str,
-        project_path: str,
-        project_id: str
-    ) -> List[CodeEntity]:
-        """Парсинг обычного файла"""
-        relative_path = str(file_path.relative_to(project_path))
-        
-        entity = CodeEntity(
-            id=f"{project_id}:{relative_path}",
-            name=file_path.stem,
-            type="file",
-            file_path=relative_path,
-            project_id=project_id,
-            content=content,
-            line_start=1,
-            line_end=len(content.split('\n'))
-        )
+        entities: List[CodeEntity],
+        project_id: str,
+        relationships: Optional[List[Dict]] = None,
+        replace_files: Optional[List[str]] = None,
+        known_embeddings: Optional[List[Optional[np.ndarray]]] = None,
+        diff: bool = False,
+        entity_stats: Optional[Counter] = None,
+        derived: Optional[Dict[int, List[int]]] = None
+    ) -> np.ndarray:
+        """
+        Индексация пачки сущностей (векторы одним батчем + граф)
         
-        return [entity]
-    
-    async def _index_entity(self, entity: CodeEntity, project_id: str):
-        """Индексация сущности (вектор + граф)"""
-        # Генерация эмбеддинга
-        embedding = await self.embedding_service.generate_embedding(
-            entity.content or entity.name
-        )
+        С diff сущности сравниваются с сохраненными точками их файлов:
+        при том же хеше содержимого и модели эмбеддингов вектор берется
+        из векторной БД, а точка не перезаписывается (сдвинутой сущности
+        обновляются строки в payload). Сущности, которых больше нет в
+        файлах пачки, удаляются из векторной БД и графа (и без diff, при
+        принудительной переиндексации).
         
-        # Сохранение в векторную БД
-        await self.vector_service.upsert(
-            point_id=entity.id,
-            vector=embedding,
-            payload={
+        Args:
+            known_embeddings: Готовые эмбеддинги сущностей (None - вычислить)
+            diff: Сравнить сущности с сохраненными (INDEXING_ENTITY_DIFF)
+            entity_stats: Счетчики reembedded, pooled, unchanged, moved, deleted
+            derived: Строка -> строки, средним векторов которых она представлена
+                без эмбеддинга (пустой список - точка не записывается)
+        
+        Returns:
+            Эмбеддинги сущностей
+        """
+        derived = derived or {}
+        texts = [entity.content or entity.name for entity in entities]
+        payloads = [
+            {
+                "id": entity.id,
                 "name": entity.name,
                 "type": entity.type,
                 "file_path": entity.file_path,
                 "project_id": project_id,
                 "content": entity.content[:1000] if entity.content else "",  # Ограничение размера
                 "line_start": entity.line_start,
-                "line_end": entity.line_end
+                "line_end": entity.line_end,
+                # Хеш текста эмбеддинга: одинаковое содержимое - один вектор
+                "content_hash": hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest(),
+                "embedding_model": f"{self.embedding_model_key}:pool" if index in derived else self.embedding_model_key,
+                # Blob-объект git, из которого получена сущность
+                "blob_sha": entity.metadata.get("blob_sha")
             }
+            for index, (entity, text) in enumerate(zip(entities, texts))
+        ]
+        
+        # Сохраненные сущности файлов пачки (без diff - только для удаления исчезнувших)
+        stored = {}
+        if settings.INDEXING_ENTITY_DIFF:
+            with track(INDEXING_STAGE_SECONDS, INDEXING_STAGE_ERRORS, stage="diff"):
+                stored = await self.vector_service.get_file_entities(
+                    project_id, sorted({entity.file_path for entity in entities}), with_vectors=diff
+                )
+        
+        # Точку с повторяющимся ID (файл и его сущность документации)
+        # определяет последняя запись, как при upsert
+        last_index = {entity.id: index for index, entity in enumerate(entities)}
+        embeddings = np.empty((len(entities), settings.EMBEDDING_DIMENSION), dtype=np.float32)
+        changed = []
+        missing = []
+        pooled = []
+        vectorless = set()
+        moved: Dict[str, Dict] = {}
+        for index, payload in enumerate(payloads):
+            entity_id = payload["id"]
+            if last_index[entity_id] != index:
+                continue
+            if derived.get(index) == []:
+                embeddings[index] = 0.0
+                vectorless.add(entity_id)
+                continue
+            
+            previous, vector = stored.get(entity_id, (None, None))
+            if (
+                vector is not None
+                and previous.get("content_hash") == payload["content_hash"]
+                and previous.get("embedding_model") == payload["embedding_model"]
+            ):
+                embeddings[index] = vector
+                fields = {key: payload[key] for key in _POSITION_FIELDS if previous.get(key) != payload[key]}
+                if fields:
+                    moved[entity_id] = fields
+                continue
+            
+            changed.append(index)
+            known = known_embeddings[index] if known_embeddings is not None else None
+            if known is not None:
+                embeddings[index] = known
+            elif index in derived:
+                pooled.append(index)
+            else:
+                missing.append(index)
+        
+        # Генерация эмбеддингов (только для изменившихся сущностей без готовых)
+        with track(INDEXING_STAGE_SECONDS, INDEXING_STAGE_ERRORS, stage="embed"):
+            if missing:
+                embeddings[missing] = await self._embed_texts([texts[index] for index in missing])
+        for index in pooled:
+            vector = embeddings[derived[index]].mean(axis=0)
+            norm = np.linalg.norm(vector)
+            embeddings[index] = vector / norm if norm > 0 else vector
+        for index, entity in enumerate(entities):
+            if last_index[entity.id] != index:
+                embeddings[index] = embeddings[last_index[entity.id]]
+        
+        # Сохранение в векторную БД
+        vanished = [entity_id for entity_id in stored if entity_id not in last_index or entity_id in vectorless]
+        with track(INDEXING_STAGE_SECONDS, INDEXING_STAGE_ERRORS, stage="vector_write"):
+            await self.vector_service.upsert_batch(
+                [entities[index].id for index in changed],
+                embeddings[changed],
+                [payloads[index] for index in changed]
+            )
+            await self.vector_service.update_payloads(project_id, moved)
+            await self.vector_service.delete_entities(project_id, vanished)
+        
+        if entity_stats is not None:
+            entity_stats["reembedded"] += len(missing)
+            entity_stats["pooled"] += len(pooled)
+            entity_stats["unchanged"] += len(last_index) - len(changed) - len(vectorless)
+            entity_stats["moved"] += len(moved)
+            entity_stats["deleted"] += len(vanished)
+        
+        # Сохранение в граф одной транзакцией
+        with track(INDEXING_STAGE_SECONDS, INDEXING_STAGE_ERRORS, stage="graph_write"):
+            await self.graph_service.write_entities(
+                nodes=[
+                    {
+                        "id": entity.id,
+                        "type": entity.type,
+                        "properties": {
+                            "name": entity.name,
+                            "file_path": entity.file_path,
+                            "project_id": project_id,
+                            "blob_sha": entity.metadata.get("blob_sha")
+                        }
+                    }
+                    for entity in entities
+                ],
+                relationships=relationships or [],
+                project_id=project_id,
+                replace_files=replace_files,
+                # Файл без точки (vectorless) остается узлом графа
+                delete_ids=[entity_id for entity_id in vanished if entity_id not in last_index]
+            )
+        
+        return embeddings
+    
+    async def update_files(
+        self,
+        project_id: str,
+        project_path: Optional[str],
+        changed: Dict[str, Optional[str]],
+        deleted: List[str]
+    ) -> Dict:
+        """
+        Инкрементальное обновление отдельных файлов проекта
+        
+        Прежние сущности файлов заменяются новыми: с INDEXING_ENTITY_DIFF
+        векторизуются только изменившиеся сущности, исчезнувшие удаляются,
+        иначе точки файлов удаляются и записываются заново. Граф
+        обновляется одной транзакцией.
+        
+        Args:
+            project_id: ID проекта
+            project_path: Корень проекта (нужен для чтения файлов без содержимого)
+            changed: Путь относительно корня -> содержимое (None - прочитать с диска)
+            deleted: Удаленные файлы (пути относительно корня)
+        
+        Returns:
+            Статистика обновления
+        """
+        started = time.perf_counter()
+        root = Path(project_path or ".")
+        stats = {
+            "project_id": project_id,
+            "updated_files": 0,
+            "deleted_files": 0,
+            "total_entities": 0,
+            "errors": [],
+            "took_ms": 0
+        }
+        
+        removed = list(deleted)
+        to_parse = []
+        # Те же правила игнорирования, что и при полной индексации
+        discovery = FileDiscovery(str(root), self.supported_extensions, self.ignore_dirs) if project_path else None
+        for relative_path, content in changed.items():
+            if Path(relative_path).is_absolute() or ".." in Path(relative_path).parts:
+                stats["errors"].append(f"Path must be relative to the project root: {relative_path}")
+                continue
+            file_path = root / relative_path
+            if file_path.suffix not in self.supported_extensions:
+                continue
+            if discovery is not None and discovery.is_ignored(relative_path):
+                continue
+            if content is not None and len(content) > settings.INDEXING_MAX_FILE_SIZE:
+                continue
+            if content is None and not file_path.is_file():
+                removed.append(relative_path)
+                continue
+            to_parse.append((file_path, content))
+        
+        parsed = []
+        for (file_path, _), result in zip(to_parse, await self._parse_files(to_parse, str(root), project_id)):
+            if isinstance(result, Exception):
+                stats["errors"].append(self._parse_error(file_path.relative_to(root), result))
+            elif result is not None:
+                parsed.append(result)
+        
+        # Прежние сущности удаленных файлов (и изменившихся без сравнения сущностей)
+        touched = sorted({file_entity.file_path for file_entity, _ in parsed} | set(removed))
+        await self.vector_service.delete_by_files(
+            project_id, sorted(set(removed)) if settings.INDEXING_ENTITY_DIFF else touched
         )
         
-        # Сохранение в граф
-        await self.graph_service.create_node(
-            node_id=entity.id,
-            node_type=entity.type,
-            properties={
-                "name": entity.name,
-                "file_path": entity.file_path,
-                "project_id": project_id
-            }
+        entity_stats = Counter()
+        if parsed:
+            await self._index_parsed(
+                parsed, project_id, replace_files=touched, diff=True, entity_stats=entity_stats
+            )
+        else:
+            await self.graph_service.write_entities([], [], project_id=project_id, replace_files=touched)
+        
+        await self._invalidate_cache(project_id)
+        await self._count_entities(project_id)
+        
+        stats["updated_files"] = len(parsed)
+        stats["deleted_files"] = len(removed)
+        stats["total_entities"] = sum(1 + len(entities) for _, entities in parsed)
+        stats["entities"] = dict(entity_stats)
+        stats["took_ms"] = int((time.perf_counter() - started) * 1000)
+        logger.info(
+            "Updated %s and removed %s files of project %s in %s ms",
+            len(parsed), len(removed), project_id, stats["took_ms"]
         )
+        return stats
+    
+    async def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Генерация эмбеддингов для индексации
+        
+        При настроенном пуле процессов батч делится между репликами модели,
+        иначе используется модель основного процесса. Без модели индексация
+        падает: dummy-векторы нельзя сохранять под ключом настоящей модели.
+        
+        Raises:
+            EmbeddingUnavailableError: Модель не загружена или упала
+        """
+        if self.embedding_pool is not None:
+            try:
+                return await self.embedding_pool.encode(texts)
+            except Exception as e:
+                logger.error("Embedding worker pool failed, falling back to local model: %s", e)
+        
+        return await self.embedding_service.generate_embeddings_batch(texts, allow_fallback=False)
+    
+    async def _invalidate_cache(self, project_id: str):
+        """Сброс закешированных страниц поиска и графа проекта"""
+        if self.cache_service is not None:
+            await self.cache_service.invalidate_project(project_id)
     
     async def _count_entities(self, project_id: str) -> int:
-        """Подсчет индексированных сущностей"""
-        # TODO: Реализовать подсчет из векторной БД или графа
-        return 0
+        """Подсчет индексированных сущностей (точек проекта в векторной БД)"""
+        count = await self.vector_service.count_by_project(project_id)
+        INDEXED_ENTITIES.labels(project_id=project_id).set(count)
+        return count
     
-    async def delete_index(self, project_id: str):
-        """Удаление индекса проекта"""
-        logger.info(f"Deleting index for project {project_id}")
+    async def delete_index(
+        self,
+        project_id: str,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> Dict:
+        """
+        Удаление индекса проекта
+        
+        Args:
+            project_id: ID проекта
+            on_progress: Callback с числом удаленных узлов графа
+        
+        Returns:
+            Количество удаленных точек и узлов
+        
+        Raises:
+            RuntimeError: Индекс удален не полностью (повторный вызов дочищает остаток)
+        """
+        logger.info("Deleting index for project %s", project_id)
+        errors = []
+        deleted_points = 0
+        deleted_nodes = 0
         
         # Удаление из векторной БД
-        await self.vector_service.delete_by_project(project_id)
+        try:
+            deleted_points = await self.vector_service.delete_by_project(project_id)
+        except Exception as e:
+            errors.append(f"vector store: {e}")
         
         # Удаление из графа
-        await self.graph_service.delete_project(project_id)
-
+        try:
+            deleted_nodes = await self.graph_service.delete_project(project_id, on_progress=on_progress)
+        except Exception as e:
+            errors.append(f"graph: {e}")
+        
+        await self._invalidate_cache(project_id)
+        
+        if errors:
+            raise RuntimeError(f"Index of project {project_id} was partially deleted: {'; '.join(errors)}")
+        
+        return {
+            "deleted_points": deleted_points,
+            "deleted_nodes": deleted_nodes
+        }
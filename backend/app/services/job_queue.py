@@ -0,0 +1,356 @@
+"""
+Персистентная очередь задач индексации (SQLite)
+"""
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых задача занимает проект
+ACTIVE_STATUSES = ("pending", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    project_path TEXT NOT NULL,
+    force INTEGER NOT NULL DEFAULT 0,
+    git_ref TEXT,
+    status TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    total_files INTEGER NOT NULL DEFAULT 0,
+    processed_files INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    error TEXT,
+    stats TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_project ON jobs (project_id, created_at);
+"""
+
+
+class IndexingCancelled(Exception):
+    """Задача индексации отменена пользователем"""
+
+
+class JobQueue:
+    """
+    Очередь задач индексации, общая для API и процессов-воркеров
+    
+    Состояние хранится в SQLite, поэтому переживает перезапуск и видно всем
+    процессам. На проект допускается одна активная задача, число одновременно
+    выполняемых задач ограничено. Воркер периодически обновляет heartbeat и
+    число обработанных файлов; задача упавшего воркера возвращается в очередь
+    и продолжается с сохраненной позиции, но не более INDEXING_JOB_MAX_ATTEMPTS
+    раз: задача, которая каждый раз роняет воркер, завершается как failed.
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or settings.INDEXING_JOBS_DB or settings.DATA_DIR / "indexing_jobs.sqlite3")
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            # Базы, созданные до появления git_ref
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "git_ref" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN git_ref TEXT")
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _row_to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["force"] = bool(job["force"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        return job
+    
+    def enqueue(
+        self,
+        project_id: str,
+        project_path: str,
+        force: bool = False,
+        git_ref: Optional[str] = None
+    ) -> Dict:
+        """
+        Постановка задачи в очередь
+        
+        Если для проекта уже есть активная задача, возвращается она.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                active = conn.execute(
+                    "SELECT * FROM jobs WHERE project_id = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                    (project_id, *ACTIVE_STATUSES)
+                ).fetchone()
+                if active is not None:
+                    conn.execute("COMMIT")
+                    return self._row_to_dict(active)
+                
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, project_id, project_path, force, git_ref, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'pending', ?)",
+                    (job_id, project_id, project_path, int(force), git_ref, time.time())
+                )
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        
+        logger.info("Indexing job %s queued for project %s", job_id, project_id)
+        return self._row_to_dict(row)
+    
+    def claim(self, worker_id: str, max_running: Optional[int] = None) -> Optional[Dict]:
+        """
+        Захват следующей задачи воркером
+        
+        Задачи с просроченным heartbeat сначала возвращаются в очередь
+        (исчерпавшие INDEXING_JOB_MAX_ATTEMPTS - завершаются с ошибкой).
+        Берется самая старая задача проекта, по которому ничего не выполняется,
+        если общий лимит одновременных задач не исчерпан.
+        """
+        max_running = max_running or settings.INDEXING_MAX_CONCURRENT_JOBS
+        now = time.time()
+        stale_before = now - settings.INDEXING_JOB_STALE_TIMEOUT
+        
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_running(conn, "heartbeat_at < ?", (stale_before,), now)
+                
+                running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+                if running >= max_running:
+                    conn.execute("COMMIT")
+                    return None
+                
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'pending' AND project_id NOT IN "
+                    "(SELECT project_id FROM jobs WHERE status = 'running') "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+                    "started_at = COALESCE(started_at, ?), heartbeat_at = ? WHERE id = ?",
+                    (worker_id, now, now, row["id"])
+                )
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        
+        return self._row_to_dict(row)
+    
+    @staticmethod
+    def _requeue_running(conn: sqlite3.Connection, condition: str, params: tuple, now: float) -> int:
+        """
+        Возврат в очередь выполняющихся задач упавших воркеров
+        
+        Позиция сохраняется; задачи, исчерпавшие INDEXING_JOB_MAX_ATTEMPTS,
+        завершаются с ошибкой.
+        
+        Returns:
+            Число задач, возвращенных в очередь
+        """
+        failed = conn.execute(
+            "UPDATE jobs SET status = 'failed', worker_id = NULL, completed_at = ?, "
+            "error = 'Worker stopped responding ' || attempts || ' time(s), giving up' "
+            f"WHERE status = 'running' AND {condition} AND attempts >= ?",
+            (now, *params, settings.INDEXING_JOB_MAX_ATTEMPTS)
+        ).rowcount
+        if failed:
+            logger.error("Failed %s indexing job(s) after repeated worker crashes", failed)
+        
+        requeued = conn.execute(
+            f"UPDATE jobs SET status = 'pending', worker_id = NULL WHERE status = 'running' AND {condition}",
+            params
+        ).rowcount
+        if requeued:
+            logger.warning("Requeued %s indexing job(s) of stopped workers", requeued)
+        return requeued
+    
+    def requeue_worker(self, worker_id: str) -> int:
+        """
+        Возврат в очередь задач завершившегося процесса-воркера
+        
+        Вызывается супервизором сразу после падения процесса, не дожидаясь
+        INDEXING_JOB_STALE_TIMEOUT. Падение считается попыткой.
+        
+        Returns:
+            Число задач, возвращенных в очередь
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                requeued = self._requeue_running(conn, "worker_id = ?", (worker_id,), time.time())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return requeued
+    
+    def heartbeat(
+        self,
+        job_id: str,
+        worker_id: str,
+        processed_files: Optional[int] = None,
+        total_files: Optional[int] = None
+    ) -> bool:
+        """
+        Обновление heartbeat и позиции задачи
+        
+        Returns:
+            True, если задачу нужно продолжать (не отменена и не перехвачена)
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ?, "
+                "processed_files = COALESCE(?, processed_files), "
+                "total_files = COALESCE(?, total_files) "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (time.time(), processed_files, total_files, job_id, worker_id)
+            )
+            row = conn.execute(
+                "SELECT cancel_requested, worker_id, status FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        
+        return (
+            row is not None
+            and not row["cancel_requested"]
+            and row["worker_id"] == worker_id
+            and row["status"] == "running"
+        )
+    
+    def _finish(
+        self,
+        job_id: str,
+        worker_id: str,
+        status: str,
+        error: Optional[str] = None,
+        stats: Optional[Dict] = None
+    ):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, stats = ?, completed_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (status, error, json.dumps(stats) if stats is not None else None, time.time(), job_id, worker_id)
+            )
+    
+    def complete(self, job_id: str, worker_id: str, stats: Dict):
+        """Успешное завершение задачи"""
+        self._finish(job_id, worker_id, "completed", stats=stats)
+    
+    def fail(self, job_id: str, worker_id: str, error: str):
+        """Завершение задачи с ошибкой"""
+        self._finish(job_id, worker_id, "failed", error=error)
+    
+    def mark_cancelled(self, job_id: str, worker_id: str):
+        """Подтверждение отмены воркером"""
+        self._finish(job_id, worker_id, "cancelled")
+    
+    def release(self, job_id: str, worker_id: str):
+        """
+        Возврат задачи в очередь при остановке воркера
+        
+        Позиция сохраняется; плановая остановка не считается попыткой.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', worker_id = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (job_id, worker_id)
+            )
+    
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Отмена задачи
+        
+        Ожидающая задача отменяется сразу, выполняющаяся - при следующем
+        heartbeat воркера.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', completed_at = ? WHERE id = ? AND status = 'pending'",
+                (time.time(), job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                (job_id,)
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+        
+        return self._row_to_dict(row)
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Задача по ID"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row)
+    
+    def latest_for_project(self, project_id: str) -> Optional[Dict]:
+        """Последняя задача проекта"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE project_id = ? ORDER BY created_at DESC LIMIT 1",
+                (project_id,)
+            ).fetchone()
+        return self._row_to_dict(row)
+    
+    def active_for_project(self, project_id: str) -> Optional[Dict]:
+        """Ожидающая или выполняющаяся задача проекта"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE project_id = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (project_id, *ACTIVE_STATUSES)
+            ).fetchone()
+        return self._row_to_dict(row)
+    
+    def count_by_status(self) -> Dict[str, int]:
+        """Число задач по статусам"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+    
+    def list_latest(self, limit: int = 100) -> List[Dict]:
+        """Последние задачи по каждому проекту"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE rowid IN "
+                "(SELECT MAX(rowid) FROM jobs GROUP BY project_id) "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
@@ -0,0 +1,79 @@
+"""
+Пул процессов для разбора файлов при массовой индексации
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+from app.core.config import settings
+from app.services.code_parser import ParseResult, parse_files
+
+logger = logging.getLogger(__name__)
+
+
+class ParserPool:
+    """
+    Разбор файлов (ast, tree-sitter) в отдельных процессах
+    
+    Пачка файлов делится на чанки по INDEXING_PARSE_CHUNK_SIZE; воркер сам
+    читает файлы с диска, в процесс передаются только пути (и содержимое,
+    если оно уже прочитано).
+    """
+    
+    def __init__(self, num_workers: int, chunk_size: Optional[int] = None):
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size or settings.INDEXING_PARSE_CHUNK_SIZE
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    def start(self):
+        """Запуск процессов-воркеров (идемпотентно)"""
+        if self._executor is not None:
+            return
+        
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info("Parser pool started with %s workers", self.num_workers)
+    
+    async def parse(
+        self,
+        items: Sequence[Tuple[Path, Optional[str]]],
+        project_path: str,
+        project_id: str
+    ) -> List[Union[ParseResult, None, Exception]]:
+        """
+        Разбор пачки файлов в пуле процессов
+        
+        Args:
+            items: Пары (путь, содержимое или None - прочитать с диска)
+        
+        Returns:
+            Результаты в порядке items (None - файл не декодирован, исключение - ошибка разбора)
+        """
+        if not items:
+            return []
+        
+        self.start()
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(
+                self._executor,
+                parse_files,
+                items[start:start + self.chunk_size],
+                project_path,
+                project_id
+            )
+            for start in range(0, len(items), self.chunk_size)
+        ))
+        return [result for chunk in chunks for result in chunk]
+    
+    def shutdown(self):
+        """Остановка процессов-воркеров"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Parser pool stopped")
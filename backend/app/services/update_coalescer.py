@@ -0,0 +1,157 @@
+"""
+Объединение частых инкрементальных обновлений файлов
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.indexing_service import IndexingService
+from app.services.job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingUpdate:
+    """Накопленные изменения файлов одного проекта"""
+    
+    def __init__(self, project_path: Optional[str]):
+        self.project_path = project_path
+        self.changed: Dict[str, Optional[str]] = {}
+        self.deleted: Set[str] = set()
+        self.first_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class FileUpdateCoalescer:
+    """
+    Debounce обновлений файлов по проекту
+    
+    Изменения, пришедшие в течение INDEXING_UPDATE_DEBOUNCE секунд, сливаются
+    (для файла остается последнее состояние) и записываются одним вызовом
+    IndexingService.update_files. При непрерывных сохранениях запись
+    выполняется не позже INDEXING_UPDATE_MAX_DELAY после первого изменения.
+    
+    Пока у проекта есть задача в очереди индексации, запись откладывается
+    (изменения продолжают сливаться): иначе сравнение сущностей воркера и
+    обновления удаляло бы точки друг друга. Разбор и эмбеддинги идут вне
+    цикла событий (пул или поток), поэтому запись не блокирует запросы API.
+    """
+    
+    def __init__(
+        self,
+        indexing_service: IndexingService,
+        debounce: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        job_queue: Optional[JobQueue] = None
+    ):
+        self.indexing_service = indexing_service
+        self.job_queue = job_queue
+        self.debounce = settings.INDEXING_UPDATE_DEBOUNCE if debounce is None else debounce
+        self.max_delay = settings.INDEXING_UPDATE_MAX_DELAY if max_delay is None else max_delay
+        self._pending: Dict[str, _PendingUpdate] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()
+    
+    @property
+    def pending_files(self) -> int:
+        """Файлы, ожидающие записи"""
+        return sum(len(pending.changed) + len(pending.deleted) for pending in self._pending.values())
+    
+    def submit(
+        self,
+        project_id: str,
+        project_path: Optional[str],
+        changed: Dict[str, Optional[str]],
+        deleted: List[str]
+    ) -> asyncio.Future:
+        """
+        Добавление изменений в очередь проекта
+        
+        Returns:
+            Future со статистикой записи, в которую вошли эти изменения
+        """
+        pending = self._pending.get(project_id)
+        if pending is None:
+            pending = _PendingUpdate(project_path)
+            self._pending[project_id] = pending
+        elif project_path:
+            pending.project_path = project_path
+        
+        for path, content in changed.items():
+            pending.changed[path] = content
+            pending.deleted.discard(path)
+        for path in deleted:
+            pending.changed.pop(path, None)
+            pending.deleted.add(path)
+        
+        if pending.timer is not None:
+            pending.timer.cancel()
+        remaining = pending.first_at + self.max_delay - time.monotonic()
+        pending.timer = asyncio.get_running_loop().call_later(
+            max(0.0, min(self.debounce, remaining)),
+            self._start_flush,
+            project_id
+        )
+        return pending.future
+    
+    def _start_flush(self, project_id: str, defer: bool = True):
+        task = asyncio.create_task(self._flush(project_id, defer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _flush(self, project_id: str, defer: bool = True):
+        """Запись накопленных изменений (по проекту - последовательно)"""
+        pending = self._pending.get(project_id)
+        if pending is None:
+            return
+        
+        if defer and self.job_queue is not None:
+            try:
+                job = await asyncio.to_thread(self.job_queue.active_for_project, project_id)
+            except Exception as e:
+                logger.warning("Could not check indexing jobs of project %s: %s", project_id, e)
+                job = None
+            if job is not None:
+                # Изменения копятся дальше и записываются после задачи
+                logger.debug("Deferring file updates of project %s until job %s finishes", project_id, job["id"])
+                if pending.timer is not None:
+                    pending.timer.cancel()
+                pending.timer = asyncio.get_running_loop().call_later(
+                    settings.INDEXING_JOB_POLL_INTERVAL, self._start_flush, project_id
+                )
+                return
+        
+        if self._pending.get(project_id) is not pending:
+            return
+        del self._pending[project_id]
+        if pending.timer is not None:
+            pending.timer.cancel()
+        
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            try:
+                stats = await self.indexing_service.update_files(
+                    project_id=project_id,
+                    project_path=pending.project_path,
+                    changed=pending.changed,
+                    deleted=sorted(pending.deleted)
+                )
+            except Exception as e:
+                logger.error("Incremental update failed for project %s: %s", project_id, e)
+                stats = {"project_id": project_id, "status": "failed", "errors": [str(e)]}
+        
+        if not pending.future.done():
+            pending.future.set_result(stats)
+    
+    async def close(self):
+        """Немедленная запись отложенных изменений при остановке"""
+        for project_id, pending in list(self._pending.items()):
+            if pending.timer is not None:
+                pending.timer.cancel()
+            self._start_flush(project_id, defer=False)
+        
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
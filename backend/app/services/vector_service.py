@@ -1,63 +1,195 @@
 """
 Сервис векторного поиска (Qdrant)
 """
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+import re
+import uuid
+from typing import Any, Callable, List, Dict, Optional, Set, Tuple
+import numpy as np
 
 from app.core.config import settings
+from app.core.logging import RateLimitedLogger
+from app.core.metrics import QDRANT_ERRORS, QDRANT_SECONDS, track
 
 logger = logging.getLogger(__name__)
+entity_log = RateLimitedLogger(logger)
+
+ISOLATION_MODES = ("none", "collection", "shard_key")
+
+# Пространство имен UUIDv5 для ID точек: ID зависит только от строки сущности
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "aethernexus/qdrant-points")
+
+# Поля ссылки на сущность в точке, общей для одинакового содержимого
+_REF_FIELDS = ("id", "name", "type", "file_path", "project_id", "line_start", "line_end", "blob_sha")
+# Поля ссылок, по которым фильтруют поиск и удаление (массивы в общей точке)
+_REF_FILTER_FIELDS = ("id", "project_id", "type", "file_path")
 
 
 class VectorService:
-    """Сервис для работы с векторной БД Qdrant"""
+    """
+    Сервис для работы с векторной БД Qdrant
+    
+    Точки проектов хранятся по QDRANT_PROJECT_ISOLATION: в общей коллекции
+    (фильтр по индексу project_id), в отдельной коллекции на проект или
+    в общей коллекции с custom shard key на проект. В двух последних
+    режимах поиск по проекту не затрагивает векторы других проектов.
+    
+    С QDRANT_DEDUP_BY_CONTENT сущности с одинаковым содержимым (копии
+    файлов в проектах и форках) хранятся одной точкой со списком ссылок.
+    """
     
     def __init__(self):
         self.client = None
         self.collection_name = settings.QDRANT_COLLECTION
+        self.isolation = settings.QDRANT_PROJECT_ISOLATION
+        if self.isolation not in ISOLATION_MODES:
+            raise ValueError(f"Unknown QDRANT_PROJECT_ISOLATION: {self.isolation}")
+        self.dedup = settings.QDRANT_DEDUP_BY_CONTENT
+        if self.dedup and self.isolation != "none":
+            raise ValueError("QDRANT_DEDUP_BY_CONTENT requires QDRANT_PROJECT_ISOLATION=none")
+        # Коллекции и shard keys, существование которых уже проверено
+        self._known_collections: Set[str] = set()
+        self._known_shard_keys: Set[str] = set()
+    
+    def connect(self) -> bool:
+        """
+        Подключение к Qdrant и подготовка коллекции
+        
+        Вызывается из warmup, а не при создании сервиса, чтобы импорт
+        приложения не зависел от доступности Qdrant.
+        
+        Returns:
+            True, если коллекция доступна
+        """
         self._connect()
-        self._ensure_collection()
+        return self._ensure_collection()
     
     def _connect(self):
         """Подключение к Qdrant"""
         try:
+            from qdrant_client import QdrantClient
+            
             self.client = QdrantClient(
                 host=settings.QDRANT_HOST,
                 port=settings.QDRANT_PORT
             )
-            logger.info(f"Connected to Qdrant at {settings.QDRANT_HOST}:{settings.QDRANT_PORT}")
+            logger.info("Connected to Qdrant at %s:%s", settings.QDRANT_HOST, settings.QDRANT_PORT)
         except Exception as e:
-            logger.error(f"Error connecting to Qdrant: {e}")
+            logger.error("Error connecting to Qdrant: %s", e)
             logger.warning("Vector search will be unavailable")
             self.client = None
     
-    def _ensure_collection(self):
-        """Создание коллекции, если не существует"""
+    def _ensure_collection(self) -> bool:
+        """
+        Создание коллекции и индексов payload при старте
+        
+        В режиме collection коллекции проектов создаются при первой записи,
+        а при старте индексы досоздаются в уже существующих.
+        """
         if self.client is None:
-            return
+            return False
         
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [col.name for col in collections]
+            if self.isolation != "collection":
+                self._create_collection(self.collection_name)
+                return True
             
-            if self.collection_name not in collection_names:
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=settings.EMBEDDING_DIMENSION,
-                        distance=Distance.COSINE
-                    )
-                )
-                logger.info(f"Created collection: {self.collection_name}")
+            for name in self._project_collections():
+                self._ensure_payload_indexes(name)
+                self._known_collections.add(name)
+            return True
         except Exception as e:
-            logger.error(f"Error ensuring collection: {e}")
+            logger.error("Error ensuring collection: %s", e)
+            return False
+    
+    def _create_collection(self, name: str):
+        """Создание коллекции (если ее нет) и keyword-индексов payload"""
+        from qdrant_client.models import Distance, ShardingMethod, VectorParams
+        
+        collection_names = [col.name for col in self.client.get_collections().collections]
+        if name not in collection_names:
+            self.client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(
+                    size=settings.EMBEDDING_DIMENSION,
+                    distance=Distance.COSINE
+                ),
+                sharding_method=ShardingMethod.CUSTOM if self.isolation == "shard_key" else None
+            )
+            logger.info("Created collection: %s", name)
+        
+        self._ensure_payload_indexes(name)
+        self._known_collections.add(name)
+    
+    def _ensure_payload_indexes(self, name: str):
+        """
+        Keyword-индексы полей фильтров
+        
+        Без индекса Qdrant проверяет условие фильтра на каждом кандидате
+        обхода HNSW; с индексом планировщик выбирает между фильтрованным
+        обходом и полным перебором отобранных точек. Повторное создание
+        существующего индекса ничего не меняет.
+        """
+        from qdrant_client.models import PayloadSchemaType
+        
+        field_names = list(settings.QDRANT_PAYLOAD_INDEXES)
+        # Поиск прежних точек переиндексируемых сущностей
+        if self.dedup and "id" not in field_names:
+            field_names.append("id")
+        
+        for field_name in field_names:
+            # В коллекции проекта все точки с одним project_id
+            if self.isolation == "collection" and field_name == "project_id":
+                continue
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+    
+    def _project_collection_name(self, project_id: str) -> str:
+        """Имя коллекции проекта: читаемая часть ID и хеш от коллизий"""
+        readable = re.sub(r"[^A-Za-z0-9_-]+", "_", project_id)[:48]
+        digest = hashlib.blake2b(project_id.encode("utf-8"), digest_size=4).hexdigest()
+        return f"{self.collection_name}__{readable}_{digest}"
+    
+    def _project_collections(self) -> List[str]:
+        """Существующие коллекции проектов (режим collection)"""
+        prefix = f"{self.collection_name}__"
+        return [
+            col.name for col in self.client.get_collections().collections
+            if col.name.startswith(prefix)
+        ]
+    
+    def _target(self, project_id: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Коллекция и shard key точек проекта"""
+        if project_id and self.isolation == "collection":
+            return self._project_collection_name(project_id), None
+        if project_id and self.isolation == "shard_key":
+            return self.collection_name, project_id
+        return self.collection_name, None
+    
+    def _ensure_target(self, collection_name: str, shard_key: Optional[str]):
+        """Создание коллекции проекта или shard key перед первой записью"""
+        if collection_name not in self._known_collections:
+            self._create_collection(collection_name)
+        
+        if shard_key is not None and shard_key not in self._known_shard_keys:
+            try:
+                self.client.create_shard_key(collection_name=collection_name, shard_key=shard_key)
+                logger.info("Created shard key %s in %s", shard_key, collection_name)
+            except Exception as e:
+                # Shard key создан раньше (другим процессом или до рестарта)
+                if "already exists" not in str(e):
+                    raise
+            self._known_shard_keys.add(shard_key)
     
     async def upsert(
         self,
         point_id: str,
-        vector: List[float],
+        vector: np.ndarray,
         payload: Dict
     ):
         """
@@ -72,24 +204,106 @@ class VectorService:
             logger.warning("Qdrant not available, skipping upsert")
             return
         
+        if self.dedup:
+            await self.upsert_batch([point_id], np.asarray([vector], dtype=np.float32), [payload])
+            return
+        
         try:
+            from qdrant_client.models import PointStruct
+            
             point = PointStruct(
-                id=self._hash_id(point_id),
-                vector=vector,
+                id=self._point_id(point_id),
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
                 payload=payload
             )
             
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=[point]
-            )
-            logger.debug(f"Upserted point: {point_id}")
+            collection_name, shard_key = self._target(payload.get("project_id"))
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="upsert"):
+                self._ensure_target(collection_name, shard_key)
+                self.client.upsert(
+                    collection_name=collection_name,
+                    points=[point],
+                    shard_key_selector=shard_key
+                )
+            entity_log.debug("upsert", "Upserted point: %s", point_id)
         except Exception as e:
-            logger.error(f"Error upserting point {point_id}: {e}")
+            logger.error("Error upserting point %s: %s", point_id, e)
+    
+    async def upsert_batch(
+        self,
+        point_ids: List[str],
+        vectors: np.ndarray,
+        payloads: List[Dict]
+    ):
+        """
+        Пакетное добавление или обновление точек
+        
+        Args:
+            point_ids: Уникальные ID точек
+            vectors: Матрица float32 (len(point_ids), EMBEDDING_DIMENSION)
+            payloads: Метаданные точек
+        """
+        if self.client is None:
+            logger.warning("Qdrant not available, skipping upsert")
+            return
+        
+        if not point_ids:
+            return
+        
+        if self.dedup:
+            self._upsert_deduplicated(point_ids, vectors, payloads)
+            return
+        
+        from qdrant_client.models import PointStruct
+        
+        # Батч индексации относится к одному проекту; группировка нужна
+        # только при изоляции проектов и смешанном батче
+        groups: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        for index, payload in enumerate(payloads):
+            groups.setdefault(self._target(payload.get("project_id")), []).append(index)
+        
+        for (collection_name, shard_key), indices in groups.items():
+            if len(groups) > 1:
+                group_ids = [point_ids[index] for index in indices]
+                group_vectors = vectors[indices]
+                group_payloads = [payloads[index] for index in indices]
+            else:
+                group_ids, group_vectors, group_payloads = point_ids, vectors, payloads
+            
+            try:
+                self._ensure_target(collection_name, shard_key)
+            except Exception as e:
+                logger.error("Error preparing collection %s: %s", collection_name, e)
+                continue
+            
+            batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+            for start in range(0, len(group_ids), batch_size):
+                end = start + batch_size
+                try:
+                    # Преобразование в списки только на границе сериализации
+                    rows = group_vectors[start:end].tolist()
+                    with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="upsert_batch"):
+                        self.client.upsert(
+                            collection_name=collection_name,
+                            points=[
+                                PointStruct(
+                                    id=self._point_id(point_id),
+                                    vector=row,
+                                    payload=payload
+                                )
+                                for point_id, row, payload in zip(
+                                    group_ids[start:end], rows, group_payloads[start:end]
+                                )
+                            ],
+                            shard_key_selector=shard_key
+                        )
+                    logger.debug("Upserted %s points", len(rows))
+                except Exception as e:
+                    logger.error("Error upserting %s points: %s", len(group_ids[start:end]), e)
     
     async def search(
         self,
-        query_vector: List[float],
+        query_vector: np.ndarray,
         limit: int = 10,
         score_threshold: float = 0.0,
         project_id: Optional[str] = None,
@@ -113,9 +327,11 @@ class VectorService:
             return []
         
         try:
+            from qdrant_client.models import Filter, FieldCondition, MatchValue
+            
             # Построение фильтра
             filters = []
-            if project_id:
+            if project_id and self.isolation != "collection":
                 filters.append(
                     FieldCondition(key="project_id", match=MatchValue(value=project_id))
                 )
@@ -125,69 +341,519 @@ class VectorService:
                 )
             
             filter_obj = Filter(must=filters) if filters else None
+            vector = np.asarray(query_vector, dtype=np.float32).tolist()
+            
+            # Коллекции поиска: без проекта в режиме collection - все проекты
+            collection_name, shard_key = self._target(project_id)
+            if self.isolation != "collection":
+                collection_names = [collection_name]
+            elif project_id:
+                # Коллекцию мог создать другой процесс (воркер индексации)
+                if collection_name not in self._known_collections:
+                    self._known_collections.update(self._project_collections())
+                collection_names = [collection_name] if collection_name in self._known_collections else []
+            else:
+                collection_names = self._project_collections()
             
             # Поиск
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=limit,
-                score_threshold=score_threshold,
-                query_filter=filter_obj
-            )
+            results = []
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="search"):
+                for name in collection_names:
+                    results.extend(self.client.search(
+                        collection_name=name,
+                        query_vector=vector,
+                        limit=limit,
+                        score_threshold=score_threshold,
+                        query_filter=filter_obj,
+                        shard_key_selector=shard_key
+                    ))
+            if len(collection_names) > 1:
+                results = sorted(results, key=lambda point: point.score, reverse=True)[:limit]
             
             # Преобразование результатов
             search_results = []
             for result in results:
+                payload = result.payload
+                if self.dedup:
+                    payload = self._resolve_ref(payload, project_id, entity_type)
                 search_results.append({
-                    "id": result.payload.get("id", ""),
+                    "id": payload.get("id", ""),
                     "score": float(result.score),
-                    "payload": result.payload
+                    "payload": payload
                 })
             
             return search_results
         
         except Exception as e:
-            logger.error(f"Error searching vectors: {e}")
+            logger.error("Error searching vectors: %s", e)
             return []
     
-    async def delete_by_project(self, project_id: str):
-        """Удаление всех точек проекта"""
+    async def count_by_project(self, project_id: str) -> int:
+        """Точное число точек проекта"""
         if self.client is None:
+            return 0
+        
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+        
+        collection_name, shard_key = self._target(project_id)
+        count_filter = None
+        if self.isolation == "collection":
+            if collection_name not in self._project_collections():
+                return 0
+        else:
+            count_filter = Filter(
+                must=[FieldCondition(key="project_id", match=MatchValue(value=project_id))]
+            )
+        
+        try:
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="count"):
+                return self.client.count(
+                    collection_name=collection_name,
+                    count_filter=count_filter,
+                    exact=True,
+                    shard_key_selector=shard_key
+                ).count
+        except Exception as e:
+            logger.error("Error counting project points: %s", e)
+            return 0
+    
+    async def delete_by_project(self, project_id: str) -> int:
+        """
+        Удаление всех точек проекта
+        
+        Удаление выполняется одним запросом на стороне Qdrant (по фильтру,
+        коллекции или shard key проекта), поэтому не зависит от размера
+        проекта. В режиме дедупликации из общих точек удаляются ссылки
+        проекта, точки удаляются только без оставшихся ссылок.
+        
+        Returns:
+            Количество точек проекта до удаления (ссылок - при дедупликации)
+        
+        Raises:
+            Exception: Ошибка Qdrant (точки проекта могли остаться, повтор безопасен)
+        """
+        if self.client is None:
+            return 0
+        
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, FilterSelector
+        
+        project_filter = Filter(
+            must=[
+                FieldCondition(key="project_id", match=MatchValue(value=project_id))
+            ]
+        )
+        
+        collection_name, shard_key = self._target(project_id)
+        count = 0 if self.dedup else await self.count_by_project(project_id)
+        
+        def delete() -> int:
+            if self.dedup:
+                removed = self._remove_refs(project_filter, lambda ref: ref.get("project_id") == project_id)
+                logger.info("Deleted %s references for project %s", removed, project_id)
+                return removed
+            
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="delete_project"):
+                if self.isolation == "collection":
+                    if count:
+                        self.client.delete_collection(collection_name=collection_name)
+                    self._known_collections.discard(collection_name)
+                elif self.isolation == "shard_key":
+                    if count:
+                        self.client.delete_shard_key(collection_name=collection_name, shard_key=shard_key)
+                    self._known_shard_keys.discard(shard_key)
+                else:
+                    self.client.delete(
+                        collection_name=collection_name,
+                        points_selector=FilterSelector(filter=project_filter),
+                        wait=True
+                    )
+            
+            logger.info("Deleted %s points for project %s", count, project_id)
+            return count
+        
+        try:
+            # Удаление с wait=True ждет применения на сервере: не в цикле событий
+            return await asyncio.to_thread(delete)
+        except Exception as e:
+            logger.error("Error deleting project points: %s", e)
+            raise
+    
+    def _files_filter(self, project_id: str, file_paths: List[str]):
+        """
+        Коллекция, shard key и фильтр точек файлов проекта
+        
+        Returns:
+            (коллекция, shard key, фильтр) или None, если у проекта еще нет коллекции
+        """
+        from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
+        
+        collection_name, shard_key = self._target(project_id)
+        conditions = [FieldCondition(key="file_path", match=MatchAny(any=file_paths))]
+        if self.isolation == "collection":
+            if collection_name not in self._known_collections and collection_name not in self._project_collections():
+                return None
+        else:
+            conditions.append(FieldCondition(key="project_id", match=MatchValue(value=project_id)))
+        return collection_name, shard_key, Filter(must=conditions)
+    
+    async def get_file_entities(
+        self,
+        project_id: str,
+        file_paths: List[str],
+        with_vectors: bool = False
+    ) -> Dict[str, Tuple[Dict, Optional[List[float]]]]:
+        """
+        Сохраненные сущности файлов проекта для сравнения с новым разбором
+        
+        Args:
+            project_id: ID проекта
+            file_paths: Пути файлов относительно корня проекта
+            with_vectors: Вернуть и векторы точек
+        
+        Returns:
+            ID сущности -> (payload без содержимого, вектор или None)
+        """
+        if self.client is None or not file_paths:
+            return {}
+        
+        target = self._files_filter(project_id, file_paths)
+        if target is None:
+            return {}
+        collection_name, shard_key, files_filter = target
+        
+        from qdrant_client.models import PayloadSelectorExclude
+        
+        selected = set(file_paths)
+        entities: Dict[str, Tuple[Dict, Optional[List[float]]]] = {}
+        offset = None
+        try:
+            while True:
+                with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="scroll"):
+                    records, offset = self.client.scroll(
+                        collection_name=collection_name,
+                        scroll_filter=files_filter,
+                        limit=settings.QDRANT_UPSERT_BATCH_SIZE,
+                        offset=offset,
+                        with_payload=PayloadSelectorExclude(exclude=["content"]),
+                        with_vectors=with_vectors,
+                        shard_key_selector=shard_key
+                    )
+                
+                for record in records:
+                    payload = record.payload or {}
+                    vector = record.vector if with_vectors else None
+                    if not self.dedup:
+                        entities[payload.get("id")] = (payload, vector)
+                        continue
+                    # Общая точка: ссылки проекта на выбранные файлы
+                    for ref in payload.get("refs", []):
+                        if ref.get("project_id") == project_id and ref.get("file_path") in selected:
+                            entities[ref["id"]] = (
+                                {
+                                    **ref,
+                                    "content_hash": payload.get("content_hash"),
+                                    "embedding_model": payload.get("embedding_model")
+                                },
+                                vector
+                            )
+                
+                if offset is None:
+                    return entities
+        except Exception as e:
+            logger.error("Error reading file points: %s", e)
+            return {}
+    
+    async def delete_entities(self, project_id: str, entity_ids: List[str]):
+        """Удаление точек сущностей, исчезнувших из файлов проекта"""
+        if self.client is None or not entity_ids:
             return
         
+        from qdrant_client.models import FieldCondition, Filter, MatchAny
+        
         try:
-            # Qdrant не поддерживает прямое удаление по фильтру в бесплатной версии
-            # Нужно найти все точки и удалить их
-            # Для упрощения используем scroll
-            try:
-                scroll_result = self.client.scroll(
-                    collection_name=self.collection_name,
-                    scroll_filter=Filter(
-                        must=[
-                            FieldCondition(key="project_id", match=MatchValue(value=project_id))
+            if self.dedup:
+                selected = set(entity_ids)
+                self._remove_refs(
+                    Filter(must=[FieldCondition(key="id", match=MatchAny(any=entity_ids))]),
+                    lambda ref: ref.get("id") in selected
+                )
+                return
+            
+            collection_name, shard_key = self._target(project_id)
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="delete_points"):
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=[self._point_id(entity_id) for entity_id in entity_ids],
+                    wait=True,
+                    shard_key_selector=shard_key
+                )
+            logger.debug("Deleted %s points for project %s", len(entity_ids), project_id)
+        except Exception as e:
+            logger.error("Error deleting entity points: %s", e)
+    
+    async def update_payloads(self, project_id: str, payloads: Dict[str, Dict]):
+        """
+        Обновление полей payload сущностей без перезаписи векторов
+        
+        Args:
+            project_id: ID проекта
+            payloads: ID сущности -> изменившиеся поля (строки, blob)
+        """
+        if self.client is None or not payloads:
+            return
+        
+        from qdrant_client.models import FieldCondition, Filter, MatchAny, SetPayload, SetPayloadOperation
+        
+        try:
+            if self.dedup:
+                self._rewrite_refs(
+                    Filter(must=[FieldCondition(key="id", match=MatchAny(any=list(payloads)))]),
+                    lambda ref: {**ref, **payloads[ref["id"]]} if ref.get("id") in payloads else ref
+                )
+                return
+            
+            collection_name, shard_key = self._target(project_id)
+            items = list(payloads.items())
+            batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+            for start in range(0, len(items), batch_size):
+                with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="set_payload"):
+                    self.client.batch_update_points(
+                        collection_name=collection_name,
+                        update_operations=[
+                            SetPayloadOperation(set_payload=SetPayload(
+                                payload=fields,
+                                points=[self._point_id(entity_id)],
+                                shard_key=shard_key
+                            ))
+                            for entity_id, fields in items[start:start + batch_size]
                         ]
-                    ),
-                    limit=1000
+                    )
+            logger.debug("Updated payload of %s points for project %s", len(items), project_id)
+        except Exception as e:
+            logger.error("Error updating payloads: %s", e)
+    
+    async def delete_by_files(self, project_id: str, file_paths: List[str]):
+        """
+        Удаление точек указанных файлов проекта (инкрементальное обновление)
+        
+        Args:
+            project_id: ID проекта
+            file_paths: Пути файлов относительно корня проекта
+        """
+        if self.client is None or not file_paths:
+            return
+        
+        from qdrant_client.models import FilterSelector
+        
+        target = self._files_filter(project_id, file_paths)
+        if target is None:
+            return
+        collection_name, shard_key, files_filter = target
+        
+        try:
+            if self.dedup:
+                selected = set(file_paths)
+                self._remove_refs(
+                    files_filter,
+                    lambda ref: ref.get("project_id") == project_id and ref.get("file_path") in selected
                 )
-                
-                point_ids = [point.id for point in scroll_result[0]]
-                if point_ids:
-                    self.client.delete(
+                return
+            
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="delete_files"):
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=FilterSelector(filter=files_filter),
+                    wait=True,
+                    shard_key_selector=shard_key
+                )
+            logger.debug("Deleted points of %s files for project %s", len(file_paths), project_id)
+        except Exception as e:
+            logger.error("Error deleting file points: %s", e)
+    
+    def close(self):
+        """Закрытие клиента Qdrant"""
+        if self.client is None:
+            return
+        
+        try:
+            self.client.close()
+        except Exception as e:
+            logger.warning("Error closing Qdrant client: %s", e)
+    
+    @staticmethod
+    def _point_id(point_id: str) -> str:
+        """
+        ID точки Qdrant для строкового ID сущности
+        
+        UUIDv5 одинаков во всех процессах и после перезапуска, поэтому
+        повторная индексация перезаписывает точки, а не добавляет копии.
+        """
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, point_id))
+    
+    @classmethod
+    def _content_point_id(cls, content_hash: str) -> str:
+        """ID общей точки содержимого (режим дедупликации)"""
+        return cls._point_id(f"content:{content_hash}")
+    
+    @staticmethod
+    def _shared_payload(base: Dict, refs: List[Dict]) -> Dict:
+        """
+        Payload общей точки: содержимое и ссылки на все сущности с ним
+        
+        Поля фильтров (project_id, type, file_path) хранятся массивами
+        значений ссылок: условие MatchValue по массиву выполняется, если
+        совпал хотя бы один элемент.
+        """
+        payload = {
+            "content_hash": base["content_hash"],
+            "embedding_model": base.get("embedding_model"),
+            "content": base.get("content", ""),
+            "refs": refs
+        }
+        for field_name in _REF_FILTER_FIELDS:
+            payload[field_name] = sorted({str(ref.get(field_name)) for ref in refs})
+        return payload
+    
+    def _upsert_deduplicated(self, point_ids: List[str], vectors: np.ndarray, payloads: List[Dict]):
+        """
+        Запись с дедупликацией по content_hash payload
+        
+        Ссылки пачки объединяются со ссылками уже сохраненных точек
+        (ссылка с тем же ID сущности заменяется). Вектор точки один на
+        содержимое, поэтому берется вычисленный в этой пачке.
+        """
+        from qdrant_client.models import FieldCondition, Filter, HasIdCondition, MatchAny, PointStruct
+        
+        # ID точки -> (строка вектора, payload-образец, ссылки по ID сущности)
+        points: Dict[str, Tuple[int, Dict, Dict[str, Dict]]] = {}
+        for row, (point_id, payload) in enumerate(zip(point_ids, payloads)):
+            content_point_id = self._content_point_id(payload["content_hash"])
+            entry = points.setdefault(content_point_id, (row, payload, {}))
+            entry[2][point_id] = {field_name: payload.get(field_name) for field_name in _REF_FIELDS}
+        
+        try:
+            # Сущности, содержимое которых изменилось, уходят из прежних точек
+            entity_ids = set(point_ids)
+            self._remove_refs(
+                Filter(
+                    must=[FieldCondition(key="id", match=MatchAny(any=list(entity_ids)))],
+                    must_not=[HasIdCondition(has_id=list(points))]
+                ),
+                lambda ref: ref.get("id") in entity_ids
+            )
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="retrieve"):
+                existing = self.client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=list(points),
+                    with_payload=["refs"],
+                    with_vectors=False
+                )
+        except Exception as e:
+            logger.error("Error reading shared points: %s", e)
+            return
+        
+        for point in existing:
+            refs = points[str(point.id)][2]
+            for ref in (point.payload or {}).get("refs", []):
+                refs.setdefault(ref["id"], ref)
+        
+        items = list(points.items())
+        batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            try:
+                with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="upsert_batch"):
+                    self.client.upsert(
                         collection_name=self.collection_name,
-                        points_selector=point_ids
+                        points=[
+                            PointStruct(
+                                id=content_point_id,
+                                vector=vectors[row].tolist(),
+                                payload=self._shared_payload(base, list(refs.values()))
+                            )
+                            for content_point_id, (row, base, refs) in batch
+                        ]
                     )
-                
-                logger.info(f"Deleted {len(point_ids)} points for project {project_id}")
-            except Exception as scroll_error:
-                logger.warning(f"Could not delete by filter, trying alternative method: {scroll_error}")
-                # Альтернативный метод: удаление всех точек (не рекомендуется для продакшена)
-                pass
+                logger.debug("Upserted %s shared points for %s entities", len(batch), len(point_ids))
+            except Exception as e:
+                logger.error("Error upserting %s shared points: %s", len(batch), e)
+    
+    def _remove_refs(self, scroll_filter, should_remove: Callable[[Dict], bool]) -> int:
+        """
+        Удаление ссылок из общих точек, отобранных фильтром
         
-        except Exception as e:
-            logger.error(f"Error deleting project points: {e}")
+        Returns:
+            Количество удаленных ссылок
+        """
+        return self._rewrite_refs(scroll_filter, lambda ref: None if should_remove(ref) else ref)
+    
+    def _rewrite_refs(self, scroll_filter, rewrite: Callable[[Dict], Optional[Dict]]) -> int:
+        """
+        Изменение ссылок общих точек, отобранных фильтром
+        
+        rewrite возвращает ссылку (ту же или измененную) или None для
+        удаления. Точки без оставшихся ссылок удаляются, измененные
+        перезаписываются с новым списком ссылок.
+        
+        Returns:
+            Количество удаленных ссылок
+        """
+        from qdrant_client.models import PointStruct
+        
+        removed = 0
+        offset = None
+        while True:
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="scroll"):
+                records, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=scroll_filter,
+                    limit=settings.QDRANT_UPSERT_BATCH_SIZE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+            
+            emptied = []
+            updated = []
+            for record in records:
+                refs = record.payload.get("refs", [])
+                rewritten = [rewrite(ref) for ref in refs]
+                kept = [ref for ref in rewritten if ref is not None]
+                removed += len(refs) - len(kept)
+                if not kept:
+                    emptied.append(record.id)
+                elif any(new is not old for new, old in zip(rewritten, refs)):
+                    updated.append(PointStruct(
+                        id=record.id,
+                        vector=record.vector,
+                        payload=self._shared_payload(record.payload, kept)
+                    ))
+            
+            with track(QDRANT_SECONDS, QDRANT_ERRORS, span="qdrant", operation="remove_refs"):
+                if emptied:
+                    self.client.delete(collection_name=self.collection_name, points_selector=emptied, wait=True)
+                if updated:
+                    self.client.upsert(collection_name=self.collection_name, points=updated)
+            
+            if offset is None:
+                return removed
     
-    def _hash_id(self, point_id: str) -> int:
-        """Преобразование строкового ID в числовой для Qdrant"""
-        # Qdrant требует числовые ID, используем хеш
-        return abs(hash(point_id)) % (2 ** 63)
+    @staticmethod
+    def _resolve_ref(payload: Dict, project_id: Optional[str], entity_type: Optional[str]) -> Dict[str, Any]:
+        """Payload найденной общей точки в виде обычной сущности (первая подходящая ссылка)"""
+        refs = payload.get("refs", [])
+        ref = next(
+            (
+                ref for ref in refs
+                if (not project_id or ref.get("project_id") == project_id)
+                and (not entity_type or ref.get("type") == entity_type)
+            ),
+            refs[0] if refs else {}
+        )
+        return {
+            **ref,
+            "content": payload.get("content", ""),
+            "content_hash": payload.get("content_hash"),
+            "copies": len(refs)
+        }
 
@@ -0,0 +1,229 @@
+"""
+Воркеры очереди индексации
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.indexing_service import IndexingService
+from app.services.job_queue import IndexingCancelled, JobQueue
+
+logger = logging.getLogger(__name__)
+
+# Как часто супервизор проверяет процессы-воркеры
+_MONITOR_INTERVAL = 0.5
+# Воркер, завершившийся быстрее, перезапускается с паузой (как в prefork)
+_MIN_WORKER_LIFETIME = 1.0
+
+
+class IndexingWorker:
+    """
+    Исполнитель задач из очереди индексации
+    
+    Захватывает задачи по одной, сохраняет позицию после каждой пачки файлов
+    и периодически отправляет heartbeat. Отмена проверяется на границе пачек.
+    """
+    
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        indexing_service: IndexingService,
+        worker_id: Optional[str] = None
+    ):
+        self.job_queue = job_queue
+        self.indexing_service = indexing_service
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        """Цикл обработки очереди до установки stop_event (или отмены задачи)"""
+        stop_event = stop_event or asyncio.Event()
+        logger.info("Indexing worker %s started", self.worker_id)
+        
+        while not stop_event.is_set():
+            job = await asyncio.to_thread(self.job_queue.claim, self.worker_id)
+            if job is None:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=settings.INDEXING_JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            await self.process(job)
+        
+        logger.info("Indexing worker %s stopped", self.worker_id)
+    
+    async def process(self, job: Dict):
+        """Выполнение одной задачи с heartbeat и контрольными точками"""
+        job_id = job["id"]
+        state = {"active": True}
+        logger.info(
+            "Worker %s took job %s for project %s (resuming from file %s)",
+            self.worker_id, job_id, job["project_id"], job["processed_files"]
+        )
+        
+        async def heartbeat_loop():
+            while True:
+                await asyncio.sleep(settings.INDEXING_JOB_HEARTBEAT_INTERVAL)
+                state["active"] = await asyncio.to_thread(self.job_queue.heartbeat, job_id, self.worker_id)
+        
+        async def on_progress(processed: int, total: int):
+            state["active"] = await asyncio.to_thread(
+                self.job_queue.heartbeat, job_id, self.worker_id, processed, total
+            )
+            if not state["active"]:
+                raise IndexingCancelled(job_id)
+        
+        heartbeat_task = asyncio.create_task(heartbeat_loop())
+        try:
+            stats = await self.indexing_service.index_project(
+                project_path=job["project_path"],
+                project_id=job["project_id"],
+                force=job["force"],
+                start_from=job["processed_files"],
+                on_progress=on_progress,
+                git_ref=job["git_ref"]
+            )
+            await asyncio.to_thread(self.job_queue.complete, job_id, self.worker_id, stats)
+            logger.info("Job %s completed", job_id)
+        except IndexingCancelled:
+            await asyncio.to_thread(self.job_queue.mark_cancelled, job_id, self.worker_id)
+            logger.info("Job %s cancelled", job_id)
+        except asyncio.CancelledError:
+            # Остановка воркера: задача продолжится с сохраненной позиции
+            await asyncio.to_thread(self.job_queue.release, job_id, self.worker_id)
+            logger.info("Job %s released back to the queue", job_id)
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self.job_queue.fail, job_id, self.worker_id, str(e))
+            logger.error("Job %s failed: %s", job_id, e)
+        finally:
+            heartbeat_task.cancel()
+
+
+async def _serve(worker_id: str):
+    """Сервисы процесса-воркера и цикл обработки очереди"""
+    from app.services.container import ServiceContainer
+    
+    main_task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+    
+    services = ServiceContainer()
+    try:
+        await services.warmup()
+        worker = IndexingWorker(services.job_queue, services.indexing_service, worker_id)
+        await worker.run()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await services.close()
+
+
+def run_worker_process(worker_id: str):
+    """Точка входа процесса-воркера"""
+    from app.core.logging import setup_logging
+    
+    setup_logging()
+    asyncio.run(_serve(worker_id))
+
+
+class IndexingWorkerSupervisor:
+    """
+    Процессы-воркеры индексации, запускаемые вместе с API
+    
+    Поток наблюдения перезапускает завершившиеся процессы (OOM, падение
+    нативного парсера) и сразу возвращает их задачи в очередь: новый
+    процесс продолжает задачу с сохраненной позиции.
+    """
+    
+    def __init__(
+        self,
+        num_workers: int,
+        job_queue: Optional[JobQueue] = None,
+        target: Callable[[str], None] = run_worker_process
+    ):
+        self.num_workers = num_workers
+        self.job_queue = job_queue
+        self.target = target
+        self._processes: Dict[int, multiprocessing.Process] = {}  # номер воркера -> процесс
+        self._started_at: Dict[int, float] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+    
+    def _worker_id(self, index: int) -> str:
+        return f"{os.getpid()}-worker-{index}"
+    
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=self.target,
+            args=(self._worker_id(index),),
+            name=f"indexing-worker-{index}",
+            daemon=False
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+    
+    def start(self):
+        """
+        Запуск процессов (spawn: без унаследованного состояния event loop и драйверов)
+        
+        Процессы не daemon: им нужны собственные пулы эмбеддингов и разбора
+        (EMBEDDING_POOL_WORKERS, INDEXING_PARSE_WORKERS); остановку и
+        ожидание выполняет stop().
+        """
+        if self.job_queue is None:
+            self.job_queue = JobQueue()
+        for index in range(self.num_workers):
+            self._spawn(index)
+        self._monitor = threading.Thread(target=self._watch, name="indexing-supervisor", daemon=True)
+        self._monitor.start()
+        logger.info("Started %s indexing worker process(es)", self.num_workers)
+    
+    def _watch(self):
+        while not self._stopping.wait(_MONITOR_INTERVAL):
+            self._reap()
+    
+    def _reap(self):
+        """Перезапуск неожиданно завершившихся процессов"""
+        for index, process in list(self._processes.items()):
+            if process.is_alive() or self._stopping.is_set():
+                continue
+            
+            process.join()
+            logger.warning(
+                "Indexing worker %s (pid %s) exited with code %s, restarting",
+                index, process.pid, process.exitcode
+            )
+            try:
+                self.job_queue.requeue_worker(self._worker_id(index))
+            except Exception as e:
+                # Задачу вернет в очередь проверка heartbeat в claim
+                logger.error("Could not requeue jobs of indexing worker %s: %s", index, e)
+            if time.monotonic() - self._started_at[index] < _MIN_WORKER_LIFETIME:
+                time.sleep(_MIN_WORKER_LIFETIME)
+            if not self._stopping.is_set():
+                self._spawn(index)
+    
+    def stop(self, timeout: float = 10.0):
+        """Остановка: SIGTERM возвращает текущие задачи в очередь"""
+        self._stopping.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+        processes = list(self._processes.values())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self._processes.clear()
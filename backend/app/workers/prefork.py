@@ -0,0 +1,202 @@
+"""
+Запуск API в нескольких процессах с общей памятью модели (prefork)
+
+Master загружает модель эмбеддингов и импортирует приложение, затем
+создает воркеров через fork: страницы модели и кода остаются общими
+(copy-on-write), а каждый воркер добавляет только свой рабочий набор.
+Соединения с Qdrant, Neo4j и Redis создаются в lifespan каждого воркера,
+то есть уже после fork.
+"""
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+from app.core.config import settings
+from app.services.embedding_backends import BACKENDS
+from app.services.embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# Модель, загруженная в master до fork (None вне prefork-режима)
+preloaded_embedding_service: Optional[EmbeddingService] = None
+# Текущий процесс - воркер prefork-сервера (очередь индексации ведет master)
+is_prefork_worker = False
+
+# Клиенты БД импортируются лениво; импорт в master делает их код общим
+_SHARED_MODULES = ["qdrant_client", "neo4j", "redis.asyncio"]
+
+# Воркер, завершившийся быстрее, перезапускается с паузой
+_MIN_WORKER_LIFETIME = 1.0
+
+
+def preload():
+    """Загрузка в master того, что воркеры используют только на чтение"""
+    global preloaded_embedding_service
+    
+    backend_class = BACKENDS.get(settings.EMBEDDING_BACKEND)
+    if backend_class is not None and backend_class.fork_safe:
+        service = EmbeddingService()
+        service.load()
+        preloaded_embedding_service = service
+    else:
+        logger.warning(
+            "Embedding backend %s cannot be shared across fork, each worker loads its own model",
+            settings.EMBEDDING_BACKEND
+        )
+    
+    for module in _SHARED_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    
+    # Объекты master исключаются из сборки мусора: иначе проходы GC
+    # в воркерах пишут в их заголовки и копируют общие страницы
+    gc.collect()
+    gc.freeze()
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    """Слушающий сокет, общий для всех воркеров"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Master-процесс: сокет, воркеры uvicorn и их перезапуск"""
+    
+    def __init__(self, app, num_workers: int, host: str, port: int):
+        self.app = app
+        self.num_workers = num_workers
+        self.host = host
+        self.port = port
+        self._workers: Dict[int, int] = {}  # pid -> номер воркера
+        self._started_at: Dict[int, float] = {}
+        self._stopping = False
+    
+    def _spawn(self, index: int, sock: socket.socket):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(sock)
+            os._exit(0)
+        
+        self._workers[pid] = index
+        self._started_at[pid] = time.monotonic()
+    
+    def _run_worker(self, sock: socket.socket):
+        global is_prefork_worker
+        is_prefork_worker = True
+        
+        # Обработчики master не нужны: uvicorn ставит свои
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        
+        config = uvicorn.Config(self.app, log_level="info")
+        uvicorn.Server(config).run(sockets=[sock])
+    
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+    
+    def run(self):
+        """Запуск воркеров и наблюдение за ними до SIGTERM/SIGINT"""
+        from app.workers.indexing_worker import IndexingWorkerSupervisor
+        
+        preload()
+        sock = _bind_socket(self.host, self.port)
+        
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        
+        for index in range(self.num_workers):
+            self._spawn(index, sock)
+        logger.info(
+            "Prefork server listening on %s:%s with %s workers",
+            self.host, self.port, self.num_workers
+        )
+        
+        # Отдельные процессы индексации одни на сервер, а не на каждый воркер;
+        # воркеры API очередь не обрабатывают, поэтому процесс нужен и при 0
+        supervisor = IndexingWorkerSupervisor(max(settings.INDEXING_WORKERS, 1))
+        supervisor.start()
+        
+        try:
+            while not self._stopping:
+                self._reap(sock)
+                time.sleep(0.5)
+        finally:
+            self._stop_workers()
+            if supervisor is not None:
+                supervisor.stop()
+            sock.close()
+    
+    def _exited(self) -> Dict[int, int]:
+        """Завершившиеся воркеры: pid -> статус (процессы индексации не затрагиваются)"""
+        exited = {}
+        for pid in list(self._workers):
+            try:
+                waited, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                waited, status = pid, 0
+            if waited:
+                exited[pid] = status
+        return exited
+    
+    def _reap(self, sock: socket.socket):
+        """Перезапуск неожиданно завершившихся воркеров"""
+        for pid, status in self._exited().items():
+            index = self._workers.pop(pid)
+            started_at = self._started_at.pop(pid)
+            if self._stopping:
+                continue
+            
+            logger.warning("Worker %s (pid %s) exited with status %s, restarting", index, pid, status)
+            if time.monotonic() - started_at < _MIN_WORKER_LIFETIME:
+                time.sleep(_MIN_WORKER_LIFETIME)
+            self._spawn(index, sock)
+    
+    def _stop_workers(self, timeout: float = 30.0):
+        """Плавная остановка: SIGTERM, по истечении timeout - SIGKILL"""
+        for pid in self._workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        
+        deadline = time.monotonic() + timeout
+        while self._workers and time.monotonic() < deadline:
+            for pid in self._exited():
+                del self._workers[pid]
+            time.sleep(0.1)
+        
+        for pid in self._workers:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._workers.clear()
+
+
+def serve(app, num_workers: int, host: str, port: int):
+    """
+    Запуск API в num_workers процессах
+    
+    Без os.fork (Windows) используется режим workers самого uvicorn:
+    процессы запускаются заново и модель загружается в каждом.
+    """
+    if not hasattr(os, "fork"):
+        uvicorn.run("main:app", host=host, port=port, workers=num_workers, log_level="info")
+        return
+    PreforkServer(app, num_workers, host, port).run()
@@ -0,0 +1 @@
+"""Бенчмарки AetherNexus Backend"""
@@ -0,0 +1,124 @@
+"""
+Микробенчмарк стоимости аутентификации на запрос
+
+Запуск из директории backend:
+    python -m benchmarks.auth_benchmark --iterations 20000 --requests 2000 --output auth.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from jose import jwt
+
+from app.core.config import settings
+from app.core.security import create_access_token, decode_token, token_cache
+
+
+def _per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def measure_decode(iterations: int) -> dict:
+    """jwt.decode против попадания в кеш проверенных токенов"""
+    token = create_access_token({"sub": "benchmark"})
+    token_cache.clear()
+    decode_token(token)
+    
+    return {
+        "jwt_decode_us": _per_call_us(
+            lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]),
+            iterations
+        ),
+        "cached_decode_us": _per_call_us(lambda: decode_token(token), iterations)
+    }
+
+
+def measure_password(iterations: int) -> dict:
+    """Создание CryptContext на каждый вызов против общего контекста"""
+    from passlib.context import CryptContext
+    from app.core.security import get_password_hash, verify_password
+    
+    hashed = get_password_hash("benchmark")
+    return {
+        "context_construct_us": _per_call_us(
+            lambda: CryptContext(schemes=["bcrypt"], deprecated="auto"),
+            iterations
+        ),
+        # bcrypt намеренно медленный: проверка нужна только при входе
+        "verify_ms": _per_call_us(lambda: verify_password("benchmark", hashed), 5) / 1000
+    }
+
+
+async def measure_requests(requests: int) -> dict:
+    """Задержка запроса через ASGI: без аутентификации, с кешем и без него"""
+    import httpx
+    from main import app
+    
+    token = create_access_token({"sub": "benchmark"})
+    headers = {"Authorization": f"Bearer {token}"}
+    max_items = token_cache.max_items
+    
+    async def p50(url: str, **kwargs) -> float:
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get(url, **kwargs)
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+        return statistics.median(timings) * 1e6
+    
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        baseline = await p50("/health")
+        
+        token_cache.max_items = 0
+        token_cache.clear()
+        uncached = await p50("/api/v1/auth/validate", headers=headers)
+        
+        token_cache.max_items = max_items
+        cached = await p50("/api/v1/auth/validate", headers=headers)
+    
+    return {
+        "requests": requests,
+        "health_p50_us": baseline,
+        "validate_uncached_p50_us": uncached,
+        "validate_cached_p50_us": cached,
+        "auth_overhead_uncached_us": uncached - baseline,
+        "auth_overhead_cached_us": cached - baseline
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authentication overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--with-password", action="store_true", help="Замерить и bcrypt (медленно)")
+    parser.add_argument("--output", type=str, default=None, help="Файл для JSON-результата")
+    args = parser.parse_args()
+    
+    report = {"benchmark": "auth", "algorithm": settings.ALGORITHM}
+    
+    report["decode"] = measure_decode(args.iterations)
+    print(f"decode: {report['decode']}", file=sys.stderr)
+    
+    report["requests"] = asyncio.run(measure_requests(args.requests))
+    print(f"requests: {report['requests']}", file=sys.stderr)
+    
+    if args.with_password:
+        report["password"] = measure_password(max(1, args.iterations // 100))
+        print(f"password: {report['password']}", file=sys.stderr)
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
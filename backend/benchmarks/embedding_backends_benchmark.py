@@ -0,0 +1,148 @@
+"""
+Бенчмарк бэкендов эмбеддингов: задержка и точность относительно эталона
+
+Эталон - sentence-transformers (PyTorch fp32). Для каждого кандидата
+сравниваются косинусная близость эмбеддингов с эталоном и совпадение
+top-k соседей на синтетическом корпусе. Модель берется из локального
+кеша Hugging Face (HF_HUB_OFFLINE=1), сеть не требуется.
+
+Запуск из директории backend:
+    python -m benchmarks.embedding_backends_benchmark --backends onnx onnx-int8 --output emb.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.embedding_backends import create_backend  # noqa: E402
+
+# Варианты бэкендов: имя в отчете -> (бэкенд, квантизация)
+VARIANTS = {
+    "sentence-transformers": ("sentence-transformers", False),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True)
+}
+
+WORDS = [
+    "index", "project", "vector", "graph", "search", "embedding", "query", "file", "parser",
+    "entity", "node", "edge", "score", "cache", "token", "request", "response", "service",
+    "config", "batch", "worker", "collection", "payload", "filter", "session", "driver"
+]
+
+
+def build_corpus(size: int, seed: int = 42) -> list:
+    """Детерминированный корпус из фрагментов кода и документации"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        name = "_".join(rng.sample(WORDS, 2))
+        if i % 3 == 0:
+            corpus.append(" ".join(rng.choices(WORDS, k=rng.randint(8, 60))).capitalize() + ".")
+        else:
+            body = "\n    ".join(
+                f"{rng.choice(WORDS)} = {rng.choice(WORDS)}.{rng.choice(WORDS)}({rng.choice(WORDS)})"
+                for _ in range(rng.randint(1, 15))
+            )
+            corpus.append(f"def {name}(self, {rng.choice(WORDS)}):\n    {body}\n    return {rng.choice(WORDS)}")
+    return corpus
+
+
+def measure(backend, corpus: list, queries: list) -> dict:
+    """Задержка одиночного запроса и пропускная способность батча"""
+    backend.encode(queries[:4])  # прогрев
+    
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        backend.encode([query])
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    
+    started = time.perf_counter()
+    embeddings = backend.encode(corpus)
+    batch_s = time.perf_counter() - started
+    
+    return {
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "batch_texts_per_s": len(corpus) / batch_s,
+        "embeddings": embeddings
+    }
+
+
+def compare(reference: np.ndarray, candidate: np.ndarray, top_k: int) -> dict:
+    """Близость к эталону: косинус по строкам и recall@k соседей"""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (ref * cand).sum(axis=1)
+    
+    ref_neighbors = np.argsort(-(ref @ ref.T), axis=1)[:, 1:top_k + 1]
+    cand_neighbors = np.argsort(-(cand @ cand.T), axis=1)[:, 1:top_k + 1]
+    overlap = [
+        len(set(a) & set(b)) / top_k
+        for a, b in zip(ref_neighbors.tolist(), cand_neighbors.tolist())
+    ]
+    
+    return {
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        f"recall_at_{top_k}": float(np.mean(overlap))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backends benchmark")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=list(VARIANTS))
+    parser.add_argument("--corpus-size", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_NUM_THREADS)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--output", type=str, default=None, help="Файл для JSON-результата")
+    args = parser.parse_args()
+    
+    corpus = build_corpus(args.corpus_size)
+    queries = [" ".join(text.split()[:8]) for text in corpus[:args.queries]]
+    
+    report = {
+        "benchmark": "embedding_backends",
+        "model": settings.EMBEDDING_MODEL,
+        "threads": args.threads,
+        "corpus_size": len(corpus),
+        "results": {}
+    }
+    
+    reference = None
+    for variant in ["sentence-transformers"] + [b for b in args.backends if b != "sentence-transformers"]:
+        backend_name, quantize = VARIANTS[variant]
+        started = time.perf_counter()
+        backend = create_backend(backend_name, settings.EMBEDDING_MODEL, num_threads=args.threads, quantize=quantize)
+        load_s = time.perf_counter() - started
+        
+        result = measure(backend, corpus, queries)
+        embeddings = result.pop("embeddings")
+        result["load_s"] = load_s
+        if reference is None:
+            reference = embeddings
+        else:
+            result.update(compare(reference, embeddings, args.top_k))
+        report["results"][variant] = result
+        print(f"{variant}: {result}", file=sys.stderr)
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
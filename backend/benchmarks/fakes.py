@@ -0,0 +1,215 @@
+"""
+In-process заменители внешних БД для бенчмарков
+
+Qdrant запускается в локальном режиме клиента (`QdrantClient(":memory:")`),
+Neo4j заменяется графом в словарях с теми же методами, что и GraphService.
+Так измеряется код приложения, а не сеть и настройки внешних серверов.
+"""
+from array import array
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.cache_service import InMemoryRedis
+from app.services.container import ServiceContainer
+from app.services.graph_service import GraphService
+
+
+class InMemoryGraphService(GraphService):
+    """Граф в памяти процесса с интерфейсом GraphService"""
+    
+    def __init__(self):
+        super().__init__()
+        # id -> {"type", "properties"}
+        self.nodes: Dict[str, Dict] = {}
+        # (from_id, to_id, type, project_id) -> свойства связи
+        self.relationships: Dict[Tuple[str, str, str, str], Dict] = {}
+        self._adjacency: Dict[str, set] = {}
+    
+    async def connect(self) -> bool:
+        return True
+    
+    async def verify_connectivity(self) -> bool:
+        return True
+    
+    async def close(self):
+        pass
+    
+    def _node_dict(self, node_id: str) -> Dict:
+        node = self.nodes[node_id]
+        return {
+            "id": node_id,
+            "type": node["type"],
+            "label": node["properties"].get("name", node_id),
+            "properties": {"id": node_id, **node["properties"]}
+        }
+    
+    def _merge_node(self, node_id: str, node_type: str, properties: Dict):
+        node = self.nodes.setdefault(node_id, {"type": node_type, "properties": {}})
+        node["properties"].update(properties)
+    
+    def _merge_relationship(self, from_id: str, to_id: str, relation_type: str, project_id: str,
+                            properties: Optional[Dict] = None):
+        if from_id not in self.nodes or to_id not in self.nodes:
+            return
+        key = (from_id, to_id, relation_type, project_id)
+        self.relationships.setdefault(key, {"type": relation_type, "project_id": project_id}).update(
+            properties or {}
+        )
+        self._adjacency.setdefault(from_id, set()).add(key)
+        self._adjacency.setdefault(to_id, set()).add(key)
+    
+    def _delete_nodes(self, node_ids: List[str]):
+        for node_id in node_ids:
+            for key in self._adjacency.pop(node_id, set()):
+                self.relationships.pop(key, None)
+                other = key[1] if key[0] == node_id else key[0]
+                self._adjacency.get(other, set()).discard(key)
+            self.nodes.pop(node_id, None)
+    
+    async def create_node(self, node_id: str, node_type: str, properties: Dict):
+        self._merge_node(node_id, node_type, properties)
+    
+    async def create_relationship(self, from_id: str, to_id: str, relation_type: str, project_id: str,
+                                  properties: Optional[Dict] = None):
+        self._merge_relationship(from_id, to_id, relation_type, project_id, properties)
+    
+    async def write_entities(self, nodes: List[Dict], relationships: List[Dict],
+                             project_id: Optional[str] = None, replace_files: Optional[List[str]] = None,
+                             delete_ids: Optional[List[str]] = None):
+        self._delete_nodes(delete_ids or [])
+        if replace_files:
+            files = set(replace_files)
+            self._delete_nodes([
+                node_id for node_id, node in self.nodes.items()
+                if node["properties"].get("project_id") == project_id
+                and node["properties"].get("file_path") in files
+            ])
+        for node in nodes:
+            self._merge_node(node["id"], node["type"], node["properties"])
+        for rel in relationships:
+            self._merge_relationship(rel["from_id"], rel["to_id"], rel["relation_type"], rel["project_id"],
+                                     rel.get("properties"))
+    
+    async def get_entity_graph(self, entity_id: str, depth: int = 2, max_nodes: int = 50) -> Dict:
+        if entity_id not in self.nodes:
+            return {"nodes": [], "edges": []}
+        
+        nodes = {entity_id: self._node_dict(entity_id)}
+        edges = []
+        seen = {entity_id}
+        queue = deque([(entity_id, 0)])
+        while queue and len(edges) < max_nodes:
+            current, level = queue.popleft()
+            if level >= depth:
+                continue
+            for key in self._adjacency.get(current, ()):
+                other = key[1] if key[0] == current else key[0]
+                nodes[other] = self._node_dict(other)
+                relationship = self.relationships[key]
+                edges.append({
+                    "source": entity_id,
+                    "target": other,
+                    "type": relationship.get("type", "RELATES_TO"),
+                    "weight": relationship.get("weight", 1.0),
+                    "properties": dict(relationship)
+                })
+                if other not in seen:
+                    seen.add(other)
+                    queue.append((other, level + 1))
+                if len(edges) >= max_nodes:
+                    break
+        
+        return {"nodes": list(nodes.values()), "edges": edges}
+    
+    async def get_entity_connections(self, entity_id: str, connection_type: Optional[str] = None) -> List[Dict]:
+        connections = []
+        for key in self._adjacency.get(entity_id, ()):
+            relationship = self.relationships[key]
+            if connection_type and relationship["type"] != connection_type:
+                continue
+            outgoing = key[0] == entity_id
+            other = key[1] if outgoing else key[0]
+            node = self._node_dict(other)
+            weight = relationship.get("weight", 1.0) if outgoing \
+                else self.nodes[other]["properties"].get("pagerank", 1.0)
+            connections.append({
+                "id": other,
+                "type": node["type"],
+                "title": node["label"],
+                "relation_type": relationship["type"],
+                "score": weight
+            })
+        connections.sort(key=lambda conn: conn["score"], reverse=True)
+        return connections[:50]
+    
+    async def get_project_topology(self, project_id: str) -> Optional[Dict]:
+        element_ids = [
+            node_id for node_id, node in self.nodes.items()
+            if node["properties"].get("project_id") == project_id
+        ]
+        index = {node_id: i for i, node_id in enumerate(element_ids)}
+        sources = array("q")
+        targets = array("q")
+        for (from_id, to_id, _, rel_project), _ in self.relationships.items():
+            if rel_project == project_id and from_id in index and to_id in index:
+                sources.append(index[from_id])
+                targets.append(index[to_id])
+        return {
+            "element_ids": element_ids,
+            "pagerank": [self.nodes[node_id]["properties"].get("pagerank") for node_id in element_ids],
+            "degree": [self.nodes[node_id]["properties"].get("degree") for node_id in element_ids],
+            "sources": sources,
+            "targets": targets
+        }
+    
+    async def write_centrality(self, rows: List[Dict], batch_size: int = 5000) -> int:
+        for row in rows:
+            node_id = row["eid"]
+            properties = {key: value for key, value in row.items() if key != "eid"}
+            self.nodes[node_id]["properties"].update(properties)
+            for key in self._adjacency.get(node_id, ()):
+                if key[1] == node_id:
+                    self.relationships[key]["weight"] = row["pagerank"]
+        return len(rows)
+    
+    async def delete_project(self, project_id: str, batch_size: Optional[int] = None,
+                             on_progress: Optional[Callable[[int], None]] = None) -> int:
+        node_ids = [
+            node_id for node_id, node in self.nodes.items()
+            if node["properties"].get("project_id") == project_id
+        ]
+        self._delete_nodes(node_ids)
+        if on_progress:
+            on_progress(len(node_ids))
+        return len(node_ids)
+
+
+def create_benchmark_container(with_cache: bool = False) -> ServiceContainer:
+    """
+    Контейнер сервисов с in-process Qdrant и графом в памяти
+    
+    Args:
+        with_cache: Кеш запросов с InMemoryRedis; иначе кеш выключен,
+            чтобы каждый запрос доходил до бэкендов
+    """
+    from qdrant_client import QdrantClient
+    
+    services = ServiceContainer()
+    
+    services.vector_service.client = QdrantClient(":memory:")
+    services.vector_service._ensure_collection()
+    
+    graph_service = InMemoryGraphService()
+    services.graph_service = graph_service
+    services.centrality_service.graph_service = graph_service
+    services.indexing_service.graph_service = graph_service
+    
+    if with_cache:
+        services.cache_service.redis = InMemoryRedis()
+    else:
+        services.cache_service.local.max_items = 0
+    
+    services.embedding_service.load()
+    for component in services.readiness.values():
+        component["status"] = "ready"
+    return services
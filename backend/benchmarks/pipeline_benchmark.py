@@ -0,0 +1,162 @@
+"""
+Бенчмарк конвейера: индексация синтетического репозитория и латентность запросов
+
+Qdrant работает in-process, Neo4j заменен графом в памяти (benchmarks.fakes),
+поэтому результат воспроизводим без внешних сервисов и отражает стоимость
+кода приложения: парсинга, эмбеддингов, сборки батчей и обработки запросов.
+
+Запуск из директории backend:
+    python -m benchmarks.pipeline_benchmark --files 500 --requests 200 --output pipeline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic_repo import DEFAULT_LANGUAGES, generate_repository, parse_languages
+
+PROJECT_ID = "bench"
+
+
+def _percentiles(timings: list) -> dict:
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "requests": len(timings),
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "max_ms": max(timings) * 1000
+    }
+
+
+async def measure_indexing(services, project_path: Path, summary: dict) -> dict:
+    """Время полной индексации и пиковая память Python-аллокаций"""
+    indexing_service = services.indexing_service
+    
+    started = time.perf_counter()
+    stats = await indexing_service.index_project(str(project_path), PROJECT_ID)
+    took = time.perf_counter() - started
+    
+    # Повторный проход под tracemalloc: трассировка замедляет аллокации,
+    # поэтому время и память снимаются в разных прогонах
+    await indexing_service.delete_index(PROJECT_ID)
+    tracemalloc.start()
+    await indexing_service.index_project(str(project_path), PROJECT_ID)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        "files": stats["indexed_files"],
+        "entities": stats["total_entities"],
+        "errors": len(stats["errors"]),
+        "took_s": took,
+        "files_per_s": stats["indexed_files"] / took,
+        "entities_per_s": stats["total_entities"] / took,
+        "bytes_per_s": summary["bytes"] / took,
+        "peak_python_memory_mb": peak / 2 ** 20
+    }
+
+
+async def measure_endpoints(services, names: list, entity_ids: list, requests: int, seed: int) -> dict:
+    """p50/p95/p99 эндпоинтов поиска и графа через ASGI без сети"""
+    import httpx
+    from main import app
+    
+    app.state.services = services
+    rng = random.Random(seed)
+    filters = {"project_id": PROJECT_ID}
+    # Без порога: у dummy-эмбеддингов нет смысловой близости, а замер
+    # должен включать сериализацию непустой выдачи
+    semantic_filters = {**filters, "score_threshold": 0.0}
+    
+    scenarios = {
+        "search_text": lambda: ("POST", "/api/v1/search/text", {"query": rng.choice(names), "filters": filters}),
+        "search_semantic": lambda: (
+            "POST", "/api/v1/search/semantic", {"query": " ".join(rng.sample(names, 3)), "filters": semantic_filters}
+        ),
+        "search_graph": lambda: ("POST", "/api/v1/search/graph", {"query": rng.choice(names), "filters": filters}),
+        "graph_entity": lambda: ("GET", f"/api/v1/graph/entity/{rng.choice(entity_ids)}", None),
+        "graph_connections": lambda: ("GET", f"/api/v1/graph/connections/{rng.choice(entity_ids)}", None)
+    }
+    
+    results = {}
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        for name, make_request in scenarios.items():
+            timings = []
+            empty = 0
+            for _ in range(requests):
+                method, url, body = make_request()
+                started = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                timings.append(time.perf_counter() - started)
+                response.raise_for_status()
+                data = response.json()
+                if not (data.get("results") or data.get("nodes") or data.get("connections")):
+                    empty += 1
+            results[name] = {**_percentiles(timings), "empty_responses": empty}
+            print(f"{name}: {results[name]}", file=sys.stderr)
+    return results
+
+
+async def run(args) -> dict:
+    from benchmarks.fakes import create_benchmark_container
+    from app.core.config import settings
+    
+    with tempfile.TemporaryDirectory(prefix="aethernexus-bench-") as tmp:
+        project_path = Path(tmp) / "repo"
+        summary = generate_repository(project_path, args.files, args.lines, args.languages, args.seed)
+        names = summary.pop("names")
+        print(f"repository: {summary}", file=sys.stderr)
+        
+        services = create_benchmark_container(with_cache=args.with_cache)
+        try:
+            indexing = await measure_indexing(services, project_path, summary)
+            print(f"indexing: {indexing}", file=sys.stderr)
+            
+            entity_ids = sorted(services.graph_service.nodes)
+            endpoints = await measure_endpoints(services, names, entity_ids, args.requests, args.seed)
+        finally:
+            await services.close()
+    
+    return {
+        "benchmark": "pipeline",
+        "embedding_backend": settings.EMBEDDING_BACKEND,
+        "cache": args.with_cache,
+        "repository": {**summary, "seed": args.seed, "languages": args.languages},
+        "indexing": indexing,
+        "endpoints": endpoints
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexing and query latency benchmark")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=80)
+    parser.add_argument("--languages", type=parse_languages, default=DEFAULT_LANGUAGES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на эндпоинт")
+    parser.add_argument("--with-cache", action="store_true", help="Включить кеш запросов (Redis в памяти)")
+    parser.add_argument("--embedding-backend", type=str, default="dummy")
+    parser.add_argument("--output", type=str, default=None, help="Файл для JSON-результата")
+    args = parser.parse_args()
+    
+    # Настройки читаются при импорте app, поэтому бэкенд задается до него
+    os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+    
+    report = asyncio.run(run(args))
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Бенчмарк памяти нескольких процессов API: prefork против `uvicorn --workers`
+
+Для каждого режима запускается сервер с N процессами, после загрузки модели
+по /proc/<pid>/smaps_rollup снимаются RSS, PSS и USS (приватные страницы)
+всех процессов дерева. В prefork модель и код загружаются в master до fork,
+поэтому USS воркеров меньше, а суммарный PSS растет медленнее с N.
+
+Только Linux. Запуск из директории backend:
+    python -m benchmarks.prefork_memory_benchmark --workers 4 --backend sentence-transformers
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.startup_benchmark import BACKEND_DIR, _free_port, _get_json
+
+
+def _children(pid: int) -> List[int]:
+    """Все потомки процесса (по полю ppid в /proc/<pid>/stat)"""
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            stat = Path(f"/proc/{entry}/stat").read_text()
+        except OSError:
+            continue
+        # Имя процесса в скобках может содержать пробелы
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        parents.setdefault(ppid, []).append(int(entry))
+    
+    result = []
+    stack = [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    """RSS, PSS и USS процесса в КБ"""
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        values[name] = int(value.split()[0])
+    return {
+        "rss_kb": values["Rss"],
+        "pss_kb": values["Pss"],
+        "uss_kb": values["Private_Clean"] + values["Private_Dirty"]
+    }
+
+
+def measure_mode(mode: str, workers: int, backend: str, timeout: float, settle: float) -> Dict:
+    """Память дерева процессов сервера после загрузки модели"""
+    port = _free_port()
+    env = {**os.environ, "DEBUG": "false", "EMBEDDING_BACKEND": backend}
+    if mode == "prefork":
+        command = [sys.executable, "main.py"]
+        env.update({"WEB_WORKERS": str(workers), "HOST": "127.0.0.1", "PORT": str(port)})
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning"
+        ]
+    
+    process = subprocess.Popen(
+        command,
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=env
+    )
+    try:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            _, body = _get_json(f"http://127.0.0.1:{port}/ready")
+            if body and body["components"]["embedding"]["status"] != "pending":
+                break
+            time.sleep(0.1)
+        else:
+            raise TimeoutError(f"{mode}: embedding model was not loaded in {timeout} s")
+        
+        # /ready отвечает один воркер: остальным дается время загрузить модель
+        time.sleep(settle)
+        processes = {pid: _memory_kb(pid) for pid in [process.pid] + _children(process.pid)}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    
+    return {
+        "processes": len(processes),
+        "total_rss_mb": sum(item["rss_kb"] for item in processes.values()) / 1024,
+        "total_pss_mb": sum(item["pss_kb"] for item in processes.values()) / 1024,
+        "total_uss_mb": sum(item["uss_kb"] for item in processes.values()) / 1024,
+        "per_process": processes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefork memory benchmark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--backend", type=str, default="sentence-transformers")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Таймаут загрузки модели, с")
+    parser.add_argument("--settle", type=float, default=5.0, help="Пауза перед замером, с")
+    parser.add_argument("--output", type=str, default=None, help="Файл для JSON-результата")
+    args = parser.parse_args()
+    
+    report = {"benchmark": "prefork_memory", "workers": args.workers, "backend": args.backend}
+    for mode in ("uvicorn", "prefork"):
+        report[mode] = measure_mode(mode, args.workers, args.backend, args.timeout, args.settle)
+        print(f"{mode}: PSS {report[mode]['total_pss_mb']:.1f} MB", file=sys.stderr)
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
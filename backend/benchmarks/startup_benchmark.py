@@ -0,0 +1,135 @@
+"""
+Бенчмарк старта приложения: время импорта, время до /health и время warmup
+
+Запуск из директории backend:
+    python -m benchmarks.startup_benchmark --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Модули, которые не должны загружаться при импорте приложения
+HEAVY_MODULES = ["torch", "sentence_transformers", "qdrant_client", "neo4j"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+took = time.perf_counter() - started
+print(json.dumps({{
+    "import_s": took,
+    "heavy_modules_loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+}}))
+"""
+
+
+def measure_import(runs: int) -> dict:
+    """Время `import main` в свежем интерпретаторе"""
+    timings = []
+    heavy_loaded = set()
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_PROBE],
+            cwd=BACKEND_DIR,
+            stderr=subprocess.DEVNULL
+        )
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        timings.append(result["import_s"])
+        heavy_loaded.update(result["heavy_modules_loaded"])
+    
+    return {
+        "runs": runs,
+        "median_s": statistics.median(timings),
+        "max_s": max(timings),
+        "heavy_modules_loaded": sorted(heavy_loaded)
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_json(url: str):
+    """GET с возвратом (status, json) или (None, None) если сервер еще не слушает"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None, None
+
+
+def measure_serving(timeout: float) -> dict:
+    """Время от запуска процесса до первого ответа /health и до готовности /ready"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "DEBUG": "false"}
+    )
+    
+    result = {"health_s": None, "ready_s": None, "ready_status": None, "components": None}
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline and result["health_s"] is None:
+            status, _ = _get_json(f"{base_url}/health")
+            if status == 200:
+                result["health_s"] = time.perf_counter() - started
+            else:
+                time.sleep(0.02)
+        
+        while time.perf_counter() < deadline:
+            status, body = _get_json(f"{base_url}/ready")
+            if body and body.get("status") != "starting":
+                result["ready_s"] = time.perf_counter() - started
+                result["ready_status"] = body["status"]
+                result["components"] = body["components"]
+                break
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AetherNexus startup benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="Количество замеров импорта")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут ожидания готовности, с")
+    parser.add_argument("--output", type=str, default=None, help="Файл для JSON-результата")
+    args = parser.parse_args()
+    
+    report = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "import": measure_import(args.runs),
+        "serving": measure_serving(args.timeout)
+    }
+    
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Детерминированный генератор синтетического репозитория для бенчмарков
+
+Одинаковые параметры и seed дают побайтно одинаковое дерево файлов,
+поэтому результаты разных запусков сопоставимы.
+
+Запуск из директории backend:
+    python -m benchmarks.synthetic_repo /tmp/synthetic --files 500 --languages py=0.6,ts=0.2,md=0.2
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+WORDS = [
+    "index", "project", "vector", "graph", "search", "embedding", "query", "file", "parser",
+    "entity", "node", "edge", "score", "cache", "token", "request", "response", "service",
+    "config", "batch", "worker", "collection", "payload", "filter", "session", "driver",
+    "user", "order", "account", "report", "event", "message", "schema", "record", "stream"
+]
+
+DEFAULT_LANGUAGES = {"py": 0.5, "js": 0.15, "ts": 0.15, "java": 0.1, "md": 0.1}
+
+
+def parse_languages(value: str) -> Dict[str, float]:
+    """Разбор смеси языков вида py=0.6,ts=0.2,md=0.2"""
+    languages = {}
+    for part in value.split(","):
+        extension, _, weight = part.partition("=")
+        languages[extension.strip().lstrip(".")] = float(weight or 1.0)
+    return languages
+
+
+def _identifier(rng: random.Random, words: int = 2) -> str:
+    return "_".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _camel(name: str) -> str:
+    return "".join(part.capitalize() for part in name.split("_"))
+
+
+def _body_lines(rng: random.Random, count: int, indent: str, comment: str) -> List[str]:
+    lines = []
+    for _ in range(count):
+        lines.append(f"{indent}{comment} {' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))}")
+    return lines
+
+
+def _python_file(rng: random.Random, lines: int, names: List[str]) -> str:
+    out = ['"""', " ".join(rng.choice(WORDS) for _ in range(10)), '"""', "import os", ""]
+    while len(out) < lines:
+        name = _identifier(rng)
+        if rng.random() < 0.4:
+            class_name = _camel(name)
+            names.append(class_name)
+            out += ["", f"class {class_name}:", f'    """{" ".join(rng.choice(WORDS) for _ in range(6))}"""']
+            for _ in range(rng.randint(1, 4)):
+                method = _identifier(rng)
+                out += ["", f"    def {method}(self, {rng.choice(WORDS)}):"]
+                out += _body_lines(rng, rng.randint(2, 6), "        ", "#")
+                out.append(f"        return self.{rng.choice(WORDS)}")
+        else:
+            names.append(name)
+            out += ["", f"def {name}({rng.choice(WORDS)}, {rng.choice(WORDS)}_value=None):"]
+            out += _body_lines(rng, rng.randint(2, 8), "    ", "#")
+            out.append(f"    return {rng.choice(WORDS)}")
+    return "\n".join(out) + "\n"
+
+
+def _script_file(rng: random.Random, lines: int, names: List[str], typed: bool) -> str:
+    out = [f"// {' '.join(rng.choice(WORDS) for _ in range(8))}", ""]
+    annotation = ": string" if typed else ""
+    while len(out) < lines:
+        name = _camel(_identifier(rng))
+        names.append(name)
+        if rng.random() < 0.3:
+            out += [f"export class {name} {{", f"  {rng.choice(WORDS)}(value{annotation}) {{"]
+            out += _body_lines(rng, rng.randint(2, 6), "    ", "//")
+            out += ["    return value;", "  }", "}", ""]
+        else:
+            out += [f"export function {name[0].lower() + name[1:]}(value{annotation}) {{"]
+            out += _body_lines(rng, rng.randint(2, 8), "  ", "//")
+            out += ["  return value;", "}", ""]
+    return "\n".join(out) + "\n"
+
+
+def _jvm_file(rng: random.Random, lines: int, names: List[str], kotlin: bool) -> str:
+    class_name = _camel(_identifier(rng))
+    names.append(class_name)
+    out = [f"package com.example.{rng.choice(WORDS)}" + ("" if kotlin else ";"), ""]
+    out.append(f"class {class_name} {{" if kotlin else f"public class {class_name} {{")
+    while len(out) < lines:
+        method = _camel(_identifier(rng))
+        method = method[0].lower() + method[1:]
+        if kotlin:
+            out += [f"    fun {method}(value: String): String {{"]
+        else:
+            out += [f"    public String {method}(String value) {{"]
+        out += _body_lines(rng, rng.randint(2, 6), "        ", "//")
+        out += ["        return value" + ("" if kotlin else ";"), "    }", ""]
+    out.append("}")
+    return "\n".join(out) + "\n"
+
+
+def _markdown_file(rng: random.Random, lines: int, names: List[str]) -> str:
+    title = " ".join(rng.choice(WORDS) for _ in range(3)).capitalize()
+    out = [f"# {title}", ""]
+    while len(out) < lines:
+        out += [f"## {_camel(_identifier(rng))}", ""]
+        out += [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))) for _ in range(rng.randint(2, 5))]
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def generate_repository(
+    root: Path,
+    num_files: int = 500,
+    lines_per_file: int = 80,
+    languages: Dict[str, float] = None,
+    seed: int = 42
+) -> Dict:
+    """
+    Генерация синтетического репозитория
+    
+    Args:
+        root: Каталог, в котором создаются файлы
+        num_files: Количество файлов
+        lines_per_file: Средний размер файла в строках
+        languages: Доли расширений (py, js, ts, java, kt, md)
+        seed: Seed генератора
+    
+    Returns:
+        Сводка: число файлов по расширениям, байты, строки и имена сущностей
+    """
+    languages = languages or DEFAULT_LANGUAGES
+    rng = random.Random(seed)
+    root = Path(root)
+    extensions = sorted(languages)
+    weights = [languages[extension] for extension in extensions]
+    
+    summary = {"files": 0, "bytes": 0, "lines": 0, "by_extension": {}, "names": []}
+    for index in range(num_files):
+        extension = rng.choices(extensions, weights)[0]
+        lines = max(10, int(rng.gauss(lines_per_file, lines_per_file / 4)))
+        names: List[str] = []
+        
+        if extension == "py":
+            content = _python_file(rng, lines, names)
+        elif extension in ("js", "ts"):
+            content = _script_file(rng, lines, names, typed=extension == "ts")
+        elif extension in ("java", "kt"):
+            content = _jvm_file(rng, lines, names, kotlin=extension == "kt")
+        else:
+            content = _markdown_file(rng, lines, names)
+        
+        # Вложенность пакетов как в реальном проекте
+        package = Path(*(rng.choice(WORDS) for _ in range(rng.randint(1, 3))))
+        path = root / package / f"{_identifier(rng)}_{index}.{extension}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+        
+        summary["files"] += 1
+        summary["bytes"] += len(content.encode("utf-8"))
+        summary["lines"] += content.count("\n")
+        summary["by_extension"][extension] = summary["by_extension"].get(extension, 0) + 1
+        summary["names"].extend(names)
+    
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic repository generator")
+    parser.add_argument("root", type=str)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=80)
+    parser.add_argument("--languages", type=parse_languages, default=DEFAULT_LANGUAGES)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    summary = generate_repository(Path(args.root), args.files, args.lines, args.languages, args.seed)
+    summary.pop("names")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,22 @@
 AetherNexus Backend - Main Application Entry Point
 FastAPI application для интеллектуальной системы знаний
 """
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
 
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.core.compression import CompressionMiddleware
 from app.core.logging import setup_logging
+from app.core.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, render_metrics
+from app.core.responses import FastJSONResponse
+from app.core.timing import ServerTimingMiddleware
+from app.services.container import ServiceContainer
+from app.workers import prefork
+from app.workers.indexing_worker import IndexingWorker, IndexingWorkerSupervisor
 
 # Настройка логирования
 setup_logging()
@@ -20,9 +28,35 @@ async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения"""
     # Startup
     print("🚀 AetherNexus Backend запускается...")
+    # Сервисы создаются один раз на процесс и передаются в endpoints через Depends.
+    # Модель и соединения загружаются в фоне, /health отвечает сразу
+    app.state.services = ServiceContainer(embedding_service=prefork.preloaded_embedding_service)
+    warmup_task = asyncio.create_task(app.state.services.warmup())
+    
+    # Очередь индексации обрабатывают отдельные процессы, чтобы задачи
+    # не влияли на задержку API; без них - фоновая задача в этом процессе.
+    # В prefork-режиме процессы индексации запускает master
+    supervisor = None
+    worker_task = None
+    if prefork.is_prefork_worker:
+        pass
+    elif settings.INDEXING_WORKERS > 0:
+        supervisor = IndexingWorkerSupervisor(settings.INDEXING_WORKERS)
+        supervisor.start()
+    else:
+        worker = IndexingWorker(app.state.services.job_queue, app.state.services.indexing_service)
+        worker_task = asyncio.create_task(worker.run())
     yield
     # Shutdown
     print("🛑 AetherNexus Backend останавливается...")
+    if not warmup_task.done():
+        warmup_task.cancel()
+    if worker_task is not None:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+    if supervisor is not None:
+        await asyncio.to_thread(supervisor.stop)
+    await app.state.services.close()
 
 
 # Создание FastAPI приложения
@@ -33,6 +67,7 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -45,6 +80,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие ответов от COMPRESSION_MIN_SIZE (внутри метрик и Server-Timing,
+# чтобы время сжатия входило в латентность запроса)
+app.add_middleware(CompressionMiddleware)
+
+# Латентность запросов по маршрутам для /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Разбивка времени запроса (эмбеддинги, Qdrant, Neo4j, сериализация) в Server-Timing
+app.add_middleware(ServerTimingMiddleware)
+
 # Подключение роутеров
 app.include_router(api_router, prefix="/api/v1")
 
@@ -66,12 +111,41 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness endpoint: готовность модели и подключений к БД"""
+    services = app.state.services
+    components = services.readiness
+    
+    if services.is_ready:
+        status = "ready"
+    elif any(component["status"] == "pending" for component in components.values()):
+        status = "starting"
+    else:
+        status = "degraded"
+    
+    if status != "ready":
+        response.status_code = 503
+    
+    return {"status": status, "components": components}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики Prometheus"""
+    await app.state.services.refresh_gauges()
+    return Response(content=render_metrics(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG,
-        log_level="info"
-    )
+    if settings.WEB_WORKERS > 1:
+        prefork.serve(app, settings.WEB_WORKERS, settings.HOST, settings.PORT)
+    else:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=settings.DEBUG,
+            log_level="info"
+        )
 
@@ -0,0 +1,14 @@
+public class Repository {
+    public Repository() {
+    }
+
+    public String save(String item) {
+        return item;
+    }
+
+    public String save(String item, int version) {
+        return item + version;
+    }
+
+    enum Status { ACTIVE, DELETED }
+}
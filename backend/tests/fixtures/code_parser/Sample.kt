@@ -0,0 +1,17 @@
+class Repository {
+    fun save(item: String): String {
+        return item
+    }
+
+    companion object {
+        fun create(): Repository {
+            return Repository()
+        }
+    }
+}
+
+object Registry {
+    fun register() {}
+}
+
+fun helper(x: Int): Int = x
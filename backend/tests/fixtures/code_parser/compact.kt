@@ -0,0 +1,4 @@
+class K { fun a() = 1
+ companion object { fun b() {} } }
+object O { fun c() {} }
+fun top(x: Int): Int = x
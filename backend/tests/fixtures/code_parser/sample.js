@@ -0,0 +1,11 @@
+class Repository {
+  save(item) {
+    return item;
+  }
+}
+
+function helper(value) {
+  return value;
+}
+
+const format = (value) => `${value}`;
@@ -0,0 +1,10 @@
+class Repository:
+    def save(self, item):
+        return item
+
+    async def load(self, key):
+        return key
+
+
+def helper(value):
+    return value
@@ -0,0 +1,15 @@
+interface Store {
+  load(key: string): string;
+}
+
+export class Repository {
+  private cache = new Map<string, string>();
+
+  save(item: string): string {
+    return item;
+  }
+}
+
+export function helper(value: number): number {
+  return value;
+}
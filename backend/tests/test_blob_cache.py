@@ -0,0 +1,63 @@
+"""
+Тесты кеша blob-объектов git при сбое модели эмбеддингов
+"""
+import subprocess
+
+import pytest
+
+from app.core.config import settings
+from app.services.blob_cache import BlobCache
+from benchmarks.fakes import create_benchmark_container
+from benchmarks.synthetic_repo import generate_repository
+
+
+class FailingBackend:
+    """Бэкенд, падающий на каждом батче"""
+    
+    def encode(self, texts):
+        raise RuntimeError("CUDA out of memory")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    generate_repository(root, num_files=3)
+    for args in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", "init"]):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=root, check=True
+        )
+    return root
+
+
+@pytest.fixture
+def services(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "dummy")
+    services = create_benchmark_container()
+    services.indexing_service.blob_cache = BlobCache("dummy:test", tmp_path / "blobs.sqlite3")
+    return services
+
+
+def cached_rows(blob_cache: BlobCache) -> int:
+    with blob_cache._connect() as conn:
+        return conn.execute("SELECT count(*) FROM blobs").fetchone()[0]
+
+
+@pytest.mark.asyncio
+async def test_failed_embeddings_are_not_cached(repo, services):
+    indexing = services.indexing_service
+    backend = services.embedding_service.backend
+    services.embedding_service.backend = FailingBackend()
+    
+    stats = await indexing.index_project(str(repo), "p", git_ref="HEAD")
+    
+    assert stats["errors"]
+    assert cached_rows(indexing.blob_cache) == 0
+    
+    # После восстановления модели векторы считаются заново и кешируются
+    services.embedding_service.backend = backend
+    stats = await indexing.index_project(str(repo), "p", git_ref="HEAD")
+    
+    assert not stats.get("errors")
+    assert stats["reused_blobs"] == 0
+    assert cached_rows(indexing.blob_cache) == 3
@@ -0,0 +1,222 @@
+"""
+Тесты CacheService с InMemoryRedis вместо сервера
+"""
+import pytest
+
+from app.core.config import settings
+from app.services import cache_service as cache_module
+from app.services.cache_service import CacheService, InMemoryRedis, VersionStore
+
+
+class FakeClock:
+    """Управляемое время для TTL локального LRU и InMemoryRedis"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FailingRedis(InMemoryRedis):
+    """Redis, все операции которого завершаются ошибкой соединения"""
+    
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+    
+    async def _fail(self, *args, **kwargs):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+    
+    ping = get = set = incr = _fail
+
+
+class Loader:
+    """Загрузчик значения со счетчиком вызовов"""
+    
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+    
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def redis():
+    return InMemoryRedis()
+
+
+@pytest.fixture
+def cache(redis, clock):
+    return CacheService(redis_client=redis)
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_caches_value(cache):
+    loader = Loader({"results": [1, 2, 3]})
+    
+    first = await cache.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    second = await cache.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    
+    assert first == second == {"results": [1, 2, 3]}
+    assert loader.calls == 1
+    assert cache.stats()["search"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_skips_empty_results(cache):
+    loader = Loader({"nodes": [], "edges": []})
+    
+    await cache.get_or_load("graph", "p1", {"id": "e"}, 300, loader)
+    await cache.get_or_load("graph", "p1", {"id": "e"}, 300, loader)
+    
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_shares_values_through_redis(redis, clock):
+    loader = Loader(["a" * 1000])
+    
+    await CacheService(redis_client=redis).get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    value = await CacheService(redis_client=redis).get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    
+    assert value == ["a" * 1000]
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_values_expire_after_ttl(cache, clock):
+    loader = Loader([1])
+    
+    await cache.get_or_load("search", "p1", {"q": "x"}, 30, loader)
+    clock.now += 29
+    await cache.get_or_load("search", "p1", {"q": "x"}, 30, loader)
+    assert loader.calls == 1
+    
+    clock.now += 2
+    await cache.get_or_load("search", "p1", {"q": "x"}, 30, loader)
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_local_ttl_is_capped(cache, clock, redis):
+    loader = Loader([1])
+    
+    await cache.get_or_load("search", "p1", {"q": "x"}, 3600, loader)
+    await redis.close()
+    clock.now += settings.CACHE_LOCAL_TTL + 1
+    await cache.get_or_load("search", "p1", {"q": "x"}, 3600, loader)
+    
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_project_reloads_project_and_global_pages(redis, clock):
+    reader = CacheService(redis_client=redis)
+    project_loader = Loader([1])
+    global_loader = Loader([2])
+    await reader.get_or_load("search", "p1", {"q": "x"}, 300, project_loader)
+    await reader.get_or_load("search", None, {"q": "x"}, 300, global_loader)
+    
+    # Инвалидация из другого процесса видна после CACHE_VERSION_TTL
+    await CacheService(redis_client=redis).invalidate_project("p1")
+    clock.now += settings.CACHE_VERSION_TTL + 0.1
+    
+    await reader.get_or_load("search", "p1", {"q": "x"}, 300, project_loader)
+    await reader.get_or_load("search", None, {"q": "x"}, 300, global_loader)
+    assert project_loader.calls == 2
+    assert global_loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_embeddings_round_trip(cache):
+    import numpy as np
+    
+    vector = np.arange(4, dtype=np.float32)
+    await cache.set_embedding("query", vector)
+    
+    assert np.array_equal(await cache.get_embedding("query"), vector)
+    assert await cache.get_embedding("other") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_down_falls_back_to_local_cache(clock):
+    redis = FailingRedis()
+    cache = CacheService(redis_client=redis)
+    loader = Loader([1])
+    
+    assert await cache.connect() is False
+    await cache.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    await cache.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    await cache.invalidate_project("p1")
+    
+    assert loader.calls == 1
+    # После ошибки Redis не опрашивается до CACHE_REDIS_RETRY_SECONDS
+    assert redis.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_down_invalidation_is_local(clock):
+    cache = CacheService(redis_client=FailingRedis())
+    loader = Loader([1])
+    
+    await cache.connect()
+    await cache.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    await cache.invalidate_project("p1")
+    await cache.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_reconnects_after_retry_interval(clock):
+    redis = FailingRedis()
+    cache = CacheService(redis_client=redis)
+    
+    await cache.connect()
+    clock.now += settings.CACHE_REDIS_RETRY_SECONDS + 1
+    await cache.get_or_load("search", "p1", {"q": "x"}, 300, Loader([1]))
+    
+    assert redis.calls > 1
+
+
+@pytest.mark.asyncio
+async def test_version_store_shares_invalidation_without_redis(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_ENABLED", False)
+    store_path = tmp_path / "versions.sqlite3"
+    api = CacheService(version_store=VersionStore(store_path))
+    worker = CacheService(version_store=VersionStore(store_path))
+    loader = Loader([1])
+    
+    await api.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    await api.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    assert loader.calls == 1
+    
+    await worker.invalidate_project("p1")
+    clock.now += settings.CACHE_VERSION_TTL + 0.1
+    await api.get_or_load("search", "p1", {"q": "x"}, 300, loader)
+    
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_connect_without_redis_uses_version_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_ENABLED", False)
+    monkeypatch.setattr(settings, "CACHE_VERSIONS_DB", tmp_path / "versions.sqlite3")
+    cache = CacheService()
+    
+    assert await cache.connect() is False
+    assert isinstance(cache.version_store, VersionStore)
+    
+    await cache.invalidate_project("p1")
+    assert VersionStore(tmp_path / "versions.sqlite3").get("p1") == 1
@@ -0,0 +1,89 @@
+"""
+Тесты расчета PageRank по массивам ребер
+"""
+import numpy as np
+import pytest
+
+from app.services.centrality_service import compute_pagerank
+
+
+def edges(*pairs):
+    sources, targets = zip(*pairs) if pairs else ((), ())
+    return np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+
+def exact(num_nodes, *pairs, **kwargs):
+    return compute_pagerank(num_nodes, *edges(*pairs), tolerance=1e-12, max_iterations=1000, **kwargs)
+
+
+def test_empty_graph():
+    scores, iterations = compute_pagerank(0, *edges())
+    
+    assert scores.shape == (0,)
+    assert iterations == 0
+
+
+def test_single_node_keeps_all_mass():
+    scores, iterations = compute_pagerank(1, *edges())
+    
+    assert scores.tolist() == pytest.approx([1.0])
+    assert iterations == 1
+
+
+def test_hand_checked_scores():
+    # 0 -> 1, 0 -> 2, 1 -> 2, 2 -> 0; t = 0.15 / 3:
+    # r1 = t + 0.85 * r0 / 2, r2 = t + 0.85 * (r0 / 2 + r1), r0 = t + 0.85 * r2
+    # => r0 = 0.128625 / 0.3316875
+    scores, _ = exact(3, (0, 1), (0, 2), (1, 2), (2, 0))
+    
+    r0 = 0.128625 / 0.3316875
+    r1 = 0.05 + 0.425 * r0
+    assert scores.tolist() == pytest.approx([r0, r1, 1 - r0 - r1], abs=1e-9)
+    assert scores[2] > scores[0] > scores[1]
+
+
+def test_dangling_mass_is_spread_uniformly():
+    # У 1 и 2 нет исходящих ребер, их вес делится между всеми узлами:
+    # r0 = 0.05 + 0.85 * (1 - r0) / 3 => r0 = 1 / 3.85
+    scores, _ = exact(3, (0, 1), (0, 2))
+    
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores.tolist() == pytest.approx([20 / 77, 57 / 154, 57 / 154], abs=1e-9)
+
+
+def test_graph_without_edges_is_uniform():
+    scores, _ = compute_pagerank(4, *edges())
+    
+    assert scores.tolist() == pytest.approx([0.25] * 4)
+
+
+def test_stops_when_change_is_below_tolerance():
+    pairs = [(0, 1), (0, 2), (1, 2), (2, 0), (3, 0)]
+    
+    _, loose = compute_pagerank(4, *edges(*pairs), tolerance=1e-3)
+    _, strict = compute_pagerank(4, *edges(*pairs), tolerance=1e-9)
+    _, capped = compute_pagerank(4, *edges(*pairs), tolerance=0.0, max_iterations=7)
+    
+    assert 1 < loose < strict < 100
+    assert capped == 7
+    # Равномерное распределение на цикле - неподвижная точка
+    _, cycle = compute_pagerank(3, *edges((0, 1), (1, 2), (2, 0)))
+    assert cycle == 1
+
+
+def test_warm_start_from_previous_scores():
+    pairs = [(0, 1), (0, 2), (1, 2), (2, 0), (3, 0)]
+    scores, cold = compute_pagerank(4, *edges(*pairs))
+    
+    # Начальное приближение нормируется
+    warm_scores, warm = compute_pagerank(4, *edges(*pairs), initial=scores * 5)
+    
+    assert warm < cold
+    assert warm_scores.tolist() == pytest.approx(scores.tolist(), abs=1e-5)
+
+
+@pytest.mark.parametrize("initial", [np.ones(3), np.zeros(4)])
+def test_unusable_initial_falls_back_to_uniform(initial):
+    pairs = [(0, 1), (0, 2), (1, 2), (2, 0), (3, 0)]
+    
+    assert compute_pagerank(4, *edges(*pairs), initial=initial)[1] == compute_pagerank(4, *edges(*pairs))[1]
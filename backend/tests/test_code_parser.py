@@ -0,0 +1,73 @@
+"""
+Тесты извлечения сущностей по фикстуре на каждый язык
+"""
+from pathlib import Path
+
+import pytest
+
+from app.services.code_parser import parse_source
+
+FIXTURES = Path(__file__).parent / "fixtures" / "code_parser"
+
+
+def entities_of(name: str):
+    _, entities = parse_source(name, (FIXTURES / name).read_text(), "p")
+    return [(entity.type, entity.metadata.get("qualified_name")) for entity in entities]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("sample.py", [
+        ("class", "Repository"),
+        ("method", "Repository.save"),
+        ("method", "Repository.load"),
+        ("function", "helper"),
+    ]),
+    ("sample.js", [
+        ("class", "Repository"),
+        ("method", "Repository.save"),
+        ("function", "helper"),
+        ("function", "format"),
+    ]),
+    ("sample.ts", [
+        ("class", "Store"),
+        ("class", "Repository"),
+        ("method", "Repository.save"),
+        ("function", "helper"),
+    ]),
+    ("Sample.java", [
+        ("class", "Repository"),
+        ("method", "Repository.Repository"),
+        ("method", "Repository.save"),
+        ("method", "Repository.save#2"),
+        ("class", "Repository.Status"),
+    ]),
+    ("Sample.kt", [
+        ("class", "Repository"),
+        ("method", "Repository.save"),
+        ("method", "Repository.create"),
+        ("class", "Registry"),
+        ("method", "Registry.register"),
+        ("function", "helper"),
+    ]),
+])
+def test_entities_per_language(name, expected):
+    assert entities_of(name) == expected
+
+
+def test_syntax_errors_index_whole_file():
+    # Однострочные тела Kotlin дают ERROR: без отката методы a и b
+    # получались функциями верхнего уровня, а K, O, c и top терялись
+    content = (FIXTURES / "compact.kt").read_text()
+    
+    file_entity, entities = parse_source("compact.kt", content, "p")
+    
+    assert len(entities) == 1
+    assert entities[0].type == "file"
+    assert entities[0].id == file_entity.id
+    assert entities[0].content == content
+
+
+def test_python_syntax_error_keeps_only_file_entity():
+    _, entities = parse_source("broken.py", "def broken(:\n    pass\n", "p")
+    
+    assert entities == []
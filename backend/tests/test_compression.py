@@ -0,0 +1,75 @@
+"""
+Тесты выбора кодировки по Accept-Encoding и заголовков сжатого ответа
+"""
+import gzip
+
+import pytest
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+from app.core.config import settings
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    # Для выбора кодировки важно только наличие модуля
+    monkeypatch.setattr(compression, "brotli", object())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip;q=1", "gzip"),
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("gzip;q=0.4, br;q=0.8", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.5, gzip;q=0.8", "gzip"),
+    ("identity", None),
+    ("identity;q=1, gzip;q=0.5", None),
+    ("gzip;q=0, br;q=0", None),
+    ("", None),
+])
+def test_highest_quality_wins(with_brotli, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_brotli_is_not_offered_without_module(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip;q=0.1") == "gzip"
+
+
+async def run_middleware(headers, body=b'{"x": 1}' * 200):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+    
+    messages = []
+    
+    async def send(message):
+        messages.append(message)
+    
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(app)(scope, None, send)
+    return messages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("vary, expected", [
+    (None, b"Accept-Encoding"),
+    (b"Origin", b"Origin, Accept-Encoding"),
+    (b"origin, accept-encoding", b"origin, accept-encoding"),
+    (b"*", b"*"),
+])
+async def test_vary_is_merged_into_existing_header(monkeypatch, vary, expected):
+    monkeypatch.setattr(settings, "COMPRESSION_ENABLED", True)
+    headers = [(b"content-type", b"application/json")]
+    if vary is not None:
+        headers.append((b"vary", vary))
+    
+    start, body = await run_middleware(headers)
+    
+    assert [value for key, value in start["headers"] if key == b"vary"] == [expected]
+    assert dict(start["headers"])[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(body["body"]) == b'{"x": 1}' * 200
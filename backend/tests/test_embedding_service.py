@@ -0,0 +1,94 @@
+"""
+Тесты запрета dummy-векторов при сбое модели эмбеддингов
+"""
+import numpy as np
+import pytest
+
+from app.api.v1.endpoints.search import SearchRequest, _embed_query, _page_key, semantic_search, text_search
+from app.core.config import settings
+from app.services.cache_service import CacheService, InMemoryRedis
+from app.services.embedding_backends import DummyBackend
+from app.services.embedding_service import EmbeddingService, EmbeddingUnavailableError
+from benchmarks.fakes import create_benchmark_container
+from benchmarks.synthetic_repo import generate_repository
+
+
+class FailingBackend:
+    """Бэкенд, падающий на каждом батче"""
+    
+    def encode(self, texts):
+        raise RuntimeError("CUDA out of memory")
+
+
+def make_service(backend) -> EmbeddingService:
+    service = EmbeddingService()
+    service.backend = backend
+    service.is_loaded = True
+    return service
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [None, FailingBackend()], ids=["not_loaded", "encode_fails"])
+async def test_fallback_only_when_allowed(backend):
+    service = make_service(backend)
+    
+    vectors = await service.generate_embeddings_batch(["a", "b"])
+    assert vectors.shape == (2, settings.EMBEDDING_DIMENSION)
+    
+    with pytest.raises(EmbeddingUnavailableError):
+        await service.generate_embeddings_batch(["a", "b"], allow_fallback=False)
+
+
+@pytest.mark.asyncio
+async def test_indexing_does_not_persist_fallback_vectors(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "dummy")
+    services = create_benchmark_container()
+    services.embedding_service.backend = FailingBackend()
+    generate_repository(tmp_path, num_files=3)
+    
+    stats = await services.indexing_service.index_project(str(tmp_path), "p")
+    
+    assert stats["indexed_files"] == 0
+    assert all("Embedding model failed" in error for error in stats["errors"])
+    assert await services.vector_service.count_by_project("p") == 0
+
+
+@pytest.mark.asyncio
+async def test_query_fallback_is_not_cached():
+    cache = CacheService(InMemoryRedis())
+    service = make_service(None)
+    
+    vector, is_fallback = await _embed_query("find users", service, cache)
+    
+    assert is_fallback
+    assert np.linalg.norm(vector) > 0
+    assert await cache.get_embedding("find users") is None
+
+
+class StaticVectorService:
+    """Векторный поиск, всегда находящий одну точку"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def search(self, query_vector, **kwargs):
+        self.calls += 1
+        return [{"id": "p:a.py::f", "score": 0.9, "payload": {"name": "f"}}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("endpoint, kind", [(text_search, "text"), (semantic_search, "semantic")])
+async def test_search_page_found_by_fallback_is_not_cached(endpoint, kind):
+    cache = CacheService(InMemoryRedis())
+    vectors = StaticVectorService()
+    request = SearchRequest(query="find users")
+    
+    await endpoint(request, make_service(FailingBackend()), vectors, cache)
+    await endpoint(request, make_service(FailingBackend()), vectors, cache)
+    
+    assert vectors.calls == 2
+    assert await cache.get_json("search", None, _page_key(kind, request)) is None
+    
+    # После восстановления модели страница кешируется как обычно
+    await endpoint(request, make_service(DummyBackend()), vectors, cache)
+    assert await cache.get_json("search", None, _page_key(kind, request)) is not None
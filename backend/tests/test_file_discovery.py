@@ -0,0 +1,172 @@
+"""
+Тесты правил игнорирования и порядка обхода FileDiscovery
+"""
+import subprocess
+
+import pytest
+
+from app.core.config import settings
+from app.services.file_discovery import DEFAULT_IGNORED_DIRS, FileDiscovery, IgnoreRules
+from app.services.git_source import GitTree
+
+
+def ignored(patterns, path, is_dir=False, base=""):
+    return IgnoreRules(patterns, base).match(path, is_dir)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("debug.log", True),
+    ("src/deep/debug.log", True),
+    ("debug.txt", None),
+])
+def test_pattern_without_slash_matches_at_any_depth(path, expected):
+    assert ignored(["*.log"], path) is expected
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ("/build.py", "build.py", True),
+    ("/build.py", "src/build.py", None),
+    ("docs/api.md", "docs/api.md", True),
+    ("docs/api.md", "src/docs/api.md", None),
+    ("src/*.py", "src/a.py", True),
+    ("src/*.py", "src/deep/a.py", None),
+])
+def test_pattern_with_slash_is_anchored(pattern, path, expected):
+    assert ignored([pattern], path) is expected
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ("**/fixtures", "fixtures", True),
+    ("**/fixtures", "tests/unit/fixtures", True),
+    ("src/**/gen.py", "src/gen.py", True),
+    ("src/**/gen.py", "src/a/b/gen.py", True),
+    ("src/**/gen.py", "lib/src/gen.py", None),
+    ("vendor/**", "vendor/a/b.py", True),
+    ("vendor/**", "vendor", None),
+])
+def test_double_star(pattern, path, expected):
+    assert ignored([pattern], path) is expected
+
+
+def test_last_matching_rule_wins():
+    patterns = ["*.py", "!keep.py"]
+    
+    assert ignored(patterns, "drop.py") is True
+    assert ignored(patterns, "src/keep.py") is False
+    assert ignored(["!keep.py", "*.py"], "keep.py") is True
+
+
+def test_dir_only_rule_skips_files():
+    assert ignored(["cache/"], "cache", is_dir=True) is True
+    assert ignored(["cache/"], "src/cache", is_dir=True) is True
+    assert ignored(["cache/"], "cache", is_dir=False) is None
+
+
+def test_comments_blank_lines_and_escapes():
+    rules = IgnoreRules(["# comment", "", "   ", "\\#notes.md", "\\!bang.py"])
+    
+    assert len(rules.rules) == 2
+    assert rules.match("#notes.md", False) is True
+    assert rules.match("!bang.py", False) is True
+
+
+def test_rules_apply_relative_to_base():
+    assert ignored(["/local.py"], "sub/local.py", base="sub/") is True
+    assert ignored(["/local.py"], "local.py", base="sub/") is None
+    assert ignored(["*.py"], "other/a.py", base="sub/") is None
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_IGNORE_PATTERNS", [])
+    files = {
+        ".gitignore": "*.gen.py\n/top_only.py\nout/\n",
+        "a.py": "",
+        "a/b.py": "",
+        "a.gen.py": "",
+        "top_only.py": "",
+        "out/c.py": "",
+        "pkg/top_only.py": "",
+        "pkg/.gitignore": "!keep.gen.py\nlocal.py\n",
+        "pkg/keep.gen.py": "",
+        "pkg/local.py": "",
+        "pkg/sub/local.py": "",
+        "pkg/sub/mod.py": "",
+    }
+    for path, content in files.items():
+        target = tmp_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content or "x = 1\n")
+    return tmp_path
+
+
+def relative_files(project):
+    discovery = FileDiscovery(str(project), {".py"})
+    return [path.relative_to(project).as_posix() for path in discovery.iter_files()], discovery
+
+
+def test_nested_ignore_files(project):
+    files, discovery = relative_files(project)
+    
+    assert set(files) == {"a.py", "a/b.py", "pkg/top_only.py", "pkg/keep.gen.py", "pkg/sub/mod.py"}
+    # a.gen.py, top_only.py, out/, pkg/local.py, pkg/sub/local.py
+    assert discovery.skipped["ignored"] == 5
+
+
+def test_is_ignored_agrees_with_walk(project):
+    discovery = FileDiscovery(str(project), {".py"})
+    
+    assert not discovery.is_ignored("pkg/keep.gen.py")
+    assert discovery.is_ignored("pkg/sub/local.py")
+    assert discovery.is_ignored("out/c.py")
+    assert not discovery.is_ignored("pkg/top_only.py")
+
+
+def test_order_is_deterministic_per_directory(project):
+    files, _ = relative_files(project)
+    
+    # Имена сортируются внутри директории ("a" < "a.py"), поэтому a/b.py
+    # идет раньше a.py, хотя в сортировке полных путей "." < "/"
+    assert files == relative_files(project)[0]
+    assert files.index("a/b.py") < files.index("a.py")
+    assert sorted(files) != files
+
+
+def test_git_tree_matches_working_tree_discovery(project, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_IGNORE_PATTERNS", ["*_pb2.py"])
+    monkeypatch.setattr(settings, "INDEXING_MAX_FILE_SIZE", 1000)
+    extra = {
+        settings.INDEXING_IGNORE_FILE: "fixtures/\n",
+        "fixtures/data.py": "x = 1\n",
+        "api_pb2.py": "x = 1\n",
+        "node_modules/dep.py": "x = 1\n",
+        "big.py": "x = 1\n" * 500,
+        "blob.py": "\0\1\2",
+        "gen/models.py": "# @generated\nx = 1\n",
+    }
+    for path, content in extra.items():
+        target = project / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content)
+    # Игнорируемые файлы тоже попадают в коммит: правила проверяются при индексации
+    for args in (["init", "-q"], ["add", "-A", "-f"], ["commit", "-q", "-m", "init"]):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=project, check=True
+        )
+    
+    discovery = FileDiscovery(str(project), {".py"})
+    expected = sorted(path.relative_to(project).as_posix() for path in discovery.iter_files())
+    
+    tree = GitTree(str(project), "HEAD")
+    try:
+        git_files = tree.list_files({".py"}, DEFAULT_IGNORED_DIRS, settings.INDEXING_MAX_FILE_SIZE)
+        files = [git_file.path for git_file in git_files if tree.read_text(git_file) is not None]
+    finally:
+        tree.close()
+    
+    assert files == expected
+    assert tree.skipped == {"ignored": 8, "too_large": 1, "binary": 1, "generated": 1}
+    # В рабочей копии к ним добавляется сама директория .git
+    discovery.skipped["ignored"] -= 1
+    assert tree.skipped == discovery.skipped
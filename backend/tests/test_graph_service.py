@@ -0,0 +1,122 @@
+"""
+Тесты пакетной записи графа на записывающем драйвере (без сервера Neo4j)
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.graph_service import ENTITY_LABEL, GraphService
+from benchmarks.fakes import create_benchmark_container
+
+
+class RecordingTransaction:
+    """Транзакция, запоминающая запросы; может падать на заданном запросе"""
+    
+    def __init__(self, queries, fail_on=None):
+        self.queries = queries
+        self.fail_on = fail_on
+    
+    async def run(self, query, params):
+        self.queries.append((query, params))
+        if self.fail_on and self.fail_on in query:
+            raise RuntimeError("neo4j write failed")
+        return self
+    
+    async def consume(self):
+        return None
+
+
+class RecordingSession:
+    def __init__(self, driver):
+        self.driver = driver
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def execute_write(self, work, **params):
+        return await work(RecordingTransaction(self.driver.queries, self.driver.fail_on), **params)
+
+
+class RecordingDriver:
+    def __init__(self, fail_on=None):
+        self.queries = []
+        self.fail_on = fail_on
+    
+    def session(self, **kwargs):
+        return RecordingSession(self)
+
+
+def make_service(fail_on=None) -> GraphService:
+    service = GraphService()
+    service.driver = RecordingDriver(fail_on)
+    return service
+
+
+NODES = [
+    {"id": "p:a.py::f", "type": "Function", "properties": {"project_id": "p", "file_path": "a.py"}},
+    {"id": "p:a.py::C", "type": "Class", "properties": {"project_id": "p", "file_path": "a.py"}},
+]
+RELATIONSHIPS = [
+    {"from_id": "p:a.py::C", "to_id": "p:a.py::f", "relation_type": "calls", "project_id": "p"},
+]
+
+
+@pytest.mark.asyncio
+async def test_write_entities_matches_on_entity_label():
+    service = make_service()
+    
+    await service.write_entities(NODES, RELATIONSHIPS, project_id="p", replace_files=["a.py"])
+    
+    queries = [query for query, _ in service.driver.queries]
+    assert len(queries) == 4
+    delete, *merges, relationships = queries
+    assert f"MATCH (n:{ENTITY_LABEL})" in delete
+    assert "n.project_id = $project_id AND n.file_path IN $file_paths" in delete
+    for merge in merges:
+        assert f"MERGE (n:{ENTITY_LABEL} {{id: row.id}})" in merge
+    assert {params["type"] for _, params in service.driver.queries[1:3]} == {"Function", "Class"}
+    assert f"MATCH (a:{ENTITY_LABEL} {{id: row.from_id}})" in relationships
+    assert f"MATCH (b:{ENTITY_LABEL} {{id: row.to_id}})" in relationships
+    assert "{type: row.relation_type, project_id: row.project_id}" in relationships
+
+
+@pytest.mark.asyncio
+async def test_write_entities_raises_on_write_error():
+    service = make_service(fail_on="RELATES_TO")
+    
+    with pytest.raises(RuntimeError, match="neo4j write failed"):
+        await service.write_entities(NODES, RELATIONSHIPS, project_id="p")
+
+
+@pytest.mark.asyncio
+async def test_write_entities_deletes_vanished_ids():
+    service = make_service()
+    
+    await service.write_entities(NODES, [], project_id="p", delete_ids=["p:a.py::old"])
+    
+    delete, params = service.driver.queries[0]
+    assert f"MATCH (n:{ENTITY_LABEL})" in delete and "n.id IN $ids" in delete
+    assert "DETACH DELETE n" in delete
+    assert params == {"ids": ["p:a.py::old"]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("force", [False, True])
+async def test_reindex_deletes_vanished_entities_from_graph(tmp_path, monkeypatch, force):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "dummy")
+    services = create_benchmark_container()
+    indexing = services.indexing_service
+    source = tmp_path / "a.py"
+    source.write_text("def kept():\n    return 1\n\n\ndef removed():\n    return 2\n")
+    await indexing.index_project(str(tmp_path), "p")
+    
+    source.write_text("def kept():\n    return 1\n")
+    indexing.graph_service = make_service()
+    await indexing.index_project(str(tmp_path), "p", force=force)
+    
+    deletes = [params["ids"] for query, params in indexing.graph_service.driver.queries if "n.id IN $ids" in query]
+    assert deletes == [["p:a.py::removed"]]
+    stored = await services.vector_service.get_file_entities("p", ["a.py"])
+    assert set(stored) == {"p:a.py", "p:a.py::kept"}
@@ -0,0 +1,261 @@
+"""
+Тесты очереди задач индексации на временной БД
+"""
+import os
+import time
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import JobQueue
+from app.workers.indexing_worker import IndexingWorker, IndexingWorkerSupervisor
+
+
+class FakeClock:
+    """Управляемое время для heartbeat и просроченных задач"""
+    
+    def __init__(self):
+        self.now = 1_700_000_000.0
+    
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_queue_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(tmp_path / "jobs.sqlite3")
+
+
+def expire_heartbeats(clock):
+    clock.now += settings.INDEXING_JOB_STALE_TIMEOUT + 1
+
+
+def test_enqueue_returns_active_job_of_project(queue):
+    first = queue.enqueue("p1", "/src/p1")
+    second = queue.enqueue("p1", "/src/p1", force=True)
+    other = queue.enqueue("p2", "/src/p2")
+    
+    assert second["id"] == first["id"]
+    assert other["id"] != first["id"]
+    assert queue.count_by_status() == {"pending": 2}
+
+
+def test_claim_skips_project_with_running_job(queue, clock):
+    running = queue.enqueue("p1", "/src/p1")
+    assert queue.claim("w1", max_running=5)["id"] == running["id"]
+    
+    # Вторая задача того же проекта (например, созданная до ограничения)
+    with queue._connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, project_id, project_path, status, created_at) VALUES (?, 'p1', '/src/p1', 'pending', ?)",
+            (uuid.uuid4().hex, clock.now)
+        )
+    clock.now += 1
+    other = queue.enqueue("p2", "/src/p2")
+    
+    assert queue.claim("w2", max_running=5)["id"] == other["id"]
+    assert queue.claim("w3", max_running=5) is None
+
+
+def test_claim_respects_global_limit(queue, clock, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_MAX_CONCURRENT_JOBS", 1)
+    first = queue.enqueue("p1", "/src/p1")
+    clock.now += 1
+    second = queue.enqueue("p2", "/src/p2")
+    
+    assert queue.claim("w1")["id"] == first["id"]
+    assert queue.claim("w2") is None
+    
+    queue.complete(first["id"], "w1", {"indexed_files": 1})
+    assert queue.claim("w2")["id"] == second["id"]
+    assert queue.get(first["id"])["stats"] == {"indexed_files": 1}
+
+
+def test_stale_job_is_requeued_and_resumed(queue, clock):
+    job = queue.enqueue("p1", "/src/p1")
+    queue.claim("w1")
+    assert queue.heartbeat(job["id"], "w1", processed_files=64, total_files=100)
+    
+    expire_heartbeats(clock)
+    resumed = queue.claim("w2")
+    
+    assert resumed["id"] == job["id"]
+    assert resumed["worker_id"] == "w2"
+    assert resumed["processed_files"] == 64
+    assert resumed["attempts"] == 2
+    # Прежний воркер больше не владеет задачей
+    assert not queue.heartbeat(job["id"], "w1", processed_files=96)
+    assert queue.get(job["id"])["processed_files"] == 64
+
+
+def test_live_heartbeat_keeps_job(queue, clock):
+    job = queue.enqueue("p1", "/src/p1")
+    queue.claim("w1")
+    
+    clock.now += settings.INDEXING_JOB_STALE_TIMEOUT - 1
+    assert queue.heartbeat(job["id"], "w1")
+    clock.now += settings.INDEXING_JOB_STALE_TIMEOUT - 1
+    
+    assert queue.claim("w2") is None
+    assert queue.get(job["id"])["worker_id"] == "w1"
+
+
+def test_crashing_job_fails_after_max_attempts(queue, clock, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_JOB_MAX_ATTEMPTS", 2)
+    job = queue.enqueue("p1", "/src/p1")
+    
+    assert queue.claim("w1")["attempts"] == 1
+    expire_heartbeats(clock)
+    assert queue.claim("w2")["attempts"] == 2
+    expire_heartbeats(clock)
+    
+    assert queue.claim("w3") is None
+    failed = queue.get(job["id"])
+    assert failed["status"] == "failed"
+    assert "2 time(s)" in failed["error"]
+    assert queue.active_for_project("p1") is None
+
+
+def test_release_does_not_count_as_attempt(queue, clock, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_JOB_MAX_ATTEMPTS", 1)
+    job = queue.enqueue("p1", "/src/p1")
+    
+    for worker_id in ("w1", "w2", "w3"):
+        queue.claim(worker_id)
+        queue.heartbeat(job["id"], worker_id, processed_files=10)
+        queue.release(job["id"], worker_id)
+    
+    released = queue.get(job["id"])
+    assert released["status"] == "pending"
+    assert released["processed_files"] == 10
+    assert queue.claim("w4")["attempts"] == 1
+
+
+def test_cancel_pending_job(queue):
+    job = queue.enqueue("p1", "/src/p1")
+    
+    assert queue.cancel(job["id"])["status"] == "cancelled"
+    assert queue.claim("w1") is None
+    assert queue.enqueue("p1", "/src/p1")["id"] != job["id"]
+
+
+def test_cancel_running_job(queue):
+    job = queue.enqueue("p1", "/src/p1")
+    queue.claim("w1")
+    
+    cancelled = queue.cancel(job["id"])
+    assert cancelled["status"] == "running"
+    assert cancelled["cancel_requested"]
+    assert not queue.heartbeat(job["id"], "w1", processed_files=5)
+    
+    queue.mark_cancelled(job["id"], "w1")
+    assert queue.get(job["id"])["status"] == "cancelled"
+
+
+def test_cancel_unknown_job(queue):
+    assert queue.cancel("missing") is None
+
+
+class RecordingIndexingService:
+    """Индексация, запоминающая позицию продолжения и отчитывающаяся о прогрессе"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def index_project(self, project_path, project_id, force, start_from, on_progress, git_ref):
+        self.calls.append(start_from)
+        await on_progress(start_from + 32, 100)
+        return {"indexed_files": start_from + 32}
+
+
+@pytest.mark.asyncio
+async def test_worker_resumes_from_processed_files(queue, clock):
+    job = queue.enqueue("p1", "/src/p1")
+    queue.claim("crashed")
+    queue.heartbeat(job["id"], "crashed", processed_files=64, total_files=100)
+    expire_heartbeats(clock)
+    
+    indexing_service = RecordingIndexingService()
+    worker = IndexingWorker(queue, indexing_service, "w2")
+    await worker.process(queue.claim("w2"))
+    
+    finished = queue.get(job["id"])
+    assert indexing_service.calls == [64]
+    assert finished["status"] == "completed"
+    assert finished["processed_files"] == 96
+    assert finished["stats"] == {"indexed_files": 96}
+
+
+@pytest.mark.asyncio
+async def test_worker_stops_on_cancel(queue):
+    job = queue.enqueue("p1", "/src/p1")
+    claimed = queue.claim("w1")
+    queue.cancel(job["id"])
+    
+    await IndexingWorker(queue, RecordingIndexingService(), "w1").process(claimed)
+    
+    assert queue.get(job["id"])["status"] == "cancelled"
+
+
+def test_requeue_worker_counts_crash_as_attempt(queue, clock, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_JOB_MAX_ATTEMPTS", 2)
+    job = queue.enqueue("p1", "/src/p1")
+    other = queue.enqueue("p2", "/src/p2")
+    queue.claim("w1", max_running=5)
+    queue.claim("w2", max_running=5)
+    
+    assert queue.requeue_worker("w1") == 1
+    assert queue.get(job["id"])["status"] == "pending"
+    assert queue.get(other["id"])["status"] == "running"
+    
+    queue.claim("w1", max_running=5)
+    assert queue.requeue_worker("w1") == 0
+    assert queue.get(job["id"])["status"] == "failed"
+
+
+def crashing_worker(worker_id: str):
+    """
+    Процесс-воркер для теста супервизора: падает на первой попытке задачи
+    после сохранения позиции, на второй завершает ее
+    """
+    queue = JobQueue()
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(0.05)
+            continue
+        if job["attempts"] == 1:
+            queue.heartbeat(job["id"], worker_id, processed_files=5, total_files=10)
+            os._exit(1)
+        queue.complete(job["id"], worker_id, {"resumed_from": job["processed_files"]})
+
+
+def test_supervisor_restarts_crashed_worker(tmp_path, monkeypatch):
+    db_path = tmp_path / "jobs.sqlite3"
+    # Процессы spawn читают настройки из окружения
+    monkeypatch.setenv("INDEXING_JOBS_DB", str(db_path))
+    queue = JobQueue(db_path)
+    job = queue.enqueue("p1", "/src/p1")
+    supervisor = IndexingWorkerSupervisor(1, queue, target=crashing_worker)
+    
+    supervisor.start()
+    try:
+        deadline = time.monotonic() + 30
+        while queue.get(job["id"])["status"] != "completed" and time.monotonic() < deadline:
+            time.sleep(0.1)
+    finally:
+        supervisor.stop()
+    
+    finished = queue.get(job["id"])
+    assert finished["status"] == "completed"
+    assert finished["attempts"] == 2
+    assert finished["stats"] == {"resumed_from": 5}
@@ -0,0 +1,129 @@
+"""
+Тесты кеша проверенных токенов и общего списка отозванных
+"""
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.config import settings
+from app.core.security import RevokedTokenStore, TokenCache, create_access_token, decode_token
+
+
+class FakeClock:
+    """Управляемое monotonic для интервала перечитывания списка (time - настоящее)"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+    
+    def time(self) -> float:
+        return time.time()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(security, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return RevokedTokenStore(tmp_path / "revoked.sqlite3")
+
+
+class CountingStore(RevokedTokenStore):
+    """Список отозванных, считающий обращения к SQLite"""
+    
+    queries = 0
+    
+    def _conn(self):
+        self.queries += 1
+        return super()._conn()
+
+
+def make_token(username: str = "alice"):
+    token = create_access_token({"sub": username}, expires_delta=timedelta(minutes=5))
+    return token, security.jwt.get_unverified_claims(token)
+
+
+def test_revocation_is_shared_between_processes(store):
+    # Два кеша на одном файле - как два prefork-воркера
+    first = TokenCache(10, store)
+    second = TokenCache(10, RevokedTokenStore(store.db_path))
+    token, claims = make_token()
+    first.set(token, claims)
+    second.set(token, claims)
+    
+    first.revoke(token, claims)
+    
+    assert first.get(token) is None
+    assert second.get(token) == claims
+    assert second.is_revoked(token, claims)
+
+
+def test_other_tokens_stay_valid(store):
+    cache = TokenCache(10, store)
+    revoked, revoked_claims = make_token()
+    valid, valid_claims = make_token()
+    
+    cache.revoke(revoked, revoked_claims)
+    
+    assert not cache.is_revoked(valid, valid_claims)
+
+
+def test_expired_revocations_are_purged(store):
+    cache = TokenCache(10, store)
+    token, claims = make_token()
+    cache.revoke(token, dict(claims, exp=1))
+    cache.revoke(*make_token())
+    
+    with store._conn() as conn:
+        token_ids = {row[0] for row in conn.execute("SELECT token_id FROM revoked")}
+    assert claims["jti"] not in token_ids
+    assert len(token_ids) == 1
+
+
+def test_decode_token_rejects_token_revoked_elsewhere(store, clock, monkeypatch):
+    monkeypatch.setattr(security, "token_cache", TokenCache(10, store))
+    token, claims = make_token()
+    assert decode_token(token)["sub"] == "alice"
+    
+    TokenCache(10, RevokedTokenStore(store.db_path)).revoke(token, claims)
+    # Другой процесс узнает об отзыве после перечитывания списка
+    assert decode_token(token)["sub"] == "alice"
+    clock.now += settings.AUTH_REVOCATION_REFRESH_SECONDS
+    
+    with pytest.raises(HTTPException) as error:
+        decode_token(token)
+    assert error.value.status_code == 401
+
+
+def test_requests_do_not_query_sqlite(tmp_path, clock, monkeypatch):
+    store = CountingStore(tmp_path / "revoked.sqlite3")
+    monkeypatch.setattr(security, "token_cache", TokenCache(10, store))
+    token, _ = make_token()
+    store.queries = 0
+    
+    for _ in range(100):
+        decode_token(token)
+    assert store.queries == 1
+    
+    clock.now += settings.AUTH_REVOCATION_REFRESH_SECONDS
+    decode_token(token)
+    assert store.queries == 2
+
+
+def test_local_revocation_is_visible_immediately(store):
+    cache = TokenCache(10, store)
+    token, claims = make_token()
+    assert not cache.is_revoked(token, claims)
+    
+    cache.revoke(token, claims)
+    
+    assert cache.is_revoked(token, claims)
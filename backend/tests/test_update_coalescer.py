@@ -0,0 +1,90 @@
+"""
+Тесты объединения обновлений файлов и их отложенной записи при задаче индексации
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.job_queue import JobQueue
+from app.services.update_coalescer import FileUpdateCoalescer
+
+
+class RecordingIndexingService:
+    """IndexingService, запоминающий вызовы update_files"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def update_files(self, project_id, project_path, changed, deleted):
+        self.calls.append((project_id, dict(changed), list(deleted)))
+        return {"project_id": project_id, "updated_files": len(changed)}
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INDEXING_JOB_POLL_INTERVAL", 0.02)
+    return JobQueue(tmp_path / "jobs.sqlite3")
+
+
+@pytest.fixture
+def indexing():
+    return RecordingIndexingService()
+
+
+def make_coalescer(indexing, queue) -> FileUpdateCoalescer:
+    return FileUpdateCoalescer(indexing, debounce=0.01, max_delay=0.05, job_queue=queue)
+
+
+@pytest.mark.asyncio
+async def test_changes_are_merged_into_one_write(indexing, queue):
+    coalescer = make_coalescer(indexing, queue)
+    
+    first = coalescer.submit("p", None, {"a.py": "x = 1"}, [])
+    second = coalescer.submit("p", None, {"a.py": "x = 2", "b.py": "y = 1"}, ["c.py"])
+    
+    assert first is second
+    assert (await asyncio.wait_for(first, 1))["updated_files"] == 2
+    assert indexing.calls == [("p", {"a.py": "x = 2", "b.py": "y = 1"}, ["c.py"])]
+
+
+@pytest.mark.asyncio
+async def test_flush_waits_for_active_job(indexing, queue):
+    coalescer = make_coalescer(indexing, queue)
+    job = queue.enqueue("p", "/src/p")
+    queue.claim("w1")
+    
+    result = coalescer.submit("p", None, {"a.py": "x = 1"}, [])
+    await asyncio.sleep(0.15)
+    coalescer.submit("p", None, {"b.py": "y = 1"}, [])
+    await asyncio.sleep(0.05)
+    assert indexing.calls == []
+    
+    queue.complete(job["id"], "w1", {})
+    await asyncio.wait_for(result, 1)
+    
+    assert indexing.calls == [("p", {"a.py": "x = 1", "b.py": "y = 1"}, [])]
+
+
+@pytest.mark.asyncio
+async def test_other_projects_are_not_deferred(indexing, queue):
+    coalescer = make_coalescer(indexing, queue)
+    queue.enqueue("busy", "/src/busy")
+    
+    await asyncio.wait_for(coalescer.submit("p", None, {"a.py": "x = 1"}, []), 1)
+    
+    assert [call[0] for call in indexing.calls] == ["p"]
+    await coalescer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_writes_deferred_changes(indexing, queue):
+    coalescer = make_coalescer(indexing, queue)
+    queue.enqueue("p", "/src/p")
+    result = coalescer.submit("p", None, {"a.py": "x = 1"}, [])
+    await asyncio.sleep(0.1)
+    
+    await coalescer.close()
+    
+    assert result.done()
+    assert indexing.calls == [("p", {"a.py": "x = 1"}, [])]